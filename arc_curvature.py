@@ -0,0 +1,108 @@
+import json
+import os
+import sys
+import numpy as np
+from arc_store import ArcStore, arcs_path
+from circle_fit import fit_circles
+from instrumentation import count
+from projection import lonlat_to_mercator, mercator_to_local
+
+# Curvature of hand-traced arcs, with no QGIS dependency. The QGIS toolbar,
+# curve-update.py and the command line below all measure arcs through here, so
+# they agree on the numbers.
+
+# ---------- CONFIG ----------
+MIN_ARC_VERTICES = 3   # fewer points do not define a circle
+# ----------------------------
+
+def pack_arcs(arcs):
+    """Stack a list of (x, y) vertex lists into one (N, 2) array plus offsets."""
+    offsets = np.concatenate([[0], np.cumsum([len(coords) for coords in arcs])]).astype(np.int64)
+    points = np.array([p for coords in arcs for p in coords], dtype=float).reshape(-1, 2)
+    return points, offsets
+
+def fit_mercator_arcs(x, y, offsets):
+    """
+    Fit arcs traced in EPSG:3857. Each arc is moved into a local frame around
+    its centroid first, so lengths and radii are ground metres rather than
+    Mercator metres.
+    """
+    lx, ly, _, _ = mercator_to_local(x, y, offsets)
+    return fit_circles(np.column_stack([lx, ly]), offsets)
+
+def measure_arcs(arcs):
+    """
+    Fit every arc (vertices in EPSG:3857 metres) in one batch.
+    Returns (indices of the arcs that were measured, fit dict from fit_circles);
+    arcs with fewer than MIN_ARC_VERTICES points are skipped.
+    """
+    keep = [i for i, coords in enumerate(arcs) if len(coords) >= MIN_ARC_VERTICES]
+    points, offsets = pack_arcs([arcs[i] for i in keep])
+    return keep, fit_mercator_arcs(points[:, 0], points[:, 1], offsets)
+
+def fit_columns(fit):
+    """The arc table's fit columns, formatted the way curve-update.py writes them."""
+    return {
+        "Arc Length (m)": [f"{v:.6f}" for v in fit["arc_length"]],
+        "Radius (m)": [f"{v:.6f}" for v in fit["radius"]],
+        "Curvature (1/m)": [f"{v:.8f}" for v in fit["curvature"]],
+        "Angle (deg)": [f"{v:.6f}" for v in fit["angle"]],
+    }
+
+def read_geojson_arcs(path):
+    """LineStrings (lon/lat) from a GeoJSON export of the drawing layer, as EPSG:3857 vertex lists."""
+    with open(path, "r") as f:
+        data = json.load(f)
+    arcs = []
+    for feature in data["features"]:
+        geometry = feature["geometry"]
+        lines = [geometry["coordinates"]] if geometry["type"] == "LineString" else geometry["coordinates"]
+        for line in lines:
+            lon, lat = np.asarray(line, dtype=float)[:, :2].T
+            x, y = lonlat_to_mercator(lon, lat)
+            arcs.append(list(zip(x.tolist(), y.tolist())))
+    return arcs
+
+def compute_all(input_path, output_prefix):
+    """Measure every arc in a GeoJSON file or arc table and write them as a new arc table."""
+    if input_path.endswith((".geojson", ".json")):
+        arcs = read_geojson_arcs(input_path)
+        keep, fit = measure_arcs(arcs)
+        points, offsets = pack_arcs([arcs[i] for i in keep])
+        store = ArcStore(np.arange(1, len(keep) + 1), points[:, 0], points[:, 1], offsets, fit_columns(fit))
+        skipped = len(arcs) - len(keep)
+    else:
+        if os.path.abspath(output_prefix) == os.path.abspath(input_path):
+            raise ValueError(f"refusing to overwrite the input tables {arcs_path(input_path)}; "
+                             f"choose another output prefix")
+        store = ArcStore.load(input_path)
+        counts = np.diff(store.offsets)
+        if counts.min(initial=MIN_ARC_VERTICES) < MIN_ARC_VERTICES:
+            raise ValueError(f"{arcs_path(input_path)} has arcs with fewer than {MIN_ARC_VERTICES} vertices")
+        fit = fit_mercator_arcs(store.x, store.y, store.offsets)
+        store.columns.update(fit_columns(fit))
+        skipped = 0
+
+    count("arcs", len(store))
+    count("arcs_skipped", skipped)
+    store.save(output_prefix)
+    print(f"Measured {len(store)} arcs ({int(fit['refined'].sum())} refined individually, {skipped} skipped), "
+          f"saved to {arcs_path(output_prefix)}")
+
+if __name__ == "__main__":
+    # python arc_curvature.py drawn_arcs.geojson drawn_arcs     (GeoJSON export of the QGIS layer)
+    # python arc_curvature.py curve                              (existing arc table prefix, to curve-updated)
+    if len(sys.argv) not in (2, 3):
+        sys.exit("usage: python arc_curvature.py INPUT [OUTPUT_PREFIX]")
+    input_path = sys.argv[1]
+    if len(sys.argv) == 3:
+        output_prefix = sys.argv[2]
+    elif input_path.endswith((".geojson", ".json")):
+        output_prefix = os.path.splitext(input_path)[0]
+    else:
+        # Next to the input tables, like the fit stage's curve -> curve-updated, never over them
+        output_prefix = input_path + "-updated"
+    try:
+        compute_all(input_path, output_prefix)
+    except ValueError as e:
+        sys.exit(f"Error: {e}")
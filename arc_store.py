@@ -0,0 +1,166 @@
+import csv
+import os
+import re
+import sys
+import numpy as np
+
+# Arcs are stored as two CSV files sharing a prefix:
+#   <prefix>.arcs.csv      one row per arc: "Arc ID" plus any attribute columns
+#   <prefix>.vertices.csv  one row per vertex: Arc ID, X, Y (EPSG:3857 metres), in drawing order
+# Both files can be appended to one arc at a time, which is what the QGIS tool does.
+ARC_ID = "Arc ID"
+VERTEX_COLUMNS = [ARC_ID, "X", "Y"]
+FIT_COLUMNS = ["Arc Length (m)", "Radius (m)", "Curvature (1/m)", "Angle (deg)"]
+
+def arcs_path(prefix):
+    return prefix + ".arcs.csv"
+
+def vertices_path(prefix):
+    return prefix + ".vertices.csv"
+
+class ArcStore:
+    """
+    Traced arcs as flat arrays: vertex `x`/`y`, `offsets` so that arc i is
+    x[offsets[i]:offsets[i+1]], `arc_ids`, and `columns`, a dict of per-arc
+    attribute lists read from the arc table as strings.
+    """
+
+    def __init__(self, arc_ids, x, y, offsets, columns=None):
+        self.arc_ids = np.asarray(arc_ids, dtype=np.int64)
+        self.x = np.asarray(x, dtype=float)
+        self.y = np.asarray(y, dtype=float)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.columns = columns if columns is not None else {}
+
+    def __len__(self):
+        return len(self.arc_ids)
+
+    @property
+    def points(self):
+        return np.column_stack([self.x, self.y])
+
+    @classmethod
+    def load(cls, prefix):
+        """
+        Read an arc table and its vertex table; vertices come back as NumPy arrays directly.
+        Vertices of arcs missing from the arc table and arcs without vertices, which
+        an interrupted append leaves behind, are dropped with a warning.
+        """
+        with open(arcs_path(prefix), "r", newline="") as f:
+            reader = csv.DictReader(f)
+            rows = list(reader)
+            fieldnames = [name for name in reader.fieldnames if name != ARC_ID]
+        arc_ids = np.array([int(row[ARC_ID]) for row in rows], dtype=np.int64)
+        columns = {name: [row[name] for row in rows] for name in fieldnames}
+
+        vertices = np.loadtxt(vertices_path(prefix), delimiter=",", skiprows=1, ndmin=2)
+        vertex_arc = vertices[:, 0].astype(np.int64)
+        # Rank of every arc ID in arc-table order, -1 for IDs the arc table does not have
+        size = max(arc_ids.max(initial=-1), vertex_arc.max(initial=-1)) + 1
+        rank = np.full(size, -1, dtype=np.int64)
+        rank[arc_ids] = np.arange(len(arc_ids))
+        vertex_rank = np.where(vertex_arc >= 0, rank[np.maximum(vertex_arc, 0)], -1)
+
+        orphan = vertex_rank < 0
+        if orphan.any():
+            print(f"Warning: dropping {int(orphan.sum())} vertices of arcs missing from {arcs_path(prefix)}: "
+                  f"{np.unique(vertex_arc[orphan]).tolist()}")
+            vertices, vertex_rank = vertices[~orphan], vertex_rank[~orphan]
+        counts = np.bincount(vertex_rank, minlength=len(arc_ids))
+        empty = counts == 0
+        if empty.any():
+            print(f"Warning: dropping {int(empty.sum())} arcs without vertices in {vertices_path(prefix)}: "
+                  f"{arc_ids[empty].tolist()}")
+            keep = np.flatnonzero(~empty)
+            arc_ids, counts = arc_ids[keep], counts[keep]
+            columns = {name: [values[i] for i in keep] for name, values in columns.items()}
+            vertex_rank = np.cumsum(~empty)[vertex_rank] - 1
+
+        # Group vertices by arc in arc-table order, keeping drawing order within an arc
+        order = np.argsort(vertex_rank, kind="stable")
+        offsets = np.concatenate([[0], np.cumsum(counts)])
+        return cls(arc_ids, vertices[order, 1], vertices[order, 2], offsets, columns)
+
+    def save(self, prefix):
+        """Write both tables from scratch."""
+        names = list(self.columns)
+        with open(arcs_path(prefix), "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow([ARC_ID] + names)
+            writer.writerows(zip(self.arc_ids.tolist(), *(self.columns[n] for n in names)))
+
+        arc_of_vertex = np.repeat(self.arc_ids, np.diff(self.offsets))
+        with open(vertices_path(prefix), "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(VERTEX_COLUMNS)
+            writer.writerows(zip(arc_of_vertex.tolist(), self.x.tolist(), self.y.tolist()))
+
+    @classmethod
+    def from_qgis_csv(cls, path):
+        """One-shot migration from the old CSV with a QgsPointXY repr Coordinates column."""
+        with open(path, "r", newline="") as f:
+            reader = csv.DictReader(f)
+            rows = list(reader)
+            fieldnames = [name for name in reader.fieldnames if name != "Coordinates"]
+
+        arcs = [re.findall(r"POINT\(([-\d\.]+) ([-\d\.]+)\)", row["Coordinates"]) for row in rows]
+        xy = np.array([p for arc in arcs for p in arc], dtype=float).reshape(-1, 2)
+        offsets = np.concatenate([[0], np.cumsum([len(arc) for arc in arcs])])
+        columns = {name: [row[name] for row in rows] for name in fieldnames}
+        return cls(np.arange(1, len(rows) + 1), xy[:, 0], xy[:, 1], offsets, columns)
+
+    def to_qgis_csv(self, path):
+        """Export in the old single-CSV layout, for readers that still expect a Coordinates column."""
+        fit_names = [n for n in FIT_COLUMNS if n in self.columns]
+        other_names = [n for n in self.columns if n not in FIT_COLUMNS]
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(fit_names + ["Coordinates"] + other_names)
+            for i in range(len(self)):
+                s = slice(self.offsets[i], self.offsets[i + 1])
+                coords = ", ".join(f"<QgsPointXY: POINT({x!r} {y!r})>" for x, y in zip(self.x[s].tolist(), self.y[s].tolist()))
+                writer.writerow([self.columns[n][i] for n in fit_names] + [f"[{coords}]"]
+                                + [self.columns[n][i] for n in other_names])
+
+def append_arcs(prefix, rows, arcs):
+    """
+    Append several arcs to the tables at `prefix`, creating them if needed.
+    `rows` holds one attribute dict per arc and `arcs` its (x, y) vertices; each
+    table is opened once and written in a single call. Returns the new arc IDs.
+    """
+    new = not os.path.exists(arcs_path(prefix))
+    if new:
+        first_id = 1
+        fieldnames = [ARC_ID] + list(rows[0]) if rows else [ARC_ID]
+    else:
+        with open(arcs_path(prefix), "r", newline="") as f:
+            reader = csv.DictReader(f)
+            fieldnames = reader.fieldnames
+            first_id = max((int(row[ARC_ID]) for row in reader), default=0) + 1
+    arc_ids = list(range(first_id, first_id + len(rows)))
+
+    with open(arcs_path(prefix), "a", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        if new:
+            writer.writeheader()
+        writer.writerows({ARC_ID: arc_id, **row} for arc_id, row in zip(arc_ids, rows))
+
+    new_vertices = not os.path.exists(vertices_path(prefix))
+    with open(vertices_path(prefix), "a", newline="") as f:
+        writer = csv.writer(f)
+        if new_vertices:
+            writer.writerow(VERTEX_COLUMNS)
+        writer.writerows((arc_id, x, y) for arc_id, coords in zip(arc_ids, arcs) for x, y in coords)
+    return arc_ids
+
+def append_arc(prefix, attributes, coords):
+    """Append one arc to the tables at `prefix`; the new arc gets the next free ID."""
+    return append_arcs(prefix, [attributes], [coords])[0]
+
+if __name__ == "__main__":
+    # Migrate old QGIS CSVs: python arc_store.py curve.csv curve-updated.csv
+    for path in sys.argv[1:]:
+        prefix = os.path.splitext(path)[0]
+        store = ArcStore.from_qgis_csv(path)
+        store.save(prefix)
+        print(f"Migrated {len(store)} arcs from {path} to {arcs_path(prefix)} and {vertices_path(prefix)}")
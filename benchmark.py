@@ -0,0 +1,434 @@
+import importlib.util
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+from arc_curvature import fit_mercator_arcs
+from arc_store import ArcStore
+from circle_fit import fit_circle_radius, fit_circles
+from compaction import compact
+from curve_detection import detect_curves
+from elevation_heatmap_and_curvature import render_map
+from gradient_profile import write_profiles
+from map_tiles import build_tiles, print_report
+from track_store import TrackStore
+from network_stats import haversine, segment_table, way_totals, name_totals, grade_percentiles
+from parallel import SHARD_VERTICES
+from projection import local_frames, lonlat_to_mercator, mercator_to_lonlat
+from simplify import CURVE_TOLERANCE_M, simplification_mask
+from synthetic_network import ARC_POINTS, generate_arcs, generate_network
+
+# ---------- CONFIG ----------
+CURVE_FILE = "curve"  # arc table prefix
+GEOJSON_FILE = "mumbai_railways_updated_with_elevations.geojson"
+REPEAT = 50  # tile the traced arcs this many times to get a realistic batch size
+SUITE_SIZES = [1_000, 10_000, 100_000, 1_000_000]  # synthetic network vertices per suite run
+PARALLEL_SIZE = 4_000_000
+PARALLEL_WORKERS = [1, 2, 4, 8, 16]
+RESULTS_DIR = "benchmark_results"
+LOOP_LIMIT = 10_000     # the per-row fitter only runs up to this many vertices
+TILES_LIMIT = 1_000_000 # the tile pyramid only up to this many
+RENDER_LIMIT = 100_000  # and the folium map up to this many (skipped without folium)
+REGRESSION = 1.2        # compare flags stages this much slower
+# ----------------------------
+
+def load_arcs(prefix):
+    """Read the traced arcs from the arc tables as lists of (x, y) points."""
+    store = ArcStore.load(prefix)
+    points = store.points.tolist()
+    return [points[store.offsets[i]:store.offsets[i + 1]] for i in range(len(store))]
+
+def bench_circle_fit(arcs):
+    """Per-row least_squares loop versus the batched fitter on the same arcs."""
+    offsets = np.cumsum([0] + [len(a) for a in arcs])
+    points = np.array([p for a in arcs for p in a], dtype=float)
+
+    start = time.perf_counter()
+    loop_radius = np.array([fit_circle_radius(a) for a in arcs])
+    loop_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    fit = fit_circles(points, offsets)
+    batch_time = time.perf_counter() - start
+
+    rel_err = np.abs(fit["radius"] - loop_radius) / loop_radius
+    print(f"Arcs: {len(arcs)}, points: {len(points)}")
+    print(f"Per-row loop:   {loop_time:.3f}s")
+    print(f"Batched fit:    {batch_time:.3f}s ({loop_time / batch_time:.1f}x faster, "
+          f"{int(fit['refined'].sum())} arcs refined individually)")
+    print(f"Max relative radius difference: {rel_err.max():.2e}")
+
+def _measure(fn):
+    """Run fn once, returning (seconds, peak traced memory in MB)."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1] / 1e6
+    tracemalloc.stop()
+    return elapsed, peak
+
+def bench_load(path):
+    """json.load of the GeoJSON versus the .npz sidecar TrackStore.load reads."""
+    def load_json():
+        with open(path) as f:
+            json.load(f)
+
+    TrackStore.load(path)  # make sure the sidecar exists and is current
+    json_time, json_peak = _measure(load_json)
+    parse_time, parse_peak = _measure(lambda: TrackStore.load(path, use_sidecar=False))
+    npz_time, npz_peak = _measure(lambda: TrackStore.load(path))
+    print(f"Loading {path}")
+    print(f"json.load:             {json_time:.3f}s, peak {json_peak:.1f} MB")
+    print(f"TrackStore from JSON:  {parse_time:.3f}s, peak {parse_peak:.1f} MB")
+    print(f"TrackStore from .npz:  {npz_time:.3f}s, peak {npz_peak:.1f} MB")
+
+def tile_store(store, repeat):
+    """A TrackStore holding `repeat` back-to-back copies of `store`."""
+    n = store.n_points
+    offsets = np.concatenate([store.offsets[:-1] + k * n for k in range(repeat)] + [[repeat * n]])
+    return TrackStore(
+        np.tile(store.lon, repeat), np.tile(store.lat, repeat), np.tile(store.elevation, repeat),
+        offsets, np.tile(store.way_ids, repeat), store.names * repeat,
+    )
+
+def bench_stats(path, repeat):
+    """Whole-network segment statistics on a tiled copy of the network."""
+    store = tile_store(TrackStore.load(path), repeat)
+    start = time.perf_counter()
+    segments = segment_table(store)
+    way_totals(store, segments)
+    name_totals(store, segments)
+    grade_percentiles(segments)
+    elapsed = time.perf_counter() - start
+    print(f"Segments: {len(segments['length'])}, ways: {len(store)}")
+    print(f"Segment statistics: {elapsed:.3f}s")
+
+def bench_projection(path, repeat):
+    """
+    Per-point versus vectorized EPSG:3857 -> lon/lat, and segment lengths in the
+    Mercator and local frames checked against haversine.
+    """
+    store = tile_store(TrackStore.load(path), repeat)
+    x, y = lonlat_to_mercator(store.lon, store.lat)
+
+    start = time.perf_counter()
+    for px, py in zip(x.tolist(), y.tolist()):
+        lon = (px / 6378137.0) * (180.0 / np.pi)
+        lat = (py / 6378137.0) * (180.0 / np.pi)
+        lat = (180.0 / np.pi) * (2 * np.arctan(np.exp(lat * np.pi / 180.0)) - np.pi / 2)
+    loop_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    lon, lat = mercator_to_lonlat(x, y)
+    vector_time = time.perf_counter() - start
+    round_trip = max(np.abs(lon - store.lon).max(), np.abs(lat - store.lat).max())
+
+    start = time.perf_counter()
+    lx, ly, _, _ = local_frames(store.lon, store.lat, store.offsets)
+    local_time = time.perf_counter() - start
+
+    i = store.segment_starts()
+    reference = haversine(store.lat[i], store.lon[i], store.lat[i + 1], store.lon[i + 1])
+    ok = reference > 1.0
+    mercator = np.hypot(x[i + 1] - x[i], y[i + 1] - y[i])
+    local = np.hypot(lx[i + 1] - lx[i], ly[i + 1] - ly[i])
+    mercator_err = np.abs(mercator[ok] / reference[ok] - 1)
+    local_err = np.abs(local[ok] / reference[ok] - 1)
+
+    print(f"Points: {len(x)}, segments: {len(i)}")
+    print(f"Per-point 3857 -> 4326: {loop_time:.3f}s")
+    print(f"Vectorized:             {vector_time:.3f}s ({loop_time / vector_time:.0f}x faster), "
+          f"round trip within {round_trip:.1e} deg")
+    print(f"Local frames per way:   {local_time:.3f}s")
+    print(f"Segment length vs haversine, Mercator: mean {mercator_err.mean():.2%}, max {mercator_err.max():.2%}")
+    print(f"Segment length vs haversine, local:    mean {local_err.mean():.2e}, max {local_err.max():.2e}")
+    total = reference.sum()
+    print(f"Network length: haversine {total:.1f} m, local {local.sum():.1f} m, Mercator {mercator.sum():.1f} m")
+
+def bench_tiles(path, repeat):
+    """Tile pyramid generation on a tiled copy of the network, sizes compared with the monolithic files."""
+    store = tile_store(TrackStore.load(path), repeat)
+    with tempfile.TemporaryDirectory() as tile_dir:
+        start = time.perf_counter()
+        build_tiles(store, tile_dir=tile_dir)
+        elapsed = time.perf_counter() - start
+        start = time.perf_counter()
+        report = build_tiles(store, tile_dir=tile_dir)
+        rerun = time.perf_counter() - start
+    print(f"Ways: {len(store)}, points: {store.n_points}")
+    print_report(report)
+    print(f"First build: {elapsed:.2f}s, rebuild with nothing changed: {rerun:.2f}s")
+    largest = max(info["bytes"] / info["tiles"] for info in report["zooms"].values() if info["tiles"])
+    print(f"Largest average tile: {largest / 1e3:.1f} kB")
+    for monolithic in (path, "mumbai_railways_with_curves.html"):
+        if os.path.exists(monolithic):
+            print(f"Monolithic {monolithic}: {os.path.getsize(monolithic) / 1e6:.2f} MB (x{repeat} network: "
+                  f"{repeat * os.path.getsize(monolithic) / 1e6:.2f} MB)")
+
+def _run_stage(fn, memory=True):
+    """
+    Time fn, then (with `memory`) run it again under tracemalloc for its peak,
+    so tracing overhead never ends up in the timing. Returns a result dict with
+    seconds, peak_mb and whatever checks fn returned.
+    """
+    start = time.perf_counter()
+    checks = fn() or {}
+    result = {"seconds": round(time.perf_counter() - start, 4)}
+    if memory:
+        result["peak_mb"] = round(_measure(fn)[1], 2)
+    result.update(checks)
+    return result
+
+def _relative_error(measured, truth):
+    err = np.abs(measured / truth - 1)
+    return {"median_rel_err": float(np.median(err)), "max_rel_err": float(err.max())} if len(err) else {}
+
+def match_curves(starts, ends, fit, truth):
+    """
+    Detected curve covering the middle vertex of every true curve. Returns
+    the share of true curves found and the radius error of the found ones.
+    """
+    middle = (truth["start"] + truth["end"]) // 2
+    i = np.searchsorted(starts, middle, side="right") - 1
+    found = (i >= 0) & (ends[np.maximum(i, 0)] >= middle)
+    checks = {"curves_true": len(middle), "curves_detected": len(starts), "curves_found": float(found.mean())}
+    checks.update(_relative_error(fit["radius"][i[found]], truth["radius"][found]))
+    return checks
+
+def with_duplicates(store, every=20):
+    """The store with every `every`-th way appended again, reversed: known duplicates for compaction."""
+    copies = np.arange(0, len(store), every)
+    idx = np.concatenate([np.arange(store.offsets[w + 1] - 1, store.offsets[w] - 1, -1) for w in copies])
+    counts = np.diff(store.offsets)[copies]
+    offsets = np.concatenate([store.offsets, store.offsets[-1] + np.cumsum(counts)])
+    return TrackStore(np.concatenate([store.lon, store.lon[idx]]), np.concatenate([store.lat, store.lat[idx]]),
+                      np.concatenate([store.elevation, store.elevation[idx]]), offsets,
+                      np.concatenate([store.way_ids, store.way_ids[copies]]),
+                      store.names + [store.names[w] for w in copies]), len(copies)
+
+def bench_suite(n_vertices, memory=True, seed=0):
+    """
+    Every pipeline stage on a synthetic network of about n_vertices vertices.
+    Curves and arcs are generated with known radii, so the curve detector and
+    circle fitters are checked against the truth as well as timed.
+    Returns {stage: result dict}.
+    """
+    results = {}
+    results["generate"] = _run_stage(lambda: {"ways": len(generate_network(n_vertices, seed)[0])}, memory)
+    store, truth = generate_network(n_vertices, seed)
+    n_arcs = max(1, n_vertices // ARC_POINTS)
+    ax, ay, arc_offsets, arc_radius = generate_arcs(n_arcs, seed=seed)
+
+    def save_load():
+        # Round trip through the .npz format of the GeoJSON sidecars
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "synthetic.npz")
+            store.save(path)
+            with np.load(path, allow_pickle=False) as z:
+                TrackStore(z["lon"], z["lat"], z["elevation"], z["offsets"], z["way_ids"], z["names"].tolist())
+    results["save_load"] = _run_stage(save_load, memory)
+
+    def stats():
+        segments = segment_table(store)
+        way_totals(store, segments)
+        name_totals(store, segments)
+        grade_percentiles(segments)
+    results["stats"] = _run_stage(stats, memory)
+    results["local_frames"] = _run_stage(lambda: {"frames": len(local_frames(store.lon, store.lat, store.offsets)[2])},
+                                         memory)
+
+    def simplify():
+        keep, report = simplification_mask(store, CURVE_TOLERANCE_M)
+        return {"kept": report["kept"] / report["vertices"], "max_deviation_m": report["max_deviation_m"]}
+    results["simplify"] = _run_stage(simplify, memory)
+
+    doubled, n_copies = with_duplicates(store)
+    def compaction():
+        _, report = compact(doubled)
+        # Synthetic ways never overlap, so only the planted copies should go
+        return {"copies_found": report["duplicate_ways"] / n_copies,
+                "other_ways_removed": report["overlapping_ways"] + report["degenerate_ways"]}
+    results["compact"] = _run_stage(compaction, memory)
+
+    def detect():
+        _, starts, ends, fit = detect_curves(store)
+        return match_curves(starts, ends, fit, truth)
+    results["detect"] = _run_stage(detect, memory)
+
+    def fit_batch():
+        return _relative_error(fit_mercator_arcs(ax, ay, arc_offsets)["radius"], arc_radius)
+    results["fit_batch"] = _run_stage(fit_batch, memory)
+
+    if n_vertices <= LOOP_LIMIT:
+        def fit_loop():
+            # The original per-row fit, in EPSG:3857 like the QGIS tool used it
+            points = np.column_stack([ax, ay]).tolist()
+            radius = np.array([fit_circle_radius(points[s:e]) for s, e in zip(arc_offsets[:-1], arc_offsets[1:])])
+            return _relative_error(radius, arc_radius)
+        results["fit_loop"] = _run_stage(fit_loop, memory)
+
+    def profile():
+        with tempfile.TemporaryDirectory() as tmp:
+            write_profiles(store, os.path.join(tmp, "profile.csv"), os.path.join(tmp, "steep.csv"))
+    results["profile"] = _run_stage(profile, memory)
+
+    if n_vertices <= TILES_LIMIT:
+        def tiles():
+            with tempfile.TemporaryDirectory() as tmp:
+                report = build_tiles(store, tile_dir=tmp)
+            return {"tiles": sum(z["tiles"] for z in report["zooms"].values()),
+                    "tile_mb": round(sum(z["bytes"] for z in report["zooms"].values()) / 1e6, 3)}
+        results["tiles"] = _run_stage(tiles, memory)
+
+    arcs = ArcStore(np.arange(1, n_arcs + 1), ax, ay, arc_offsets)
+    with tempfile.TemporaryDirectory() as tmp:
+        # The migration parser pulls every vertex out of the Coordinates column with a regex
+        csv_path = os.path.join(tmp, "arcs.csv")
+        arcs.to_qgis_csv(csv_path)
+        def qgis_csv():
+            parsed = ArcStore.from_qgis_csv(csv_path)
+            return {"vertices": int(parsed.offsets[-1]),
+                    "max_coord_err": float(max(np.abs(parsed.x - ax).max(), np.abs(parsed.y - ay).max()))}
+        results["qgis_csv"] = _run_stage(qgis_csv, memory)
+
+        if n_vertices <= RENDER_LIMIT and importlib.util.find_spec("folium") is not None:
+            # Written and loaded once first, so the stage times the map and not the GeoJSON parse
+            geojson_path = os.path.join(tmp, "synthetic.geojson")
+            with open(geojson_path, "w") as f:
+                json.dump(store.to_geojson(), f)
+            TrackStore.load(geojson_path)
+            arcs.save(os.path.join(tmp, "curve"))
+            map_path = os.path.join(tmp, "map.html")
+            def render():
+                render_map(geojson_path, os.path.join(tmp, "curve"), map_path)
+                return {"html_mb": round(os.path.getsize(map_path) / 1e6, 3)}
+            results["render"] = _run_stage(render, memory)
+    return results
+
+def bench_parallel(n_vertices, worker_counts):
+    """
+    Sharded curve detection and gradient profiles on a synthetic network for
+    each worker count, checked to give exactly the serial result.
+    """
+    store, _ = generate_network(n_vertices)
+    print(f"Ways: {len(store)}, points: {store.n_points}, shards of ~{SHARD_VERTICES} vertices, "
+          f"{os.cpu_count()} cores")
+    with tempfile.TemporaryDirectory() as tmp:
+        def profiles(workers):
+            path = os.path.join(tmp, f"profile-{workers}.csv")
+            write_profiles(store, path, os.path.join(tmp, f"steep-{workers}.csv"), workers=workers)
+            with open(path, "rb") as f:
+                return f.read()
+
+        for name, run, same in (
+            ("detect", lambda w: detect_curves(store, workers=w),
+             lambda a, b: all(np.array_equal(x, y) for x, y in zip(a[1:3], b[1:3]))
+             and all(np.array_equal(a[3][k], b[3][k]) for k in a[3])),
+            ("profile", profiles, lambda a, b: a == b),
+        ):
+            baseline = None
+            for workers in worker_counts:
+                start = time.perf_counter()
+                result = run(workers)
+                elapsed = time.perf_counter() - start
+                if baseline is None:
+                    baseline, serial = result, elapsed
+                identical = "identical" if same(result, baseline) else "DIFFERENT"
+                print(f"{name:<8} {workers:>3} workers: {elapsed:>8.2f}s  {serial / elapsed:>5.2f}x  {identical}")
+
+def current_commit():
+    """Short hash of HEAD, marked -dirty when the tree has changes."""
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def run_suite(sizes, memory=True, results_dir=RESULTS_DIR):
+    """Run bench_suite for every size and save the results to <results_dir>/<commit>.json."""
+    run = {
+        "commit": current_commit(),
+        "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "sizes": {},
+    }
+    for n in sizes:
+        results = bench_suite(n, memory)
+        run["sizes"][str(n)] = results
+        print(f"\n{n} vertices")
+        for stage, result in results.items():
+            extra = ", ".join(f"{k} {v:.3g}" if isinstance(v, float) else f"{k} {v}"
+                              for k, v in result.items() if k not in ("seconds", "peak_mb"))
+            peak = f"{result['peak_mb']:>9.1f} MB" if "peak_mb" in result else ""
+            print(f"  {stage:<13}{result['seconds']:>9.3f}s{peak}   {extra}")
+
+    os.makedirs(results_dir, exist_ok=True)
+    path = os.path.join(results_dir, f"{run['commit']}.json")
+    with open(path, "w") as f:
+        json.dump(run, f, indent=1)
+    print(f"\nResults saved to {path}")
+    return path
+
+def compare_runs(old_path, new_path, threshold=REGRESSION):
+    """Print the time and memory ratio of every stage two suite runs share. Returns the regressions."""
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+    print(f"{old['commit']} -> {new['commit']}")
+    print(f"{'vertices':>10} {'stage':<13}{'old s':>9}{'new s':>9}{'time':>8}{'memory':>8}")
+    regressions = []
+    for n, stages in new["sizes"].items():
+        for stage, result in stages.items():
+            before = old["sizes"].get(n, {}).get(stage)
+            if before is None:
+                continue
+            ratio = result["seconds"] / before["seconds"] if before["seconds"] else float("nan")
+            memory = (f"{result['peak_mb'] / before['peak_mb']:>7.2f}x"
+                      if before.get("peak_mb") and "peak_mb" in result else f"{'':>8}")
+            flag = "  slower" if ratio > threshold else ""
+            print(f"{n:>10} {stage:<13}{before['seconds']:>9.3f}{result['seconds']:>9.3f}{ratio:>7.2f}x{memory}{flag}")
+            if ratio > threshold:
+                regressions.append((n, stage, ratio))
+    return regressions
+
+if __name__ == "__main__":
+    stage = sys.argv[1] if len(sys.argv) > 1 else "fit"
+    if stage == "fit":
+        repeat = int(sys.argv[2]) if len(sys.argv) > 2 else REPEAT
+        bench_circle_fit(load_arcs(CURVE_FILE) * repeat)
+    elif stage == "load":
+        bench_load(sys.argv[2] if len(sys.argv) > 2 else GEOJSON_FILE)
+    elif stage == "stats":
+        bench_stats(GEOJSON_FILE, int(sys.argv[2]) if len(sys.argv) > 2 else 100)
+    elif stage == "projection":
+        bench_projection(GEOJSON_FILE, int(sys.argv[2]) if len(sys.argv) > 2 else 10)
+    elif stage == "tiles":
+        bench_tiles(GEOJSON_FILE, int(sys.argv[2]) if len(sys.argv) > 2 else 1)
+    elif stage == "suite":
+        # benchmark.py suite [--no-memory] [N ...]
+        args = sys.argv[2:]
+        memory = "--no-memory" not in args
+        sizes = [int(float(a)) for a in args if a != "--no-memory"] or SUITE_SIZES
+        run_suite(sizes, memory)
+    elif stage == "parallel":
+        # benchmark.py parallel [N [WORKERS ...]]
+        n = int(float(sys.argv[2])) if len(sys.argv) > 2 else PARALLEL_SIZE
+        bench_parallel(n, [int(w) for w in sys.argv[3:]] or PARALLEL_WORKERS)
+    elif stage == "compare":
+        if len(sys.argv) != 4:
+            sys.exit("Usage: benchmark.py compare OLD.json NEW.json")
+        regressions = compare_runs(sys.argv[2], sys.argv[3])
+        if regressions:
+            sys.exit(f"{len(regressions)} stages more than {REGRESSION:g}x slower")
+    else:
+        sys.exit(f"Unknown benchmark {stage!r}, expected 'fit', 'load', 'stats', 'projection', 'tiles', "
+                 f"'suite', 'parallel' or 'compare'")
@@ -0,0 +1,184 @@
+import numpy as np
+from instrumentation import count, timed
+
+# ---------- CONFIG ----------
+RESIDUAL_THRESHOLD = 25.0   # RMS residual (m) above which an arc is refined on its own
+GN_ITERATIONS = 50          # batched Gauss-Newton steps on the geometric fit
+GN_TOLERANCE = 1e-9         # relative step size treated as converged
+# ----------------------------
+
+@timed("least_squares")
+def _fit_circle_lsq(points):
+    """Nonlinear least-squares circle fit of one arc, returns (h, k, r)."""
+    # Only the per-arc fallback needs scipy, and importing it costs more than
+    # fitting a whole network with the batched fitter
+    from scipy.optimize import least_squares
+
+    points = np.array(points)
+    x = points[:, 0]
+    y = points[:, 1]
+
+    def calc_radius(params, x, y):
+        h, k, r = params
+        return np.sqrt((x - h)**2 + (y - k)**2) - r
+
+    x_m, y_m = np.mean(x), np.mean(y)
+    r_m = np.mean(np.sqrt((x - x_m)**2 + (y - y_m)**2))
+    initial_guess = [x_m, y_m, r_m]
+
+    result = least_squares(calc_radius, initial_guess, args=(x, y))
+    return result.x
+
+def fit_circle_radius(points):
+    """Fit circle to all points using least squares and return radius."""
+    h, k, r = _fit_circle_lsq(points)
+
+    if r <= 0:
+        return float('inf')
+    return r
+
+def _segment_sum(values, offsets):
+    """Sum `values` over each arc described by `offsets`."""
+    return np.add.reduceat(values, offsets[:-1], axis=0)
+
+def arc_lengths(points, offsets):
+    """Polyline length of every arc at once."""
+    points = np.asarray(points, dtype=float)
+    offsets = np.asarray(offsets)
+    step = np.hypot(*np.diff(points, axis=0).T)
+    # Drop the jump between the last point of one arc and the first of the next
+    step[offsets[1:-1] - 1] = 0.0
+    step = np.append(step, 0.0)
+    return _segment_sum(step, offsets)
+
+def _taubin(u, v, counts, offsets):
+    """Closed-form Taubin fit on centred coordinates, vectorized over arcs."""
+    z = u * u + v * v
+    mxx = _segment_sum(u * u, offsets) / counts
+    myy = _segment_sum(v * v, offsets) / counts
+    mxy = _segment_sum(u * v, offsets) / counts
+    mxz = _segment_sum(u * z, offsets) / counts
+    myz = _segment_sum(v * z, offsets) / counts
+    mzz = _segment_sum(z * z, offsets) / counts
+
+    mz = mxx + myy
+    cov_xy = mxx * myy - mxy * mxy
+    var_z = mzz - mz * mz
+    a3 = 4 * mz
+    a2 = -3 * mz * mz - mzz
+    a1 = var_z * mz + 4 * cov_xy * mz - mxz * mxz - myz * myz
+    a0 = mxz * (mxz * myy - myz * mxy) + myz * (myz * mxx - mxz * mxy) - var_z * cov_xy
+
+    # Newton iterations on the characteristic polynomial, starting from x = 0
+    root = np.zeros_like(mz)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for _ in range(20):
+            y = a0 + root * (a1 + root * (a2 + root * a3))
+            dy = a1 + root * (2 * a2 + 3 * a3 * root)
+            step = np.where(dy != 0, y / dy, 0.0)
+            root = root - step
+
+        det = root * root - root * mz + cov_xy
+        xc = (mxz * (myy - root) - myz * mxy) / det / 2
+        yc = (myz * (mxx - root) - mxz * mxy) / det / 2
+    return xc, yc
+
+def _gauss_newton(u, v, arc_idx, offsets, xc, yc, r):
+    """Refine the geometric (orthogonal distance) fit for every arc together."""
+    converged = np.zeros(len(r), dtype=bool)
+    for _ in range(GN_ITERATIONS):
+        dx = u - xc[arc_idx]
+        dy = v - yc[arc_idx]
+        d = np.hypot(dx, dy)
+        d[d == 0] = 1e-12
+        res = d - r[arc_idx]
+        jx, jy = -dx / d, -dy / d
+
+        # Normal equations J^T J p = -J^T res, one 3x3 system per arc
+        jtj = np.empty((len(r), 3, 3))
+        jtj[:, 0, 0] = _segment_sum(jx * jx, offsets)
+        jtj[:, 0, 1] = jtj[:, 1, 0] = _segment_sum(jx * jy, offsets)
+        jtj[:, 1, 1] = _segment_sum(jy * jy, offsets)
+        jtj[:, 0, 2] = jtj[:, 2, 0] = -_segment_sum(jx, offsets)
+        jtj[:, 1, 2] = jtj[:, 2, 1] = -_segment_sum(jy, offsets)
+        jtj[:, 2, 2] = np.diff(offsets)
+        jtr = np.stack([
+            _segment_sum(jx * res, offsets),
+            _segment_sum(jy * res, offsets),
+            -_segment_sum(res, offsets),
+        ], axis=1)
+
+        active = ~converged
+        ok = active & (np.abs(np.linalg.det(jtj)) > 1e-12)
+        if not ok.any():
+            break
+        step = np.zeros((len(r), 3))
+        step[ok] = np.linalg.solve(jtj[ok], -jtr[ok][:, :, None])[:, :, 0]
+        xc, yc, r = xc + step[:, 0], yc + step[:, 1], r + step[:, 2]
+
+        scale = np.maximum(np.abs(r), 1.0)
+        converged |= ok & (np.abs(step).max(axis=1) <= GN_TOLERANCE * scale)
+        if converged.all():
+            break
+    return xc, yc, r, converged
+
+@timed("fit_circles")
+def fit_circles(points, offsets, residual_threshold=RESIDUAL_THRESHOLD):
+    """
+    Fit a circle to every arc in one pass.
+
+    `points` is an (N, 2) array holding the vertices of all arcs back to back and
+    `offsets` the (n_arcs + 1) start indices into it, so arc i is
+    points[offsets[i]:offsets[i+1]]. Arcs are seeded with a Taubin fit, refined
+    together with Gauss-Newton, and only arcs that did not converge or whose RMS
+    residual exceeds `residual_threshold` are refit with `fit_circle_radius`.
+
+    Returns a dict of arrays: arc_length, radius, curvature, angle (degrees),
+    residual (RMS, same units as the points) and refined (per-arc fallback used).
+    """
+    points = np.asarray(points, dtype=float)
+    offsets = np.asarray(offsets, dtype=np.int64)
+    counts = np.diff(offsets)
+    n_arcs = len(counts)
+    if n_arcs and counts.min() < 1:
+        raise ValueError("every arc needs at least one point")
+
+    arc_idx = np.repeat(np.arange(n_arcs), counts)
+    # Centre each arc on its mean to keep Web Mercator metres well conditioned
+    mean = _segment_sum(points, offsets) / counts[:, None]
+    u = points[:, 0] - mean[arc_idx, 0]
+    v = points[:, 1] - mean[arc_idx, 1]
+
+    xc, yc = _taubin(u, v, counts, offsets)
+    finite = np.isfinite(xc) & np.isfinite(yc)
+    xc = np.where(finite, xc, 0.0)
+    yc = np.where(finite, yc, 0.0)
+    r = _segment_sum(np.hypot(u - xc[arc_idx], v - yc[arc_idx]), offsets) / counts
+
+    xc, yc, r, converged = _gauss_newton(u, v, arc_idx, offsets, xc, yc, r)
+
+    res = np.hypot(u - xc[arc_idx], v - yc[arc_idx]) - r[arc_idx]
+    residual = np.sqrt(_segment_sum(res * res, offsets) / counts)
+
+    refine = ~converged | ~finite | ~np.isfinite(r) | (residual > residual_threshold)
+    count("arcs_fitted", n_arcs)
+    count("arcs_refined", int(refine.sum()))
+    for i in np.flatnonzero(refine):
+        arc = points[offsets[i]:offsets[i + 1]]
+        h, k, r[i] = _fit_circle_lsq(arc)
+        residual[i] = np.sqrt(np.mean((np.hypot(arc[:, 0] - h, arc[:, 1] - k) - r[i]) ** 2))
+
+    radius = np.where(r > 0, r, np.inf)
+    length = arc_lengths(points, offsets)
+    with np.errstate(divide='ignore'):
+        curvature = np.where(np.isfinite(radius), 1 / radius, 0.0)
+    angle = np.degrees(length * curvature)
+
+    return {
+        "arc_length": length,
+        "radius": radius,
+        "curvature": curvature,
+        "angle": angle,
+        "residual": residual,
+        "refined": refine,
+    }
@@ -0,0 +1,230 @@
+import hashlib
+import json
+import numpy as np
+from instrumentation import count, stage
+from network_stats import haversine
+from projection import to_local
+from spatial_index import SegmentGrid
+from track_store import TrackStore
+
+# ---------- CONFIG ----------
+INPUT_FILE = "mumbai_railways_updated.geojson"
+OUTPUT_FILE = "mumbai_railways_compacted.geojson"
+QUANTUM_DEG = 1e-7            # vertices equal after rounding to this (~1 cm) are the same point
+OVERLAP_TOLERANCE_M = 1.5     # track this close to another way lies on it; under half the ~4.5 m between parallel tracks
+MIN_OVERLAP_SHARE = 0.95      # ways with at least this share of their length on other track are dropped
+OVERLAP_SAMPLE_M = 10.0       # spacing of the points overlap is measured on
+OVERLAP_CELL_M = 25.0         # SegmentGrid cell; small, since queries only reach OVERLAP_TOLERANCE_M
+HAND_TRACED_IDS = (1, 99)     # feature ids of the "line added" track traced in QGIS; never removed as overlapping
+# ----------------------------
+
+# Removes the track that is stored more than once:
+#   1. repeated consecutive vertices within a way,
+#   2. ways with exactly the same vertices as an earlier way (in either direction),
+#   3. ways lying almost entirely on other ways, such as a way fetched through
+#      both the relation and the name filter of the Overpass query.
+# Points are compared after quantizing to QUANTUM_DEG, and overlaps are found
+# through a SegmentGrid in metres. When ways overlap, the longest one is kept.
+# The hand-traced features (ids HAND_TRACED_IDS) are left out of step 3: they
+# are the only track geojson-processing.py looks elevations up for and the
+# hand-drawn total of stats.py, even where they were traced over OSM track.
+# The pipeline compacts the network before elevations are looked up, so every
+# later stage reads the compacted track.
+
+def quantize(lon, lat, quantum=QUANTUM_DEG):
+    """Integer (lon, lat) grid coordinates, one row per vertex."""
+    return np.round(np.column_stack([lon, lat]) / quantum).astype(np.int64)
+
+def way_lengths(store):
+    """Length (m) of every way."""
+    i = store.segment_starts()
+    length = haversine(store.lat[i], store.lon[i], store.lat[i + 1], store.lon[i + 1])
+    return np.bincount(store.way_index()[i], weights=length, minlength=len(store))
+
+def repeated_vertices(store, quantum=QUANTUM_DEG):
+    """Mask of vertices equal to the vertex before them on the same way."""
+    q = quantize(store.lon, store.lat, quantum)
+    repeated = np.zeros(store.n_points, dtype=bool)
+    repeated[1:] = (q[1:] == q[:-1]).all(axis=1)
+    repeated[store.offsets[:-1][np.diff(store.offsets) > 0]] = False
+    return repeated
+
+def hand_traced(store, ids=HAND_TRACED_IDS):
+    """Mask of the ways whose feature id is in the inclusive range `ids`."""
+    return (store.way_ids >= ids[0]) & (store.way_ids <= ids[1])
+
+def duplicate_ways(store, quantum=QUANTUM_DEG):
+    """Mask of ways whose quantized vertices repeat an earlier way's, forwards or reversed."""
+    q = quantize(store.lon, store.lat, quantum)
+    seen = set()
+    duplicate = np.zeros(len(store), dtype=bool)
+    for i in range(len(store)):
+        vertices = q[store.offsets[i]:store.offsets[i + 1]]
+        forward, backward = vertices.tobytes(), vertices[::-1].tobytes()
+        key = hashlib.blake2b(min(forward, backward), digest_size=16).digest()
+        duplicate[i] = key in seen
+        seen.add(key)
+    return duplicate
+
+def _segment_samples(x, y, i, spacing):
+    """Points every `spacing` m or closer along the segments starting at vertices i, ends and middle included."""
+    length = np.hypot(x[i + 1] - x[i], y[i + 1] - y[i])
+    n = np.maximum(np.ceil(length / spacing).astype(np.int64) + 1, 3)
+    segment = np.repeat(np.arange(len(i)), n)
+    t = (np.arange(n.sum()) - np.repeat(np.cumsum(n) - n, n)) / (n[segment] - 1)
+    a, b = i[segment], i[segment] + 1
+    return x[a] + t * (x[b] - x[a]), y[a] + t * (y[b] - y[a]), segment
+
+def overlapping_ways(store, removed, tolerance=OVERLAP_TOLERANCE_M, min_share=MIN_OVERLAP_SHARE,
+                     spacing=OVERLAP_SAMPLE_M):
+    """
+    Mask of the ways that lie on other kept ways for at least `min_share` of
+    their length; ways already `removed` are neither measured nor cover
+    others. Ways are decided longest first, and a way is only measured against
+    ways already kept, so two copies of the same track never remove each other.
+
+    Coverage is measured on points sampled along the segments, not just on the
+    vertices: a short way between two others shares its end nodes with them
+    without lying on either. Only ways with at least half their vertices on
+    other track are sampled.
+    """
+    dropped = np.zeros(len(store), dtype=bool)
+    i = store.segment_starts()
+    if len(i) == 0:
+        return dropped
+    x, y = to_local(store.lon, store.lat, store.lon.mean(), store.lat.mean())
+    vertex_way = store.way_index()
+    segment_way = vertex_way[i]
+    grid = SegmentGrid(x[i], y[i], x[i + 1], y[i + 1], cell_size=OVERLAP_CELL_M)
+
+    with stage("overlap_query"):
+        vertex, segment, _ = grid.within(x, y, tolerance)
+        near = np.zeros(store.n_points)
+        other = (vertex_way[vertex] != segment_way[segment]) & ~removed[segment_way[segment]]
+        near[vertex[other]] = 1.0
+        with np.errstate(invalid="ignore"):
+            near_share = np.bincount(vertex_way, weights=near, minlength=len(store)) / np.diff(store.offsets)
+        candidates = ~removed & (near_share >= 0.5)
+
+        # Sample the segments of the remaining candidates only
+        measured = np.flatnonzero(candidates[segment_way])
+        sx, sy, sample_segment = _segment_samples(x, y, i[measured], spacing)
+        sample_segment = measured[sample_segment]
+        sample, segment, _ = grid.within(sx, sy, tolerance)
+    own_way = segment_way[sample_segment]
+    other = (own_way[sample] != segment_way[segment]) & ~removed[segment_way[segment]]
+    sample, cover = sample[other], segment_way[segment[other]]
+
+    # (sample, covering way) pairs and samples, both grouped by the way sampled
+    order = np.argsort(own_way[sample], kind="stable")
+    sample, cover = sample[order], cover[order]
+    pair_bounds = np.searchsorted(own_way[sample], np.arange(len(store) + 1))
+    sample_bounds = np.searchsorted(own_way, np.arange(len(store) + 1))
+    segment_bounds = np.searchsorted(segment_way, np.arange(len(store) + 1))
+    segment_length = haversine(store.lat[i], store.lon[i], store.lat[i + 1], store.lon[i + 1])
+    lengths = np.bincount(segment_way, weights=segment_length, minlength=len(store))
+
+    kept = ~candidates & ~removed
+    for w in np.lexsort((np.arange(len(store)), -lengths)):
+        if not candidates[w]:
+            continue
+        pairs = slice(pair_bounds[w], pair_bounds[w + 1])
+        first_sample, first_segment = sample_bounds[w], segment_bounds[w]
+        on_track = np.zeros(sample_bounds[w + 1] - first_sample, dtype=bool)
+        on_track[sample[pairs][kept[cover[pairs]]] - first_sample] = True
+        # Each segment counts for the share of its samples on other track
+        local_segment = sample_segment[first_sample:sample_bounds[w + 1]] - first_segment
+        share = (np.bincount(local_segment, weights=on_track, minlength=segment_bounds[w + 1] - first_segment)
+                 / np.bincount(local_segment, minlength=segment_bounds[w + 1] - first_segment))
+        covered = (share * segment_length[first_segment:segment_bounds[w + 1]]).sum()
+        if lengths[w] > 0 and covered >= min_share * lengths[w]:
+            dropped[w] = True
+        else:
+            kept[w] = True
+    return dropped
+
+def subset_ways(store, keep_vertex, keep_way):
+    """A TrackStore of the kept ways, each holding only its kept vertices."""
+    keep_vertex = keep_vertex & keep_way[store.way_index()]
+    kept = np.flatnonzero(keep_vertex)
+    offsets = np.searchsorted(kept, store.offsets)[np.r_[True, keep_way]]
+    return TrackStore(
+        store.lon[kept], store.lat[kept], store.elevation[kept], offsets,
+        store.way_ids[keep_way], [name for name, k in zip(store.names, keep_way) if k],
+        None if store.node_ids is None else store.node_ids[kept],
+    )
+
+def compact(store, quantum=QUANTUM_DEG, tolerance=OVERLAP_TOLERANCE_M, min_share=MIN_OVERLAP_SHARE,
+            hand_traced_ids=HAND_TRACED_IDS):
+    """
+    Compacted copy of a TrackStore and a report of what was removed. Ways with
+    ids in `hand_traced_ids` are neither removed as overlapping nor remove
+    others; pass None to treat them like any other way.
+    """
+    lengths = way_lengths(store)
+    keep_way = np.ones(len(store), dtype=bool)
+
+    repeated = repeated_vertices(store, quantum)
+    store = subset_ways(store, ~repeated, keep_way)
+    # Ways left with a single point have no track to keep
+    degenerate = np.diff(store.offsets) < 2
+    duplicate = duplicate_ways(store, quantum) & ~degenerate
+    traced = hand_traced(store, hand_traced_ids) if hand_traced_ids else np.zeros(len(store), dtype=bool)
+    overlapping = overlapping_ways(store, degenerate | duplicate | traced, tolerance, min_share)
+    keep_way = ~(degenerate | duplicate | overlapping)
+    compacted = subset_ways(store, np.ones(store.n_points, dtype=bool), keep_way)
+
+    counts = np.diff(store.offsets)
+    report = {
+        "ways": len(lengths),
+        "vertices": int(len(repeated)),
+        "length_m": float(lengths.sum()),
+        "repeated_vertices": int(repeated.sum()),
+        "degenerate_ways": int(degenerate.sum()),
+        "duplicate_ways": int(duplicate.sum()),
+        "duplicate_vertices": int(counts[duplicate].sum()),
+        "duplicate_m": float(lengths[duplicate].sum()),
+        "overlapping_ways": int(overlapping.sum()),
+        "overlapping_vertices": int(counts[overlapping].sum()),
+        "overlapping_m": float(lengths[overlapping].sum()),
+        "hand_traced_ways": int((traced & keep_way).sum()),
+        "kept_ways": len(compacted),
+        "kept_vertices": compacted.n_points,
+        "kept_length_m": float(lengths[keep_way].sum()),
+    }
+    count("repeated_vertices", report["repeated_vertices"])
+    count("duplicate_ways", report["duplicate_ways"])
+    count("overlapping_ways", report["overlapping_ways"])
+    return compacted, report
+
+def format_report(report):
+    removed = report["vertices"] - report["kept_vertices"]
+    share = removed / report["vertices"] if report["vertices"] else 0.0
+    return "\n".join([
+        f"Compacted {report['ways']} -> {report['kept_ways']} ways, {report['vertices']} -> "
+        f"{report['kept_vertices']} vertices ({share:.1%} fewer), "
+        f"{report['length_m'] / 1000:.3f} -> {report['kept_length_m'] / 1000:.3f} km",
+        f"  repeated vertices: {report['repeated_vertices']}",
+        f"  duplicate ways: {report['duplicate_ways']} ({report['duplicate_vertices']} vertices, "
+        f"{report['duplicate_m']:.1f} m)",
+        f"  overlapping ways: {report['overlapping_ways']} ({report['overlapping_vertices']} vertices, "
+        f"{report['overlapping_m']:.1f} m)",
+        f"  ways left with under two vertices: {report['degenerate_ways']}",
+        f"  hand-traced ways kept without an overlap check: {report['hand_traced_ways']}",
+    ])
+
+def compact_geojson(input_path=INPUT_FILE, output_path=OUTPUT_FILE, tolerance=OVERLAP_TOLERANCE_M,
+                    min_share=MIN_OVERLAP_SHARE):
+    """Write the compacted network in `input_path` to `output_path`. Returns the report."""
+    store = TrackStore.load(input_path)
+    count("points", store.n_points)
+    with stage("compact"):
+        compacted, report = compact(store, tolerance=tolerance, min_share=min_share)
+    print(format_report(report))
+    with stage("save"), open(output_path, "w") as f:
+        json.dump(compacted.to_geojson(), f, indent=2)
+    print(f"Compacted network saved to {output_path}")
+    return report
+
+if __name__ == "__main__":
+    compact_geojson()
@@ -1,7 +1,12 @@
 from qgis.PyQt.QtWidgets import QAction, QFileDialog, QMessageBox
 from qgis.PyQt.QtGui import QIcon
 from qgis.core import *
-import math, csv, os
+import os, sys
+
+# The measuring modules live next to this script; __file__ is not set when run from the QGIS console
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)) if "__file__" in globals() else os.getcwd())
+from arc_curvature import MIN_ARC_VERTICES, measure_arcs
+from arc_store import append_arcs
 
 # =====================
 # Global Variables
@@ -25,87 +30,129 @@ def create_drawing_layer():
         QgsField("arc_len_m", QVariant.Double),
         QgsField("radius_m", QVariant.Double),
         QgsField("curvature_1pm", QVariant.Double),
-        QgsField("angle_deg", QVariant.Double)
+        QgsField("angle_deg", QVariant.Double),
+        QgsField("arc_id", QVariant.Int)  # set once the arc is in the arc tables
     ])
     drawn_layer.updateFields()
     QgsProject.instance().addMapLayer(drawn_layer)
     iface.setActiveLayer(drawn_layer)
 
-def fit_circle_radius(points):
-    """Fit circle using first, middle, and last points"""
-    p1, p2, p3 = points[0], points[len(points)//2], points[-1]
-    A = math.dist(p2, p3)
-    B = math.dist(p1, p3)
-    C = math.dist(p1, p2)
-    s = (A + B + C) / 2
-    area = math.sqrt(max(s*(s-A)*(s-B)*(s-C), 0))
-    return (A * B * C) / (4 * area) if area != 0 else float('inf')
+def layer_arcs(feature_request=None):
+    """
+    (feature IDs, vertex lists in EPSG:3857, whether each is already saved) of the
+    drawing layer, in one pass over its features.
+    """
+    xform = QgsCoordinateTransform(drawn_layer.crs(), target_crs, QgsProject.instance())
+    fids, arcs, saved = [], [], []
+    for feat in drawn_layer.getFeatures(feature_request or QgsFeatureRequest()):
+        geom_m = feat.geometry()
+        geom_m.transform(xform)
+        fids.append(feat.id())
+        arcs.append([(p.x(), p.y()) for p in geom_m.asPolyline()])
+        saved.append(feat["arc_id"] not in (None, NULL))
+    return fids, arcs, saved
+
+def choose_save_file():
+    """Ask once per session for the arc table prefix that measured arcs are appended to."""
+    global save_file
+    if save_file is None:
+        path, _ = QFileDialog.getSaveFileName(None, "Select Arc Table Save Location", "", "Arc tables (*.arcs.csv)")
+        if path:
+            save_file = path[:-len(".arcs.csv")] if path.endswith(".arcs.csv") else os.path.splitext(path)[0]
+    return save_file
+
+def store_results(fids, arcs, fit):
+    """
+    Append the arcs to the arc tables and write the fit and the new Arc IDs onto
+    the layer features, each in one batch.
+    """
+    rows = [
+        {
+            "Arc Length (m)": fit["arc_length"][i],
+            "Radius (m)": fit["radius"][i],
+            "Curvature (1/m)": fit["curvature"][i],
+            "Angle (deg)": fit["angle"][i],
+        }
+        for i in range(len(fids))
+    ]
+    arc_ids = append_arcs(save_file, rows, arcs)
+
+    fields = drawn_layer.fields()
+    names = ["arc_len_m", "radius_m", "curvature_1pm", "angle_deg"]
+    keys = ["arc_length", "radius", "curvature", "angle"]
+    changes = {
+        fid: {**{fields.indexOf(name): float(fit[key][i]) for name, key in zip(names, keys)},
+              fields.indexOf("arc_id"): arc_ids[i]}
+        for i, fid in enumerate(fids)
+    }
+    drawn_layer.dataProvider().changeAttributeValues(changes)
+    drawn_layer.triggerRepaint()
 
 def calculate_curvature():
     """Calculate curvature of the most recently drawn arc"""
-    global save_file
     if drawn_layer is None or drawn_layer.featureCount() == 0:
         QMessageBox.warning(None, "No Arc", "Please draw an arc first!")
         return
 
-    # Find the most recent feature by highest feature ID
-    last_fid = max(f.id() for f in drawn_layer.getFeatures())
-    feat = drawn_layer.getFeature(last_fid)
-
-    # Transform geometry to meters CRS
-    xform = QgsCoordinateTransform(drawn_layer.crs(), target_crs, QgsProject.instance())
-    geom_m = feat.geometry()
-    geom_m.transform(xform)
-    coords = geom_m.asPolyline()
+    # Find the most recent feature by highest feature ID, without fetching geometries
+    id_request = QgsFeatureRequest().setFlags(QgsFeatureRequest.NoGeometry).setNoAttributes()
+    last_fid = max(f.id() for f in drawn_layer.getFeatures(id_request))
+    fids, arcs, saved = layer_arcs(QgsFeatureRequest(last_fid))
 
-    if len(coords) < 3:
+    if saved[0]:
+        QMessageBox.information(None, "Already saved", f"The last arc is already in {save_file}.arcs.csv.")
+        return
+    if len(arcs[0]) < MIN_ARC_VERTICES:
         QMessageBox.warning(None, "Too few points", "Draw at least 3 points for curvature calculation.")
         return
+    if not choose_save_file():
+        return
 
-    # Arc length in meters
-    arc_length = sum(math.dist(coords[i], coords[i+1]) for i in range(len(coords)-1))
-    # Radius & Curvature
-    R = fit_circle_radius(coords)
-    curvature = 1/R if R != float('inf') else 0
-    # Angle in degrees
-    angle_deg = (arc_length / R) * (180 / math.pi) if R != float('inf') else 0
-
-    # Update attributes
-    drawn_layer.startEditing()
-    feat['arc_len_m'] = arc_length
-    feat['radius_m'] = R
-    feat['curvature_1pm'] = curvature
-    feat['angle_deg'] = angle_deg
-    drawn_layer.updateFeature(feat)
-    drawn_layer.commitChanges()
-
-    # Save to CSV
-    if save_file is None:
-        save_file, _ = QFileDialog.getSaveFileName(None, "Select CSV Save Location", "", "CSV Files (*.csv)")
-        if not save_file:
-            return
-        with open(save_file, 'w', newline='') as f:
-            writer = csv.writer(f)
-            writer.writerow(["Arc Length (m)", "Radius (m)", "Curvature (1/m)", "Angle (deg)", "Coordinates"])
-
-    with open(save_file, 'a', newline='') as f:
-        writer = csv.writer(f)
-        writer.writerow([arc_length, R, curvature, angle_deg, coords])
+    _, fit = measure_arcs(arcs)
+    store_results(fids, arcs, fit)
+    arc_length, R, curvature, angle_deg = (fit[k][0] for k in ("arc_length", "radius", "curvature", "angle"))
 
     QMessageBox.information(None, "Curvature", 
         f"Arc length: {arc_length:.3f} m\n"
         f"Radius: {R:.3f} m\n"
         f"Curvature: {curvature:.5f} 1/m\n"
         f"Angle: {angle_deg:.3f}°\n"
-        f"Saved to CSV.")
+        f"Saved to {save_file}.arcs.csv.")
 
     # OPTIONAL: Uncomment this to auto-delete older arcs so only the last remains
     drawn_layer.startEditing()
-    for f in drawn_layer.getFeatures():
+    for f in drawn_layer.getFeatures(id_request):
         if f.id() != last_fid:
             drawn_layer.deleteFeature(f.id())
     drawn_layer.commitChanges()
 
+def calculate_all_curvatures():
+    """Measure every arc on the drawing layer in one batch"""
+    if drawn_layer is None or drawn_layer.featureCount() == 0:
+        QMessageBox.warning(None, "No Arc", "Please draw an arc first!")
+        return
+    if not choose_save_file():
+        return
+
+    # Arcs already saved, by "Find Curvature" or an earlier click, are not appended twice
+    fids, arcs, saved = layer_arcs()
+    n_saved = sum(saved)
+    fids = [fid for fid, done in zip(fids, saved) if not done]
+    arcs = [coords for coords, done in zip(arcs, saved) if not done]
+    if not arcs:
+        QMessageBox.information(None, "Curvature", f"All {n_saved} arcs are already saved to {save_file}.arcs.csv.")
+        return
+    keep, fit = measure_arcs(arcs)
+    if not keep:
+        QMessageBox.warning(None, "Too few points", "No new arc has the 3 points needed for curvature calculation.")
+        return
+    store_results([fids[i] for i in keep], [arcs[i] for i in keep], fit)
+
+    QMessageBox.information(None, "Curvature",
+        f"Measured {len(keep)} arcs, skipped {len(arcs) - len(keep)} with fewer than 3 points "
+        f"and {n_saved} already saved.\n"
+        f"Saved to {save_file}.arcs.csv.")
+
 def reset_layer():
     """Clear all drawn arcs"""
     if drawn_layer:
@@ -129,6 +176,11 @@ curv_action = QAction(QIcon(), "Find Curvature", iface.mainWindow())
 curv_action.triggered.connect(calculate_curvature)
 toolbar.addAction(curv_action)
 
+# Compute all arcs on the layer
+all_action = QAction(QIcon(), "Compute All Arcs", iface.mainWindow())
+all_action.triggered.connect(calculate_all_curvatures)
+toolbar.addAction(all_action)
+
 # Reset
 reset_action = QAction(QIcon(), "Reset", iface.mainWindow())
 reset_action.triggered.connect(reset_layer)
@@ -0,0 +1,38 @@
+import numpy as np
+
+# ---------- CONFIG ----------
+WINDOW_M = 60.0          # half-length (m) of the sliding chord used for curvature
+MAX_RADIUS_M = 5000.0    # anything flatter than this is treated as tangent track
+# ----------------------------
+
+# Curvature along the track, shared by curve detection and the simplifier,
+# which keeps the vertices curve detection would use.
+
+def vertex_curvature(points, offsets, window=WINDOW_M):
+    """
+    Signed curvature (1/m) at every vertex from the circle through the vertex and
+    the points `window` metres before and after it along the same way.
+    """
+    n = len(points)
+    way_idx = np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+    first = offsets[:-1][way_idx]
+    last = offsets[1:][way_idx] - 1
+
+    # Global chainage that does not advance across way boundaries
+    step = np.hypot(*np.diff(points, axis=0).T) if n > 1 else np.zeros(0)
+    step[offsets[1:-1] - 1] = 0.0
+    chainage = np.concatenate([[0.0], np.cumsum(step)])
+
+    before = np.clip(np.searchsorted(chainage, chainage - window, side="right") - 1, first, last)
+    after = np.clip(np.searchsorted(chainage, chainage + window, side="left"), first, last)
+
+    p0, p1, p2 = points[before], points, points[after]
+    a = np.hypot(*(p1 - p0).T)
+    b = np.hypot(*(p2 - p1).T)
+    c = np.hypot(*(p2 - p0).T)
+    cross = (p1[:, 0] - p0[:, 0]) * (p2[:, 1] - p0[:, 1]) - (p1[:, 1] - p0[:, 1]) * (p2[:, 0] - p0[:, 0])
+    denom = a * b * c
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # Menger curvature: 4 * triangle area / product of the side lengths
+        kappa = np.where(denom > 0, 2 * cross / denom, 0.0)
+    return kappa
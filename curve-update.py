@@ -1,70 +1,44 @@
-import csv
-import ast
-import math
-import numpy as np
-from scipy.optimize import least_squares
-import re
-
-def fit_circle_radius(points):
-    """Fit circle to all points using least squares and return radius."""
-    points = np.array(points)
-    x = points[:, 0]
-    y = points[:, 1]
-    
-    def calc_radius(params, x, y):
-        h, k, r = params
-        return np.sqrt((x - h)**2 + (y - k)**2) - r
-
-    x_m, y_m = np.mean(x), np.mean(y)
-    r_m = np.mean(np.sqrt((x - x_m)**2 + (y - y_m)**2))
-    initial_guess = [x_m, y_m, r_m]
-
-    result = least_squares(calc_radius, initial_guess, args=(x, y))
-    h, k, r = result.x
-
-    if r <= 0:
-        return float('inf')
-    return r
-
-def calculate_arc_length(coords):
-    """Calculate total arc length given a list of (x,y) points"""
-    length = 0
-    for i in range(len(coords)-1):
-        length += math.dist(coords[i], coords[i+1])
-    return length
-
-def parse_qgspointxy_list(s):
-    points = re.findall(r'POINT\(([-\d\.]+) ([-\d\.]+)\)', s)
-    return [(float(x), float(y)) for x, y in points]
-
-def update_curve_csv(input_csv, output_csv=None):
-    if output_csv is None:
-        output_csv = input_csv
-
-    with open(input_csv, 'r', newline='') as f:
-        reader = csv.DictReader(f)
-        rows = list(reader)
-
-    with open(output_csv, 'w', newline='') as f:
-        fieldnames = reader.fieldnames
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        writer.writeheader()
-
-        for row in rows:
-            coords = parse_qgspointxy_list(row["Coordinates"])
-            arc_length = calculate_arc_length(coords)
-            R = fit_circle_radius(coords)
-            curvature = 1/R if R != float('inf') else 0
-            angle_deg = (arc_length / R) * (180 / math.pi) if R != float('inf') else 0
-
-            row["Arc Length (m)"] = f"{arc_length:.6f}"
-            row["Radius (m)"] = f"{R:.6f}"
-            row["Curvature (1/m)"] = f"{curvature:.8f}"
-            row["Angle (deg)"] = f"{angle_deg:.6f}"
-
-            writer.writerow(row)
-
-    print(f"Updated CSV saved to {output_csv}")
-
-update_curve_csv('curve.csv', 'curve-updated.csv')
-
+from arc_curvature import fit_columns, fit_mercator_arcs
+from arc_store import ArcStore
+from curve_snapping import TrackSnapper
+from instrumentation import count, stage
+from projection import mercator_to_lonlat
+from track_store import TrackStore
+
+TRACK_FILE = "mumbai_railways_updated_with_elevations.geojson"
+SNAP_COLUMNS = ["Way ID", "Line", "Chainage Start (m)", "Chainage End (m)"]
+
+def update_curve_csv(input_prefix, output_prefix=None, legacy_csv=None, track_path=TRACK_FILE):
+    if output_prefix is None:
+        output_prefix = input_prefix
+
+    # Vertices load straight into flat arrays, so all circles are fitted together
+    with stage("load_arcs"):
+        arcs = ArcStore.load(input_prefix)
+    count("arcs", len(arcs))
+    fit = fit_mercator_arcs(arcs.x, arcs.y, arcs.offsets)
+
+    # Tie every arc to the way it was traced on
+    store = TrackStore.load(track_path)
+    lon, lat = mercator_to_lonlat(arcs.x, arcs.y)
+    with stage("snap"):
+        arc_way, chainage_start, chainage_end = TrackSnapper(store).snap_arcs(lon, lat, arcs.offsets)
+    count("arcs_unsnapped", int((arc_way < 0).sum()))
+
+    arcs.columns.update(fit_columns(fit))
+    snapped = arc_way >= 0
+    arcs.columns["Way ID"] = [store.way_ids[w] if ok else "" for w, ok in zip(arc_way, snapped)]
+    arcs.columns["Line"] = [store.names[w] if ok else "" for w, ok in zip(arc_way, snapped)]
+    arcs.columns["Chainage Start (m)"] = [f"{c:.1f}" if ok else "" for c, ok in zip(chainage_start, snapped)]
+    arcs.columns["Chainage End (m)"] = [f"{c:.1f}" if ok else "" for c, ok in zip(chainage_end, snapped)]
+
+    with stage("save"):
+        arcs.save(output_prefix)
+        if legacy_csv is not None:
+            arcs.to_qgis_csv(legacy_csv)
+
+    print(f"Updated arcs saved to {output_prefix}.arcs.csv ({int(fit['refined'].sum())} of {len(arcs)} arcs refined individually)")
+
+if __name__ == "__main__":
+    # curve-updated.csv keeps the old single-file layout for the download link on the site
+    update_curve_csv('curve', 'curve-updated', legacy_csv='curve-updated.csv')
@@ -0,0 +1,111 @@
+import csv
+import numpy as np
+from circle_fit import fit_circles
+from curvature import MAX_RADIUS_M, vertex_curvature
+from instrumentation import count, stage
+from parallel import SHARD_VERTICES, WORKERS, run_sharded, shard_store, store_arrays
+from projection import local_frames, lonlat_to_mercator
+from simplify import CURVE_TOLERANCE_M, format_report, simplify_store
+from track_store import TrackStore
+
+# ---------- CONFIG ----------
+INPUT_FILE = "mumbai_railways_updated_with_elevations.geojson"
+OUTPUT_FILE = "curve-detected.csv"
+MIN_CURVE_VERTICES = 3   # shorter curvature runs are dropped as noise
+# ----------------------------
+
+def split_segments(kappa, offsets, max_radius=MAX_RADIUS_M, min_vertices=MIN_CURVE_VERTICES):
+    """
+    Split every way into runs of tangent and curved vertices.
+
+    Returns (starts, ends, is_curve) where segment j covers vertices
+    starts[j]..ends[j] inclusive. Curves are extended by one vertex on each side
+    so they begin and end on the neighbouring tangent points.
+    """
+    n = len(kappa)
+    key = np.where(np.abs(kappa) >= 1 / max_radius, np.sign(kappa), 0).astype(np.int8)
+
+    boundary = np.zeros(n, dtype=bool)
+    boundary[offsets[:-1][np.diff(offsets) > 0]] = True
+    boundary[1:] |= key[1:] != key[:-1]
+    starts = np.flatnonzero(boundary)
+    ends = np.append(starts[1:], n) - 1
+
+    is_curve = (key[starts] != 0) & (ends - starts + 1 >= min_vertices)
+
+    way_idx = np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+    first = offsets[:-1][way_idx[starts]]
+    last = offsets[1:][way_idx[starts]] - 1
+    starts = np.where(is_curve, np.maximum(starts - 1, first), starts)
+    ends = np.where(is_curve, np.minimum(ends + 1, last), ends)
+    return starts, ends, is_curve
+
+def find_curves(store):
+    """
+    First and last vertex of every curve in a TrackStore and its circle fit.
+    Curvature and fits are computed in a local metric frame per way.
+    """
+    lx, ly, _, _ = local_frames(store.lon, store.lat, store.offsets)
+    local = np.column_stack([lx, ly])
+
+    kappa = vertex_curvature(local, store.offsets)
+    starts, ends, is_curve = split_segments(kappa, store.offsets)
+    starts, ends = starts[is_curve], ends[is_curve]
+
+    lengths = ends - starts + 1
+    curve_offsets = np.concatenate([[0], np.cumsum(lengths)])
+    idx = np.arange(curve_offsets[-1]) - np.repeat(curve_offsets[:-1] - starts, lengths)
+    fit = fit_circles(local[idx], curve_offsets)
+    return starts, ends, fit
+
+def _find_curves_shard(shard):
+    starts, ends, fit = find_curves(shard_store(shard))
+    return starts + shard["first_vertex"], ends + shard["first_vertex"], fit
+
+def detect_curves(store, workers=WORKERS, shard_vertices=SHARD_VERTICES):
+    """
+    find_curves() with the points as EPSG:3857 for the CSV. With more than one
+    worker the ways are sharded across processes; every way is handled on its
+    own, so the result is the same.
+    """
+    if workers == 1:
+        starts, ends, fit = find_curves(store)
+    else:
+        vertex, item = store_arrays(store)
+        shards = run_sharded(_find_curves_shard, vertex, item, store.offsets, workers, shard_vertices)
+        starts = np.concatenate([s for s, _, _ in shards])
+        ends = np.concatenate([e for _, e, _ in shards])
+        fit = {key: np.concatenate([f[key] for _, _, f in shards]) for key in shards[0][2]}
+    x, y = lonlat_to_mercator(store.lon, store.lat)
+    return np.column_stack([x, y]), starts, ends, fit
+
+def write_curve_csv(path, points, starts, ends, fit):
+    """Write curves with the same columns curve-update.py produces."""
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Arc Length (m)", "Radius (m)", "Curvature (1/m)", "Angle (deg)", "Coordinates"])
+        for i, (s, e) in enumerate(zip(starts, ends)):
+            coords = ", ".join(f"<QgsPointXY: POINT({px!r} {py!r})>" for px, py in points[s:e + 1].tolist())
+            writer.writerow([
+                f"{fit['arc_length'][i]:.6f}",
+                f"{fit['radius'][i]:.6f}",
+                f"{fit['curvature'][i]:.8f}",
+                f"{fit['angle'][i]:.6f}",
+                f"[{coords}]",
+            ])
+
+def detect_to_csv(input_path=INPUT_FILE, output_path=OUTPUT_FILE, workers=WORKERS):
+    """Detect the curves of the network in `input_path` and save them to `output_path`."""
+    store = TrackStore.load(input_path)
+    count("points", store.n_points)
+    with stage("simplify"):
+        store, simplify_report = simplify_store(store, CURVE_TOLERANCE_M)
+    print(format_report(simplify_report))
+    with stage("detect"):
+        points, starts, ends, fit = detect_curves(store, workers)
+    with stage("save"):
+        write_curve_csv(output_path, points, starts, ends, fit)
+    print(f"Detected {len(starts)} curves over {len(store)} ways, saved to {output_path}")
+
+if __name__ == "__main__":
+    detect_to_csv()
@@ -0,0 +1,176 @@
+import numpy as np
+from network_graph import NetworkGraph
+from network_stats import haversine
+from projection import to_local
+from spatial_index import SegmentGrid, point_segment_distance
+
+# ---------- CONFIG ----------
+SNAP_DISTANCE_M = 100.0   # arcs further than this from any way are left unsnapped
+# ----------------------------
+
+class TrackSnapper:
+    """
+    Snaps points onto the ways of a TrackStore through a SegmentGrid built in a
+    local equirectangular frame (metres) centred on the network.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self.lat0 = store.lat.mean()
+        self.lon0 = store.lon.mean()
+
+        i = store.segment_starts()
+        self.segment_start = i
+        self.segment_way = store.way_index()[i]
+        x, y = self.project(store.lon, store.lat)
+        self.grid = SegmentGrid(x[i], y[i], x[i + 1], y[i + 1])
+
+        # Chainage (m) of every vertex measured from the start of its way
+        step = np.zeros(store.n_points)
+        step[i + 1] = haversine(store.lat[i], store.lon[i], store.lat[i + 1], store.lon[i + 1])
+        cumulative = np.cumsum(step)
+        self.chainage = cumulative - cumulative[store.offsets[:-1]][store.way_index()]
+        self.segment_length = step[i + 1]
+        self.graph = None
+
+    def project(self, lon, lat):
+        return to_local(lon, lat, self.lon0, self.lat0)
+
+    def snap_points(self, lon, lat, max_distance=SNAP_DISTANCE_M):
+        """(way index, chainage m, offset m) for every point; way is -1 where nothing is close enough."""
+        x, y = self.project(np.asarray(lon, dtype=float), np.asarray(lat, dtype=float))
+        segment, distance, t = self.grid.nearest(x, y, max_distance)
+        found = segment >= 0
+        way = np.full(len(segment), -1, dtype=np.int64)
+        chainage = np.full(len(segment), np.nan)
+        way[found] = self.segment_way[segment[found]]
+        seg = segment[found]
+        chainage[found] = self.chainage[self.segment_start[seg]] + t[found] * self.segment_length[seg]
+        return way, chainage, distance
+
+    def _line_chainage(self, x, y, arc, arc_way, max_distance):
+        """
+        Chainage (m) of every arc vertex along its arc's way, continued onto the
+        track connected to it: negative before the way's start, past its length
+        after its end. A vertex alongside the way is projected onto it, even when
+        a parallel track is closer; one beyond its ends goes to the nearest track
+        reachable from them within the arc's length. NaN where there is neither.
+        """
+        if self.graph is None:
+            self.graph, self.node = NetworkGraph.from_store(self.store)
+        n_arcs = len(arc_way)
+        step = np.hypot(np.diff(x), np.diff(y))
+        same = arc[1:] == arc[:-1]
+        arc_length = np.bincount(arc[:-1][same], weights=step[same], minlength=n_arcs)
+        u = self.node[self.segment_start]
+        v = self.node[self.segment_start + 1]
+
+        # Every segment near every vertex, grouped by the way of the vertex's arc
+        q, s, d = self.grid.within(x, y, max_distance)
+        key = arc_way[arc[q]]
+        order = np.argsort(key, kind="stable")
+        q, s, d, key = q[order], s[order], d[order], key[order]
+        chainage = np.full(len(x), np.nan)
+        alongside_way = np.zeros(len(x), dtype=bool)
+        for w in np.unique(key[key >= 0]):
+            group = slice(np.searchsorted(key, w), np.searchsorted(key, w, side="right"))
+            gq, gs, gd = q[group], s[group], d[group]
+            first, last = self.store.offsets[w], self.store.offsets[w + 1] - 1
+            length = self.chainage[last]
+            limit = arc_length[arc_way == w].max() + 2 * max_distance
+            # Distances from the way's start (row 0) and end (row 1)
+            dist = self.graph.distances([self.node[first], self.node[last]], limit=limit)
+            reachable = ((self.segment_way[gs] == w)
+                         | np.isfinite(np.minimum(dist[:, u[gs]], dist[:, v[gs]])).any(axis=0))
+            gq, gs, gd = gq[reachable], gs[reachable], gd[reachable]
+            nearest = _nearest_per_query(gq, gd)
+            gq, gs = gq[nearest], gs[nearest]
+
+            _, t = point_segment_distance(x[gq], y[gq], self.grid.ax[gs], self.grid.ay[gs],
+                                          self.grid.bx[gs], self.grid.by[gs])
+            along = t * self.segment_length[gs]
+            back = self.segment_length[gs] - along
+            to_start = np.minimum(dist[0, u[gs]] + along, dist[0, v[gs]] + back)
+            to_end = np.minimum(dist[1, u[gs]] + along, dist[1, v[gs]] + back)
+            with np.errstate(invalid="ignore"):
+                # Past an end when the way to the other end leads through it (1 m of slack);
+                # otherwise on track branching off the way, placed between the two
+                chainage[gq] = np.select(
+                    [self.segment_way[gs] == w, to_start >= length + to_end - 1.0, to_end >= length + to_start - 1.0],
+                    [self.chainage[self.segment_start[gs]] + along, length + to_end, -to_start],
+                    (to_start - to_end + length) / 2)
+
+            # Vertices alongside the way: projected onto it, not onto the parallel track they were closer to
+            own = self.segment_way[s[group]] == w
+            oq, os_, od = q[group][own], s[group][own], d[group][own]
+            nearest = _nearest_per_query(oq, od)
+            oq, os_ = oq[nearest], os_[nearest]
+            _, t = point_segment_distance(x[oq], y[oq], self.grid.ax[os_], self.grid.ay[os_],
+                                          self.grid.bx[os_], self.grid.by[os_])
+            past_start = (self.segment_start[os_] == first) & (t == 0)
+            past_end = (self.segment_start[os_] == last - 1) & (t == 1)
+            alongside = ~past_start & ~past_end
+            chainage[oq[alongside]] = (self.chainage[self.segment_start[os_]] + t * self.segment_length[os_])[alongside]
+            alongside_way[oq[alongside]] = True
+
+        # Track reached by a detour, such as a parallel track joined by a crossover far
+        # away, gives chainage the arc cannot span: the other vertices have to stay
+        # within reach of the nearest vertex alongside the way, measured along the arc
+        idx = np.arange(len(x))
+        along_arc = np.concatenate([[0.0], np.cumsum(step)])
+        prev = np.maximum.accumulate(np.where(alongside_way, idx, -1))
+        nxt = np.minimum.accumulate(np.where(alongside_way, idx, len(x))[::-1])[::-1]
+        has_prev = (prev >= 0) & (arc[np.maximum(prev, 0)] == arc)
+        has_next = (nxt < len(x)) & (arc[np.minimum(nxt, len(x) - 1)] == arc)
+        gap_prev = np.where(has_prev, along_arc - along_arc[np.maximum(prev, 0)], np.inf)
+        gap_next = np.where(has_next, along_arc[np.minimum(nxt, len(x) - 1)] - along_arc, np.inf)
+        anchor = np.where(gap_prev <= gap_next, np.maximum(prev, 0), np.minimum(nxt, len(x) - 1))
+        gap = np.minimum(gap_prev, gap_next)
+        with np.errstate(invalid="ignore"):
+            detour = (~alongside_way & np.isfinite(gap)
+                      & (np.abs(chainage - chainage[anchor]) > 1.25 * gap + max_distance))
+        chainage[detour] = np.nan
+        return chainage
+
+    def snap_arcs(self, lon, lat, offsets, max_distance=SNAP_DISTANCE_M):
+        """
+        Attach every arc to the way most of its vertices snap to.
+        Returns (way index, start chainage, end chainage) per arc, with way -1
+        and NaN chainage for arcs no vertex could be snapped for. Chainage is
+        measured along the way and continues onto the track connected to its
+        ends, so arcs running over several ways get their full span.
+        """
+        offsets = np.asarray(offsets, dtype=np.int64)
+        n_arcs = len(offsets) - 1
+        arc = np.repeat(np.arange(n_arcs), np.diff(offsets))
+        way, _, _ = self.snap_points(lon, lat, max_distance)
+
+        arc_way = np.full(n_arcs, -1, dtype=np.int64)
+        start = np.full(n_arcs, np.nan)
+        end = np.full(n_arcs, np.nan)
+        found = way >= 0
+        if not found.any():
+            return arc_way, start, end
+
+        # Majority vote of (arc, way) pairs, ties go to the lower way index
+        pairs, votes = np.unique(arc[found] * len(self.store) + way[found], return_counts=True)
+        pair_arc, pair_way = pairs // len(self.store), pairs % len(self.store)
+        order = np.lexsort((-votes, pair_arc))
+        first = order[np.r_[True, pair_arc[order][1:] != pair_arc[order][:-1]]]
+        arc_way[pair_arc[first]] = pair_way[first]
+
+        x, y = self.project(np.asarray(lon, dtype=float), np.asarray(lat, dtype=float))
+        chainage = self._line_chainage(x, y, arc, arc_way, max_distance)
+        placed = ~np.isnan(chainage)
+        start[:] = np.inf
+        end[:] = -np.inf
+        np.minimum.at(start, arc[placed], chainage[placed])
+        np.maximum.at(end, arc[placed], chainage[placed])
+        start[arc_way < 0] = np.nan
+        end[arc_way < 0] = np.nan
+        return arc_way, start, end
+
+def _nearest_per_query(q, d):
+    """Index of the smallest `d` for every distinct `q`."""
+    order = np.lexsort((d, q))
+    return order[np.r_[True, q[order][1:] != q[order][:-1]]] if len(order) else order
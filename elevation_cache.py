@@ -0,0 +1,79 @@
+import sqlite3
+from instrumentation import count
+
+# ---------- CONFIG ----------
+CACHE_FILE = "elevation_cache.sqlite"
+QUANTUM = 1e-7  # degrees, the precision OSM stores coordinates at
+# ----------------------------
+
+def quantize(lat, lon):
+    """Integer cache key for a lat/lon pair."""
+    return round(lat / QUANTUM), round(lon / QUANTUM)
+
+class ElevationCache:
+    """
+    SQLite store of elevations already fetched, keyed on quantized lat/lon and
+    the dataset name, so re-runs only send the points that were never fetched.
+    """
+
+    def __init__(self, path=CACHE_FILE, dataset="srtm90m"):
+        self.path = path
+        self.dataset = dataset
+        self.hits = 0
+        self.misses = 0
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS elevations ("
+            " dataset TEXT NOT NULL, lat_q INTEGER NOT NULL, lon_q INTEGER NOT NULL,"
+            " elevation REAL, PRIMARY KEY (dataset, lat_q, lon_q)) WITHOUT ROWID"
+        )
+        self.conn.commit()
+
+    def lookup(self, locations):
+        """
+        Look up a list of (lat, lon) pairs in one query.
+
+        Returns (elevations, missing): elevations is aligned with `locations`
+        (None where nothing is cached) and missing lists the indices to fetch.
+        """
+        keys = [quantize(lat, lon) for lat, lon in locations]
+        cur = self.conn.cursor()
+        cur.execute("CREATE TEMP TABLE IF NOT EXISTS wanted (lat_q INTEGER, lon_q INTEGER)")
+        cur.execute("DELETE FROM wanted")
+        cur.executemany("INSERT INTO wanted VALUES (?, ?)", set(keys))
+        cur.execute(
+            "SELECT w.lat_q, w.lon_q, e.elevation FROM wanted w"
+            " JOIN elevations e ON e.dataset = ? AND e.lat_q = w.lat_q AND e.lon_q = w.lon_q"
+            # Caches written before nulls were skipped may still hold some
+            " WHERE e.elevation IS NOT NULL",
+            (self.dataset,),
+        )
+        found = {(lat_q, lon_q): elev for lat_q, lon_q, elev in cur.fetchall()}
+
+        elevations = [found.get(key) for key in keys]
+        missing = [i for i, key in enumerate(keys) if key not in found]
+        self.hits += len(keys) - len(missing)
+        self.misses += len(missing)
+        count("elevation_cache_hits", len(keys) - len(missing))
+        count("elevation_cache_misses", len(missing))
+        return elevations, missing
+
+    def insert(self, locations, elevations):
+        """
+        Store fetched elevations. None (a failed batch, a void or a point outside
+        the tiles) is not stored, so the point is looked up again next run.
+        """
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO elevations VALUES (?, ?, ?, ?)",
+            [(self.dataset, *quantize(lat, lon), elev)
+             for (lat, lon), elev in zip(locations, elevations) if elev is not None],
+        )
+        self.conn.commit()
+
+    def report(self):
+        total = self.hits + self.misses
+        rate = 100 * self.hits / total if total else 0
+        return f"Elevation cache: {self.hits} hits, {self.misses} misses ({rate:.1f}% hit rate)"
+
+    def close(self):
+        self.conn.close()
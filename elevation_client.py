@@ -0,0 +1,158 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import requests
+from requests.adapters import HTTPAdapter
+from instrumentation import count, stage
+
+# ---------- CONFIG ----------
+ELEVATION_API = "https://api.opentopodata.org/v1/srtm90m"
+BATCH_SIZE = 100        # opentopodata's limit on locations per request
+MAX_WORKERS = 4         # batches in flight at once
+RATE = 1.0              # requests per second allowed by the public API
+BURST = 1               # token bucket capacity
+MAX_RETRIES = 5
+BACKOFF = 1.0           # seconds, doubled on every retry
+TIMEOUT = 30
+LOCATION_TOLERANCE = 1e-6  # degrees allowed between requested and returned locations
+# ----------------------------
+
+class ElevationFetchError(Exception):
+    pass
+
+class ElevationRequestRejected(ElevationFetchError):
+    """A 4xx other than 429: the request itself is wrong, so it is not retried."""
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per second, at most `capacity` saved up."""
+
+    def __init__(self, rate=RATE, capacity=BURST):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+def chunk_list(lst, n):
+    for i in range(0, len(lst), n):
+        yield lst[i:i + n]
+
+class ElevationClient:
+    """
+    Fetches elevations from an opentopodata-compatible API over a pooled
+    keep-alive session, with a bounded number of batches in flight, a token
+    bucket instead of fixed sleeps, and retries with exponential backoff on
+    429, 5xx and connection errors; any other 4xx fails the batch at once.
+    """
+
+    def __init__(self, api_url=ELEVATION_API, batch_size=BATCH_SIZE, max_workers=MAX_WORKERS,
+                 rate=RATE, burst=BURST, max_retries=MAX_RETRIES, backoff=BACKOFF, timeout=TIMEOUT):
+        self.api_url = api_url
+        # The cache key space: the dataset is the last part of an opentopodata URL
+        self.dataset = api_url.rstrip("/").rsplit("/", 1)[-1]
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.limiter = TokenBucket(rate, burst)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.requests_sent = 0
+        self.retries = 0
+        self.stats_lock = threading.Lock()
+
+    def _check_locations(self, batch, results):
+        """Make sure the API answered for exactly the points we asked about, in order."""
+        if len(results) != len(batch):
+            raise ElevationFetchError(f"expected {len(batch)} results, got {len(results)}")
+        for (lat, lon), res in zip(batch, results):
+            loc = res.get("location") or {}
+            if abs(loc.get("lat", lat) - lat) > LOCATION_TOLERANCE or abs(loc.get("lng", lon) - lon) > LOCATION_TOLERANCE:
+                raise ElevationFetchError(f"result for ({lat}, {lon}) came back as {loc}")
+
+    def _fetch_batch(self, batch_no, batch):
+        location_str = "|".join(f"{lat},{lon}" for lat, lon in batch)
+        for attempt in range(self.max_retries + 1):
+            self.limiter.acquire()
+            with self.stats_lock:
+                self.requests_sent += 1
+            try:
+                count("elevation_requests")
+                r = self.session.get(self.api_url, params={"locations": location_str}, timeout=self.timeout)
+                count("elevation_bytes", len(r.content))
+                if r.status_code == 429 or r.status_code >= 500:
+                    raise ElevationFetchError(f"HTTP {r.status_code}")
+                if r.status_code >= 400:
+                    raise ElevationRequestRejected(f"batch {batch_no} rejected: HTTP {r.status_code} {r.reason}")
+                data = r.json()
+                if "results" not in data:
+                    raise ElevationFetchError(data.get("error", "API returned no results"))
+                self._check_locations(batch, data["results"])
+                print(f"[Batch {batch_no}] Status: {r.status_code}, Time: {r.elapsed.total_seconds():.2f}s")
+                return [res.get("elevation") for res in data["results"]]
+            except ElevationRequestRejected:
+                raise
+            except (requests.RequestException, ValueError, ElevationFetchError) as e:
+                if attempt == self.max_retries:
+                    raise ElevationFetchError(f"batch {batch_no} failed after {attempt + 1} attempts: {e}") from e
+                with self.stats_lock:
+                    self.retries += 1
+                count("elevation_retries")
+                delay = self.backoff * 2 ** attempt * (1 + random.random() * 0.1)
+                print(f"[Batch {batch_no}] Error: {e}, retrying in {delay:.1f}s")
+                time.sleep(delay)
+
+    def fetch(self, locations, on_batch=None):
+        """
+        Fetch elevations for a list of (lat, lon) pairs.
+
+        Returns a list aligned with `locations`. `on_batch(batch, elevations)` is
+        called from the main thread as each batch completes, e.g. to fill a cache.
+        Raises ElevationFetchError once every batch has been tried if any of them
+        still failed after all retries; the elevations that did arrive are on the
+        exception's `elevations` attribute.
+        """
+        batches = list(chunk_list(locations, self.batch_size))
+        elevations = [None] * len(locations)
+        failed = []
+        count("elevation_points", len(locations))
+        with stage("elevation_http"), ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = {pool.submit(self._fetch_batch, i + 1, batch): i for i, batch in enumerate(batches)}
+            for future in as_completed(futures):
+                i = futures[future]
+                try:
+                    batch_elevations = future.result()
+                except ElevationFetchError as e:
+                    print(e)
+                    failed.append(i + 1)
+                    count("elevation_failed_batches")
+                    continue
+                start = i * self.batch_size
+                elevations[start:start + len(batch_elevations)] = batch_elevations
+                if on_batch is not None:
+                    on_batch(batches[i], batch_elevations)
+
+        if failed:
+            error = ElevationFetchError(f"{len(failed)} of {len(batches)} batches failed: {sorted(failed)}")
+            error.elevations = elevations
+            raise error
+        return elevations
+
+    def close(self):
+        self.session.close()
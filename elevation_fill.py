@@ -0,0 +1,139 @@
+import numpy as np
+from instrumentation import count, stage
+from network_stats import haversine
+from projection import to_local
+from spatial_index import SegmentGrid, point_segment_distance
+
+# ---------- CONFIG ----------
+FILL_TOLERANCE_M = 2.0   # estimates at least this certain are used instead of a lookup (SRTM is stored in whole metres)
+SLOPE = 0.04             # assumed worst change in SRTM height per metre moved; p95 along the Mumbai track
+# ----------------------------
+
+# Missing elevations estimated from the ones already known, before any lookup.
+# Every estimate carries an uncertainty: how far off it could be if the ground
+# rose or fell at SLOPE between the point and the heights it was taken from.
+#   nearby:     the nearest track of another way with known heights within FILL_TOLERANCE_M / SLOPE,
+#               interpolated along that segment; uncertainty SLOPE times the distance
+#               plus the interpolation term below for the segment itself
+#   along line: linear interpolation between the nearest known (or nearby-filled)
+#               vertices before and after on the same way, or the one on one side
+#               near a way end; uncertainty that of the anchors plus SLOPE times the
+#               distance, 2 d1 d2 / (d1 + d2) between two anchors
+# Only points whose best estimate is less certain than FILL_TOLERANCE_M need a lookup.
+
+def _chainage(store):
+    """Distance (m) along its way of every vertex."""
+    i = store.segment_starts()
+    step = np.zeros(store.n_points)
+    step[i + 1] = haversine(store.lat[i], store.lon[i], store.lat[i + 1], store.lon[i + 1])
+    cumulative = np.cumsum(step)
+    return cumulative - cumulative[store.offsets[:-1]][store.way_index()]
+
+def fill_nearby(store, missing, tolerance=FILL_TOLERANCE_M, slope=SLOPE):
+    """
+    (estimate, uncertainty) of every vertex from the closest track of another
+    way with known heights; NaN/inf where there is none within reach.
+    """
+    estimate = np.full(store.n_points, np.nan)
+    uncertainty = np.full(store.n_points, np.inf)
+    known = ~np.isnan(store.elevation)
+    query = np.flatnonzero(missing)
+    if len(query) == 0 or not known.any():
+        return estimate, uncertainty
+
+    x, y = to_local(store.lon, store.lat, store.lon.mean(), store.lat.mean())
+    way = store.way_index()
+    # Segments with both heights known, plus every known vertex as a point so lone ones count too
+    i = store.segment_starts()
+    i = i[known[i] & known[i + 1]]
+    a = np.concatenate([i, np.flatnonzero(known)])
+    b = np.concatenate([i + 1, np.flatnonzero(known)])
+    reach = tolerance / slope
+    grid = SegmentGrid(x[a], y[a], x[b], y[b], cell_size=max(reach, 1.0))
+    q, s, d = grid.within(x[query], y[query], reach)
+    # The vertex's own way is fill_along_line's job
+    other = way[query[q]] != way[a[s]]
+    q, s, d = q[other], s[other], d[other]
+
+    # Closest segment per query point
+    order = np.lexsort((d, q))
+    q, s, d = q[order], s[order], d[order]
+    first = np.r_[True, q[1:] != q[:-1]] if len(q) else np.zeros(0, dtype=bool)
+    q, s, d = q[first], s[first], d[first]
+    v = query[q]
+    _, t = point_segment_distance(x[v], y[v], x[a[s]], y[a[s]], x[b[s]], y[b[s]])
+    estimate[v] = store.elevation[a[s]] + t * (store.elevation[b[s]] - store.elevation[a[s]])
+    # Off the segment, plus the interpolation between its ends (2 d1 d2 / (d1 + d2) = 2 t (1 - t) length)
+    length = np.hypot(x[b[s]] - x[a[s]], y[b[s]] - y[a[s]])
+    uncertainty[v] = slope * (d + 2 * t * (1 - t) * length)
+    return estimate, uncertainty
+
+def fill_along_line(store, values, value_uncertainty, slope=SLOPE):
+    """
+    (estimate, uncertainty) of every vertex from the anchors before and after it
+    on its way; anchors are the vertices with a finite `value_uncertainty`.
+    """
+    n = store.n_points
+    anchor = np.isfinite(value_uncertainty)
+    idx = np.arange(n)
+    way = store.way_index()
+    prev = np.maximum.accumulate(np.where(anchor, idx, -1))
+    nxt = np.minimum.accumulate(np.where(anchor, idx, n)[::-1])[::-1]
+    has_prev = prev >= store.offsets[:-1][way]
+    has_next = nxt < store.offsets[1:][way]
+    prev, nxt = np.where(has_prev, prev, 0), np.where(has_next, nxt, 0)
+
+    chainage = _chainage(store)
+    d1 = np.where(has_prev, chainage - chainage[prev], np.inf)
+    d2 = np.where(has_next, chainage[nxt] - chainage, np.inf)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        t = np.where(has_prev & has_next & (d1 + d2 > 0), d1 / (d1 + d2), 0.0)
+        both = ((1 - t) * value_uncertainty[prev] + t * value_uncertainty[nxt]
+                + 2 * slope * d1 * d2 / (d1 + d2))
+    estimate = np.select(
+        [has_prev & has_next, has_prev, has_next],
+        [values[prev] + t * (values[nxt] - values[prev]), values[prev], values[nxt]], np.nan)
+    uncertainty = np.select(
+        [has_prev & has_next, has_prev, has_next],
+        [both, value_uncertainty[prev] + slope * d1, value_uncertainty[nxt] + slope * d2], np.inf)
+    return estimate, uncertainty
+
+def fill_gaps(store, missing=None, tolerance=FILL_TOLERANCE_M, slope=SLOPE):
+    """
+    Best estimate and its uncertainty for every `missing` vertex (default: every
+    vertex without elevation). Returns (estimate, uncertainty, report); the
+    vertices with uncertainty <= tolerance need no lookup.
+    """
+    known = ~np.isnan(store.elevation)
+    missing = ~known if missing is None else np.asarray(missing, dtype=bool) & ~known
+
+    with stage("fill_nearby"):
+        near, near_uncertainty = fill_nearby(store, missing, tolerance, slope)
+    # Known heights and confident nearby estimates anchor the interpolation along each way
+    values = np.where(known, store.elevation, near)
+    value_uncertainty = np.where(known, 0.0, np.where(near_uncertainty <= tolerance, near_uncertainty, np.inf))
+    with stage("fill_along_line"):
+        along, along_uncertainty = fill_along_line(store, values, value_uncertainty, slope)
+    # An anchor's own along-line estimate would be built on itself
+    along_uncertainty = np.where(np.isfinite(value_uncertainty), np.inf, along_uncertainty)
+
+    use_near = near_uncertainty <= along_uncertainty
+    estimate = np.where(missing, np.where(use_near, near, along), np.nan)
+    uncertainty = np.where(missing, np.minimum(near_uncertainty, along_uncertainty), np.inf)
+    filled = missing & (uncertainty <= tolerance)
+    report = {
+        "missing": int(missing.sum()),
+        "filled_nearby": int((filled & use_near).sum()),
+        "filled_along_line": int((filled & ~use_near).sum()),
+        "lookups": int((missing & ~filled).sum()),
+        "tolerance_m": tolerance,
+    }
+    count("lookups_avoided", int(filled.sum()))
+    return estimate, uncertainty, report
+
+def format_report(report):
+    avoided = report["filled_nearby"] + report["filled_along_line"]
+    share = avoided / report["missing"] if report["missing"] else 0.0
+    return (f"Filled {avoided} of {report['missing']} missing elevations without a lookup ({share:.1%}; "
+            f"{report['filled_nearby']} from nearby track, {report['filled_along_line']} along the line, "
+            f"within {report['tolerance_m']} m), {report['lookups']} left to look up")
@@ -1,68 +1,128 @@
 import json
-import requests
-import time
+import os
+import numpy as np
+from elevation_cache import ElevationCache
+from elevation_client import ElevationClient, ElevationFetchError
+import elevation_fill
+from instrumentation import count
+from simplify import ELEVATION_MAX_GAP_M, elevation_sample_mask, interpolate_dropped
+from srtm_tiles import SRTMTileSampler
+from track_store import TrackStore
 
 # ---------- CONFIG ----------
 BATCH_SIZE = 100
 ELEVATION_API = "https://api.opentopodata.org/v1/srtm90m"
-INPUT_FILE = "mumbai_railways_updated.geojson"
+SRTM_DIR = None  # folder of local .hgt tiles; when set, elevations are sampled offline instead of via ELEVATION_API
+INPUT_FILE = "mumbai_railways_compacted.geojson"  # mumbai_railways_updated.geojson after compaction.py
+UNCOMPACTED_FILE = "mumbai_railways_updated.geojson"  # read instead when compaction.py has not been run
 OUTPUT_FILE = "mumbai_railways_updated_with_elevations.geojson"
 # ----------------------------
 
-# Helper to chunk locations
-def chunk_list(lst, n):
-    for i in range(0, len(lst), n):
-        yield lst[i:i + n]
+def elevate_geojson(input_path=INPUT_FILE, output_path=OUTPUT_FILE, srtm_dir=SRTM_DIR, api_url=ELEVATION_API,
+                    batch_size=BATCH_SIZE):
+    """Fill in the missing elevations of the hand-traced features (id 1-99) and save the result."""
+    if input_path == INPUT_FILE and not os.path.exists(input_path) and os.path.exists(UNCOMPACTED_FILE):
+        print(f"{input_path} not found, elevating {UNCOMPACTED_FILE} as it is (run compaction.py first to compact it)")
+        input_path = UNCOMPACTED_FILE
 
-# Load GeoJSON
-with open(INPUT_FILE, "r") as f:
-    geojson_data = json.load(f)
+    # Load GeoJSON
+    with open(input_path, "r") as f:
+        geojson_data = json.load(f)
 
-locations_to_fetch = []  # (lat, lon, feature_index, coord_index)
+    locations_to_fetch = []  # (lat, lon, feature_index, coord_index)
 
-# Step 1: Find missing elevations for id 1–99
-for feature_idx, feature in enumerate(geojson_data["features"]):
-    feature_id = feature["properties"].get("id", None)
-    coords = feature["geometry"]["coordinates"]
+    # Step 1: Find missing elevations for id 1–99
+    for feature_idx, feature in enumerate(geojson_data["features"]):
+        feature_id = feature["properties"].get("id", None)
+        coords = feature["geometry"]["coordinates"]
 
-    if feature_id is not None and 1 <= feature_id <= 99:
-        for coord_idx, coord in enumerate(coords):
-            lon, lat, *rest = coord
-            elevation = rest[0] if rest else None
+        if feature_id is not None and 1 <= feature_id <= 99:
+            for coord_idx, coord in enumerate(coords):
+                lon, lat, *rest = coord
+                elevation = rest[0] if rest else None
 
-            if elevation is None:
-                locations_to_fetch.append((lat, lon, feature_idx, coord_idx))
+                if elevation is None:
+                    locations_to_fetch.append((lat, lon, feature_idx, coord_idx))
 
-print(f"Total points needing elevation fetch: {len(locations_to_fetch)}")
+    print(f"Total points needing elevation: {len(locations_to_fetch)}")
+    count("points_missing_elevation", len(locations_to_fetch))
 
-# Step 2: Fetch missing elevations
-if locations_to_fetch:
-    print("\nFetching elevation data...")
-    i = 1
-    for batch in chunk_list(locations_to_fetch, BATCH_SIZE):
-        location_str = "|".join([f"{lat},{lon}" for lat, lon, _, _ in batch])
-        url = f"{ELEVATION_API}?locations={location_str}"
+    # Step 1a: Fill the points that known elevations on nearby track or along the line pin down to
+    # within elevation_fill.FILL_TOLERANCE_M, without any lookup
+    store = TrackStore.from_geojson(geojson_data)
+    vertex = {loc: store.offsets[loc[2]] + loc[3] for loc in locations_to_fetch}
+    wanted = np.zeros(store.n_points, dtype=bool)
+    wanted[list(vertex.values())] = True
+    estimate, uncertainty, fill_report = elevation_fill.fill_gaps(store, wanted)
+    print(elevation_fill.format_report(fill_report))
+    filled = uncertainty <= fill_report["tolerance_m"]
+    for lat, lon, feature_idx, coord_idx in locations_to_fetch:
+        v = store.offsets[feature_idx] + coord_idx
+        if filled[v]:
+            geojson_data["features"][feature_idx]["geometry"]["coordinates"][coord_idx] = [lon, lat, float(estimate[v])]
+    locations_to_fetch = [loc for loc in locations_to_fetch if not filled[vertex[loc]]]
+
+    # Step 1b: Of the rest, only look up one vertex every so often along each line; the others are
+    # interpolated along the line in Step 4, off by at most SLOPE * max_gap / 2, within FILL_TOLERANCE_M
+    max_gap = min(ELEVATION_MAX_GAP_M, 2 * elevation_fill.FILL_TOLERANCE_M / elevation_fill.SLOPE)
+    sampled = elevation_sample_mask(store, max_gap)
+    print(f"Looking up elevations at least every {max_gap:.0f} m along the line "
+          f"(interpolated points within {elevation_fill.SLOPE * max_gap / 2:.1f} m)")
+    to_interpolate = [loc for loc in locations_to_fetch if not sampled[vertex[loc]]]
+    locations_to_fetch = [loc for loc in locations_to_fetch if sampled[vertex[loc]]]
+    print(f"Points to look up: {len(locations_to_fetch)}, to interpolate: {len(to_interpolate)}")
+
+    # Step 2: Fill what we can from the local cache, kept apart per elevation source
+    if srtm_dir:
+        client = SRTMTileSampler(srtm_dir)
+    else:
+        client = ElevationClient(api_url, batch_size=batch_size)
+    elevation_cache = ElevationCache(dataset=client.dataset)
+    cached_elevations, missing = elevation_cache.lookup([(lat, lon) for lat, lon, _, _ in locations_to_fetch])
+    missing_set = set(missing)
+    for i, (lat, lon, feature_idx, coord_idx) in enumerate(locations_to_fetch):
+        if i not in missing_set and cached_elevations[i] is not None:
+            geojson_data["features"][feature_idx]["geometry"]["coordinates"][coord_idx] = [lon, lat, cached_elevations[i]]
+    locations_to_fetch = [locations_to_fetch[i] for i in missing]
+    print(elevation_cache.report())
+
+    # Step 3: Fetch elevations the cache does not have
+    if locations_to_fetch:
+        print("\nFetching elevation data...")
         try:
-            r = requests.get(url)
-            data = r.json()
-            if "results" in data:
-                for res, (_, _, feature_idx, coord_idx) in zip(data["results"], batch):
-                    elev = res.get("elevation", None)
-                    if elev is not None:
-                        lon, lat = geojson_data["features"][feature_idx]["geometry"]["coordinates"][coord_idx][:2]
-                        # Replace or add elevation in the coordinate triple
-                        geojson_data["features"][feature_idx]["geometry"]["coordinates"][coord_idx] = [lon, lat, elev]
-                print(f"[Batch {i}] Status: {r.status_code}, Time: {r.elapsed.total_seconds():.2f}s")
-            else:
-                print(f"[Batch {i}] API returned no results.")
-        except Exception as e:
-            print(f"[Batch {i}] Error: {e}")
-
-        i += 1
-        time.sleep(0.5)  # Avoid rate-limiting
-
-# Step 3: Save updated GeoJSON
-with open(OUTPUT_FILE, "w") as f:
-    json.dump(geojson_data, f, indent=2)
-
-print(f"\nUpdated GeoJSON saved as {OUTPUT_FILE}")
\ No newline at end of file
+            fetched = client.fetch([(lat, lon) for lat, lon, _, _ in locations_to_fetch], on_batch=elevation_cache.insert)
+        except ElevationFetchError as e:
+            print(f"Error: {e}")
+            fetched = e.elevations
+
+        for elev, (lat, lon, feature_idx, coord_idx) in zip(fetched, locations_to_fetch):
+            if elev is not None:
+                # Replace or add elevation in the coordinate triple
+                geojson_data["features"][feature_idx]["geometry"]["coordinates"][coord_idx] = [lon, lat, elev]
+
+    client.close()
+    elevation_cache.close()
+
+    # Step 4: Interpolate the skipped vertices from the known, filled and fetched ones around them
+    if to_interpolate:
+        elevation = TrackStore.from_geojson(geojson_data).elevation
+        anchors = np.ones(store.n_points, dtype=bool)
+        anchors[[vertex[loc] for loc in to_interpolate]] = False
+        interpolated = interpolate_dropped(store, elevation, anchors)
+        n_filled = 0
+        for lat, lon, feature_idx, coord_idx in to_interpolate:
+            value = interpolated[store.offsets[feature_idx] + coord_idx]
+            if not np.isnan(value):
+                geojson_data["features"][feature_idx]["geometry"]["coordinates"][coord_idx] = [lon, lat, float(value)]
+                n_filled += 1
+        print(f"Interpolated {n_filled} of {len(to_interpolate)} skipped points")
+        count("points_interpolated", n_filled)
+
+    # Step 5: Save updated GeoJSON
+    with open(output_path, "w") as f:
+        json.dump(geojson_data, f, indent=2)
+
+    print(f"\nUpdated GeoJSON saved as {output_path}")
+
+if __name__ == "__main__":
+    elevate_geojson()
@@ -1,206 +1,230 @@
-import requests
-import folium
 import json
-import time
-import branca.colormap as cm
-import numpy as np 
-
+import numpy as np
+from elevation_cache import ElevationCache
+from elevation_client import ElevationClient, ElevationFetchError
+from instrumentation import count, stage
+from srtm_tiles import SRTMTileSampler
+from heatmap import add_binned_segments, elevation_colormap
+from track_store import TrackStore
+from overpass_fetch import OverpassFetcher
+
+# ---------- CONFIG ----------
 # Selected region in Mumbai: https://bboxfinder.com/#18.881600,72.769318,19.358441,73.238297
-# bounding_box = (18.881600, 72.769318, 19.358441, 73.238297)
-bounding_box = (18.687879,72.463074,20.166833,73.847351)
-min_lat, min_lon, max_lat, max_lon = bounding_box
-
-# 1. Fetch Railway Data from OpenStreetMap
-# -----------------------------------------
-overpass_url = "http://overpass-api.de/api/interpreter"
-query = f"""
+# BOUNDING_BOX = (18.881600, 72.769318, 19.358441, 73.238297)
+BOUNDING_BOX = (18.687879,72.463074,20.166833,73.847351)
+RAW_OSM_FILE = "raw_osm_data.json"
+OUTPUT_FILE = "mumbai_railways.geojson"
+MAP_FILE = "mumbai_railways_from_OSM.html"
+SRTM_DIR = None  # folder of local .hgt tiles; when set, elevations are sampled offline instead of via the API
+OVERPASS_MAX_AGE_HOURS = 24 * 7  # re-download cached Overpass tiles older than this
+BINNED_RENDERING = True  # one GeoJson layer per colour bin instead of one PolyLine per segment
+# ----------------------------
+
+# The bbox is split into tiles; {bbox} is filled in per tile
+QUERY_TEMPLATE = """
 [out:json][timeout:120];
 (
-  relation["railway"="rail"]["name"~"Central|Western|Harbour",i]({min_lat},{min_lon},{max_lat},{max_lon});
-  way["railway"="rail"]["name"~"Central|Western|Harbour",i]({min_lat},{min_lon},{max_lat},{max_lon});
-  
-)->.lines; 
+  relation["railway"="rail"]["name"~"Central|Western|Harbour",i]({bbox});
+  way["railway"="rail"]["name"~"Central|Western|Harbour",i]({bbox});
+
+)->.lines;
 (
   way(r.lines);
   way.lines;
-  
-)->.all_ways; 
-.all_ways out body; 
->;             
+
+)->.all_ways;
+.all_ways out body;
+>;
 out skel qt;
 """
 
-print("Fetching railway data from OpenStreetMap...")
-response = requests.get(overpass_url, params={'data': query})
-data = response.json()
-
-nodes = {}
-ways = []
-
-for element in data['elements']:
-    if element['type'] == 'node':
-        nodes[element['id']] = {'lat': element['lat'], 'lon': element['lon']}
-    elif element['type'] == 'way':
-        ways.append(element)
-
-print(f"Fetched {len(ways)} railway line segments")
-
-with open("raw_osm_data.json", "w") as f:
-    json.dump(data, f, indent=2)
-print("Query result dumped as raw_osm_data.json")
+# 1. Fetch Railway Data from OpenStreetMap
+# -----------------------------------------
+def fetch_osm(bbox, raw_path=RAW_OSM_FILE, max_age_hours=OVERPASS_MAX_AGE_HOURS):
+    """Overpass response for `bbox`, also dumped to `raw_path`. Returns (data, nodes, ways)."""
+    print("Fetching railway data from OpenStreetMap...")
+    fetcher = OverpassFetcher(QUERY_TEMPLATE, max_age_hours=max_age_hours)
+    data = fetcher.fetch(bbox)
+    fetcher.close()
+
+    nodes = {}
+    ways = []
+
+    for element in data['elements']:
+        if element['type'] == 'node':
+            nodes[element['id']] = {'lat': element['lat'], 'lon': element['lon']}
+        elif element['type'] == 'way':
+            ways.append(element)
+
+    print(f"Fetched {len(ways)} railway line segments")
+    count("ways", len(ways))
+    count("points", len(nodes))
+
+    with open(raw_path, "w") as f:
+        json.dump(data, f, indent=2)
+    print(f"Query result dumped as {raw_path}")
+    return data, nodes, ways
 
 # 2. Fetch Elevation Data
 # -------------------------
-def chunk_list(data, size):
-    """Yield successive n-sized chunks from data."""
-    for i in range(0, len(data), size):
-        yield data[i:i + size]
-
-locations = [(node_data['lat'], node_data['lon']) for node_data in nodes.values()]
-elevation_results = []
-batch_size = 100
-i = 1
-
-print("\nFetching elevation data for railway nodes...")
-for batch in chunk_list(locations, batch_size):
-    location_str = "|".join([f"{lat},{lon}" for lat, lon in batch])
-    url = f"https://api.opentopodata.org/v1/srtm90m?locations={location_str}"
+def add_node_elevations(nodes, srtm_dir=SRTM_DIR):
+    """Set 'elevation' on every node, from the local cache first. Returns the number of points with one."""
+    locations = [(node_data['lat'], node_data['lon']) for node_data in nodes.values()]
+    if srtm_dir:
+        client = SRTMTileSampler(srtm_dir)
+    else:
+        client = ElevationClient("https://api.opentopodata.org/v1/srtm90m")
+    # Local tiles and the API are cached apart, under the dataset the client reports
+    elevation_cache = ElevationCache(dataset=client.dataset)
+    cached_elevations, missing = elevation_cache.lookup(locations)
+    missing_set = set(missing)
+    elevation_map = {
+        loc: elev for i, (loc, elev) in enumerate(zip(locations, cached_elevations)) if i not in missing_set
+    }
+    to_fetch = [locations[i] for i in missing]
+
+    print(f"\nFetching elevation data for {len(to_fetch)} uncached railway nodes...")
     try:
-        r = requests.get(url)
-        data = r.json()
-        if "results" in data:
-            elevation_results.extend(data["results"])
+        fetched = client.fetch(to_fetch, on_batch=elevation_cache.insert)
+    except ElevationFetchError as e:
+        print(f"Error fetching elevations: {e}")
+        fetched = e.elevations
+    client.close()
+    elevation_map.update(zip(to_fetch, fetched))
+
+    print(elevation_cache.report())
+    elevation_cache.close()
+
+    # Add elevation data to our nodes
+    for node_id, node_data in nodes.items():
+        lat, lon = node_data['lat'], node_data['lon']
+        if (lat, lon) in elevation_map:
+            nodes[node_id]['elevation'] = elevation_map[(lat, lon)]
         else:
-            print(f"API returned no results for a batch {i}")
-        print(f"[Batch {i}] Status: {r.status_code}, Time: {r.elapsed.total_seconds():.2f}s")
-    except Exception as e:
-        print(f"Error fetching batch {i}: {e}")
-    
-    i += 1
-    time.sleep(0.5)
-
-# Add elevation data to our nodes
-elevation_map = {
-    (r['location']['lat'], r['location']['lng']): r.get('elevation')
-    for r in elevation_results
-}
-
-for node_id, node_data in nodes.items():
-    lat, lon = node_data['lat'], node_data['lon']
-    if (lat, lon) in elevation_map:
-        nodes[node_id]['elevation'] = elevation_map[(lat, lon)]
-    else:
-        nodes[node_id]['elevation'] = None 
+            nodes[node_id]['elevation'] = None
 
-print(f"\nFetched and processed elevations for {len(elevation_map)} points.")
+    print(f"\nFetched and processed elevations for {len(elevation_map)} points.")
+    return len(elevation_map)
 
 # 3. Create Elevation Heatmap on Folium Map
 # -----------------------------------------
-center_lat = (min_lat + max_lat) / 2
-center_lon = (min_lon + max_lon) / 2
-m = folium.Map(location=[center_lat, center_lon], zoom_start=11, tiles='cartodbpositron')
-
-# Create a colormap for elevation
-elevations = [node['elevation'] for node in nodes.values() if node.get('elevation') is not None]
-if elevations:
-    min_elevation = min(elevations)
-    max_elevation = max(elevations)
-
-    # To handle log(0) or log(negative), we shift all values to be positive.
-    # The offset ensures the minimum elevation value becomes 1.
-    offset = -min_elevation + 1 if min_elevation <= 0 else 0
-
-    # Calculate the log-transformed range for the colormap
-    log_min = np.log(min_elevation + offset)
-    log_max = np.log(max_elevation + offset)
-    
-    # Create a colormap that is linear on the log-transformed elevation data
-    colormap = cm.LinearColormap(colors=['#4287f5', '#4a30db', 'orange', 'red'],
-                                 index=[log_min, log_min + (log_max - log_min) * 0.3,
-                                        log_min + (log_max - log_min) * 0.6, log_max],
-                                 vmin=log_min, vmax=log_max)
-    colormap.caption = 'Elevation (meters) - Logarithmic Scale'
-    
+def render_osm_map(data, nodes, ways, bbox, map_path=MAP_FILE, binned=BINNED_RENDERING):
+    # folium is only needed for the map, so it is not imported with the module
+    import folium
+
+    min_lat, min_lon, max_lat, max_lon = bbox
+    center_lat = (min_lat + max_lat) / 2
+    center_lon = (min_lon + max_lon) / 2
+    m = folium.Map(location=[center_lat, center_lon], zoom_start=11, tiles='cartodbpositron')
+
+    # Create a colormap for elevation
+    elevations = [node['elevation'] for node in nodes.values() if node.get('elevation') is not None]
+    if not elevations:
+        print("\nCould not generate heatmap as no elevation data was available.")
+        return
+
+    colormap, offset = elevation_colormap(elevations)
     m.add_child(colormap)
 
     # Draw railway lines with heatmap colors
-    for way in ways:
-        try:
-            way_nodes_ids = way['nodes']
-            for i in range(len(way_nodes_ids) - 1):
-                node1_id = way_nodes_ids[i]
-                node2_id = way_nodes_ids[i+1]
-                
-                node1 = nodes.get(node1_id)
-                node2 = nodes.get(node2_id)
-
-                if node1 and node2 and node1.get('elevation') is not None and node2.get('elevation') is not None:
-                    avg_elevation = (node1['elevation'] + node2['elevation']) / 2
-                    log_avg_elevation = np.log(avg_elevation + offset)
-                    color = colormap(log_avg_elevation)
-                    
-                    coords = [
-                        (node1['lat'], node1['lon']),
-                        (node2['lat'], node2['lon'])
-                    ]
-                    
-                    folium.PolyLine(
-                        locations=coords,
-                        color=color,
-                        weight=5,
-                        opacity=0.8,
-                        popup=f"Elevation: {avg_elevation:.2f}m"
-                    ).add_to(m)
-
-        except KeyError as e:
-            print(f"Skipping segment in way {way['id']} due to missing node {e}")
-            continue
-
-    m.save('mumbai_railways_from_OSM.html')
-    print("\nMap saved as mumbai_railways_from_OSM.html")
-
-else:
-    print("\nCould not generate heatmap as no elevation data was available.")
-
+    if binned:
+        store = TrackStore.from_osm(data, {node_id: node['elevation'] for node_id, node in nodes.items()})
+        segments, segment_elevations = store.segments()
+        known = ~np.isnan(segment_elevations)
+        add_binned_segments(m, segments[known], segment_elevations[known], colormap, offset)
+    else:
+        for way in ways:
+            try:
+                way_nodes_ids = way['nodes']
+                for i in range(len(way_nodes_ids) - 1):
+                    node1_id = way_nodes_ids[i]
+                    node2_id = way_nodes_ids[i+1]
+
+                    node1 = nodes.get(node1_id)
+                    node2 = nodes.get(node2_id)
+
+                    if node1 and node2 and node1.get('elevation') is not None and node2.get('elevation') is not None:
+                        avg_elevation = (node1['elevation'] + node2['elevation']) / 2
+                        log_avg_elevation = np.log(avg_elevation + offset)
+                        color = colormap(log_avg_elevation)
+
+                        coords = [
+                            (node1['lat'], node1['lon']),
+                            (node2['lat'], node2['lon'])
+                        ]
+
+                        folium.PolyLine(
+                            locations=coords,
+                            color=color,
+                            weight=5,
+                            opacity=0.8,
+                            popup=f"Elevation: {avg_elevation:.2f}m"
+                        ).add_to(m)
+
+            except KeyError as e:
+                print(f"Skipping segment in way {way['id']} due to missing node {e}")
+                count("skipped_segments")
+                continue
+
+    with stage("folium_save"):
+        m.save(map_path)
+    print(f"\nMap saved as {map_path}")
 
 # 4. Export to GeoJSON
 # --------------------
-print("\nExporting data to GeoJSON...")
-features = []
-for way in ways:
-    try:
-        coordinates = []
-        for node_id in way['nodes']:
-            node = nodes.get(node_id)
-            if node:
-                # GeoJSON format is [longitude, latitude, elevation]
-                coordinates.append([
-                    node['lon'],
-                    node['lat'],
-                    node.get('elevation', 0) # Use 0 if elevation is not available
-                ])
-        
-        feature = {
-            "type": "Feature",
-            "properties": {
-                "name": way.get('tags', {}).get('name', 'Unnamed Railway'),
-                "id": way['id']
-            },
-            "geometry": {
-                "type": "LineString",
-                "coordinates": coordinates
+def export_geojson(nodes, ways, output_path=OUTPUT_FILE):
+    print("\nExporting data to GeoJSON...")
+    features = []
+    for way in ways:
+        try:
+            coordinates = []
+            for node_id in way['nodes']:
+                node = nodes.get(node_id)
+                if node:
+                    # GeoJSON format is [longitude, latitude, elevation]
+                    coordinates.append([
+                        node['lon'],
+                        node['lat'],
+                        node.get('elevation', 0) # Use 0 if elevation is not available
+                    ])
+
+            feature = {
+                "type": "Feature",
+                "properties": {
+                    "name": way.get('tags', {}).get('name', 'Unnamed Railway'),
+                    "id": way['id']
+                },
+                "geometry": {
+                    "type": "LineString",
+                    "coordinates": coordinates
+                }
             }
-        }
-        features.append(feature)
-    except KeyError as e:
-        print(f"Skipping way {way['id']} in GeoJSON export due to missing node {e}")
-
-feature_collection = {
-    "type": "FeatureCollection",
-    "features": features
-}
-
-with open("mumbai_railways.geojson", "w") as f:
-    json.dump(feature_collection, f, indent=2)
-
-print("Railway data exported to mumbai_railways.geojson")
\ No newline at end of file
+            features.append(feature)
+        except KeyError as e:
+            print(f"Skipping way {way['id']} in GeoJSON export due to missing node {e}")
+            count("skipped_ways")
+
+    feature_collection = {
+        "type": "FeatureCollection",
+        "features": features
+    }
+
+    with open(output_path, "w") as f:
+        json.dump(feature_collection, f, indent=2)
+
+    print(f"Railway data exported to {output_path}")
+
+def fetch_network(bbox=BOUNDING_BOX, raw_path=RAW_OSM_FILE, output_path=OUTPUT_FILE, map_path=MAP_FILE,
+                  srtm_dir=SRTM_DIR, max_age_hours=OVERPASS_MAX_AGE_HOURS, binned=BINNED_RENDERING):
+    """Fetch the railways in `bbox` with node elevations, draw the heatmap and export the GeoJSON."""
+    with stage("fetch"):
+        data, nodes, ways = fetch_osm(bbox, raw_path, max_age_hours)
+    with stage("elevate"):
+        add_node_elevations(nodes, srtm_dir)
+    with stage("render"):
+        render_osm_map(data, nodes, ways, bbox, map_path, binned)
+    with stage("export"):
+        export_geojson(nodes, ways, output_path)
+
+if __name__ == "__main__":
+    fetch_network()
@@ -0,0 +1,193 @@
+import csv
+import os
+import shutil
+import tempfile
+import numpy as np
+from instrumentation import count, stage
+from parallel import SHARD_VERTICES, WORKERS, run_sharded, shard_store, store_arrays
+from projection import from_local, local_frames
+from track_store import TrackStore
+
+# ---------- CONFIG ----------
+INPUT_FILE = "mumbai_railways_updated_with_elevations.geojson"
+PROFILE_FILE = "railway_gradient_profile.csv"
+STEEP_FILE = "railway_steep_sections.csv"
+INTERVAL_M = 10.0          # along-track spacing of the resampled profile
+SMOOTH_M = 200.0           # moving-average window on elevation; None disables smoothing
+STEEP_GRADE = 0.01         # 1 in 100
+MIN_STEEP_LENGTH_M = 100.0 # shorter steep stretches are SRTM noise rather than track
+# ----------------------------
+
+PROFILE_COLUMNS = ["way_id", "name", "chainage_m", "lat", "lon", "elevation_m", "grade_pct"]
+STEEP_COLUMNS = ["name", "way_id", "start_chainage_m", "end_chainage_m", "length_m", "rise_m",
+                 "mean_grade_pct", "max_abs_grade_pct"]
+
+def resample_way(lon, lat, elevation, interval=INTERVAL_M):
+    """
+    Resample one way every `interval` metres of chainage, ending on its last vertex.
+    Position is interpolated in a local metric frame; elevation linearly between
+    the vertices where it is known (NaN if fewer than two are).
+    Returns (chainage, lon, lat, elevation) arrays.
+    """
+    x, y, lon0, lat0 = local_frames(lon, lat)
+    step = np.hypot(np.diff(x), np.diff(y))
+    chainage = np.concatenate([[0.0], np.cumsum(step)])
+    # The last interval absorbs the remainder, so it is between half and one and a half intervals;
+    # a way shorter than that is just its two ends
+    samples = np.concatenate([[0.0], np.arange(interval, chainage[-1] - interval / 2, interval), [chainage[-1]]])
+
+    sx = np.interp(samples, chainage, x)
+    sy = np.interp(samples, chainage, y)
+    s_lon, s_lat = from_local(sx, sy, lon0[0], lat0[0])
+
+    known = ~np.isnan(elevation)
+    if known.sum() >= 2:
+        s_elevation = np.interp(samples, chainage[known], elevation[known])
+    else:
+        s_elevation = np.full(len(samples), np.nan)
+    return samples, s_lon, s_lat, s_elevation
+
+def smooth(values, interval=INTERVAL_M, window_m=SMOOTH_M):
+    """Centred moving average over `window_m`, shrinking the window at the ends of the way."""
+    width = int(round(window_m / interval)) | 1 if window_m else 1
+    # An odd width no longer than the way keeps the window centred
+    width = min(width, len(values) - (1 - len(values) % 2))
+    if width <= 1:
+        return values
+    kernel = np.ones(width)
+    total = np.convolve(values, kernel, mode="same")
+    count = np.convolve(np.ones(len(values)), kernel, mode="same")
+    return total / count
+
+def grades(chainage, elevation):
+    """Grade (rise over run) of every resampled interval, one shorter than the profile."""
+    run = np.diff(chainage)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(run > 0, np.diff(elevation) / run, np.nan)
+
+def steep_sections(chainage, grade, threshold=STEEP_GRADE, min_length=MIN_STEEP_LENGTH_M):
+    """
+    Runs of consecutive intervals with |grade| >= threshold and the same sign,
+    at least `min_length` long. Returns a list of (start index, end index) into
+    the profile, inclusive of both end samples.
+    """
+    sign = np.where(np.abs(np.nan_to_num(grade)) >= threshold, np.sign(grade), 0).astype(np.int8)
+    change = np.flatnonzero(np.diff(np.concatenate([[0], sign, [0]])))
+    sections = []
+    for start, end in zip(change[:-1], change[1:]):
+        if sign[start] != 0 and chainage[end] - chainage[start] >= min_length:
+            sections.append((start, end))
+    return sections
+
+def iter_profiles(store, interval=INTERVAL_M, smooth_m=SMOOTH_M):
+    """
+    Yield the profile of one way at a time, so memory holds a single resampled
+    way however large the network is. Each profile is a dict with way, way_id,
+    name, chainage, lon, lat, elevation (smoothed) and grade (one per interval).
+    """
+    for i in range(len(store)):
+        lon, lat, elevation = store.way(i)
+        if len(lon) < 2:
+            continue
+        chainage, s_lon, s_lat, s_elevation = resample_way(lon, lat, elevation, interval)
+        s_elevation = smooth(s_elevation, interval, smooth_m)
+        yield {
+            "way": i,
+            "way_id": int(store.way_ids[i]),
+            "name": store.names[i],
+            "chainage": chainage,
+            "lon": s_lon,
+            "lat": s_lat,
+            "elevation": s_elevation,
+            "grade": grades(chainage, s_elevation),
+        }
+
+def _write_rows(store, profile_file, steep_file, interval, smooth_m, threshold, min_length):
+    """
+    Write the profile and steep-section rows of every way (no headers).
+    Returns [(name, profiled m, steep m, max |grade|)], one per profiled way.
+    """
+    totals = []
+    profile_writer = csv.writer(profile_file)
+    steep_writer = csv.writer(steep_file)
+    for p in iter_profiles(store, interval, smooth_m):
+        n = len(p["chainage"])
+        # The grade of a sample is that of the interval starting at it; the last sample has none
+        grade_pct = np.append(np.round(p["grade"] * 100, 3), np.nan)
+        profile_writer.writerows(zip(
+            [p["way_id"]] * n, [p["name"]] * n, np.round(p["chainage"], 1).tolist(),
+            np.round(p["lat"], 7).tolist(), np.round(p["lon"], 7).tolist(),
+            np.round(p["elevation"], 2).tolist(), grade_pct.tolist(),
+        ))
+
+        steep_length = 0.0
+        for start, end in steep_sections(p["chainage"], p["grade"], threshold, min_length):
+            length = p["chainage"][end] - p["chainage"][start]
+            rise = p["elevation"][end] - p["elevation"][start]
+            steep_length += length
+            steep_writer.writerow([
+                p["name"], p["way_id"], round(p["chainage"][start], 1), round(p["chainage"][end], 1),
+                round(length, 1), round(rise, 2), round(rise / length * 100, 3),
+                round(np.max(np.abs(p["grade"][start:end])) * 100, 3),
+            ])
+
+        way_max = np.nanmax(np.abs(p["grade"])) if np.isfinite(p["grade"]).any() else 0.0
+        totals.append((p["name"], p["chainage"][-1], steep_length, way_max))
+    return totals
+
+def _write_shard(shard, tmp_dir, interval, smooth_m, threshold, min_length):
+    """_write_rows for one shard into its own pair of files in `tmp_dir`."""
+    prefix = os.path.join(tmp_dir, f"{shard['first_item']:09d}")
+    with open(prefix + ".profile.csv", "w", newline="") as pf, open(prefix + ".steep.csv", "w", newline="") as sf:
+        totals = _write_rows(shard_store(shard), pf, sf, interval, smooth_m, threshold, min_length)
+    return prefix, totals
+
+def write_profiles(store, profile_path=PROFILE_FILE, steep_path=STEEP_FILE, interval=INTERVAL_M,
+                   smooth_m=SMOOTH_M, threshold=STEEP_GRADE, min_length=MIN_STEEP_LENGTH_M, workers=WORKERS,
+                   shard_vertices=SHARD_VERTICES):
+    """
+    Stream every way's profile to `profile_path` and its steep sections to
+    `steep_path`. Returns per-line totals {name: (profiled m, steep m, max |grade|)}.
+
+    With more than one worker, shards of ways are written to temporary files in
+    parallel and joined in way order, so the files are the same either way.
+    """
+    with open(profile_path, "w", newline="") as pf, open(steep_path, "w", newline="") as sf:
+        csv.writer(pf).writerow(PROFILE_COLUMNS)
+        csv.writer(sf).writerow(STEEP_COLUMNS)
+        if workers == 1:
+            totals = _write_rows(store, pf, sf, interval, smooth_m, threshold, min_length)
+        else:
+            totals = []
+            with tempfile.TemporaryDirectory(dir=os.path.dirname(os.path.abspath(profile_path))) as tmp_dir:
+                vertex, item = store_arrays(store)
+                shards = run_sharded(_write_shard, vertex, item, store.offsets, workers, shard_vertices,
+                                     tmp_dir=tmp_dir, interval=interval, smooth_m=smooth_m,
+                                     threshold=threshold, min_length=min_length)
+                for prefix, shard_totals in shards:
+                    for path, f in ((prefix + ".profile.csv", pf), (prefix + ".steep.csv", sf)):
+                        with open(path, "r", newline="") as part:
+                            shutil.copyfileobj(part, f)
+                    totals.extend(shard_totals)
+
+    lines = {}
+    for name, length, steep_length, way_max in totals:
+        total, steep, max_grade = lines.get(name, (0.0, 0.0, 0.0))
+        lines[name] = (total + length, steep + steep_length, max(max_grade, way_max))
+    return lines
+
+def profile_network(input_path=INPUT_FILE, profile_path=PROFILE_FILE, steep_path=STEEP_FILE, workers=WORKERS):
+    """Write the gradient profile and steep sections of the network and print the steep track per line."""
+    store = TrackStore.load(input_path)
+    count("points", store.n_points)
+    with stage("profiles"):
+        lines = write_profiles(store, profile_path, steep_path, workers=workers)
+    print(f"Profiles every {INTERVAL_M:g} m saved to {profile_path}, sections steeper than "
+          f"{STEEP_GRADE * 100:g}% saved to {steep_path}")
+    print("\nSteep track per line:")
+    for name, (total, steep, max_grade) in sorted(lines.items(), key=lambda item: -item[1][1]):
+        print(f"  {name}: {steep:.0f} of {total:.0f} m steeper than {STEEP_GRADE * 100:g}%, "
+              f"max {max_grade * 100:.2f}%")
+
+if __name__ == "__main__":
+    profile_network()
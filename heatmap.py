@@ -0,0 +1,79 @@
+import numpy as np
+
+# ---------- CONFIG ----------
+COLOR_BINS = 32   # distinct colours drawn; one Leaflet layer per bin
+PRECISION = 6     # decimal places kept in emitted coordinates (~0.1 m)
+# ----------------------------
+
+def elevation_colormap(elevations):
+    """Log-scaled elevation colormap shared by the heatmaps, returns (colormap, offset)."""
+    # branca and folium are imported where they are used, so modules that only
+    # need elevation_bins (the tile builder) do not pay for them
+    import branca.colormap as cm
+
+    min_elevation = np.min(elevations)
+    max_elevation = np.max(elevations)
+
+    # To handle log(0) or log(negative), we shift all values to be positive.
+    # The offset ensures the minimum elevation value becomes 1.
+    offset = -min_elevation + 1 if min_elevation <= 0 else 0
+    log_min = np.log(min_elevation + offset)
+    log_max = np.log(max_elevation + offset)
+
+    colormap = cm.LinearColormap(colors=['#4287f5', '#4a30db', 'orange', 'red'],
+                                 index=[log_min, log_min + (log_max - log_min) * 0.3,
+                                        log_min + (log_max - log_min) * 0.6, log_max],
+                                 vmin=log_min, vmax=log_max)
+    colormap.caption = 'Elevation (meters) - Logarithmic Scale'
+    return colormap, offset
+
+def elevation_bins(elevation, colormap, offset, n_bins=COLOR_BINS):
+    """
+    Quantize elevations into `n_bins` equal steps of the log colour scale.
+    Returns (bin per value, colour per bin, (low, high) elevation per bin).
+    """
+    log_elevation = np.log(np.asarray(elevation, dtype=float) + offset)
+    edges = np.linspace(colormap.vmin, colormap.vmax, n_bins + 1)
+    bins = np.clip(np.searchsorted(edges, log_elevation, side="right") - 1, 0, n_bins - 1)
+    colors = [colormap((edges[b] + edges[b + 1]) / 2) for b in range(n_bins)]
+    ranges = [(np.exp(edges[b]) - offset, np.exp(edges[b + 1]) - offset) for b in range(n_bins)]
+    return bins, colors, ranges
+
+def add_binned_segments(m, segments, elevation, colormap, offset, n_bins=COLOR_BINS, weight=5, opacity=0.8):
+    """
+    Draw coloured track segments as one GeoJson MultiLineString layer per colour bin.
+
+    `segments` is an (S, 2, 2) array of [(lat, lon), (lat, lon)] pairs and
+    `elevation` the (S,) elevation each segment is coloured by. Colours are
+    computed for all segments at once and quantized into `n_bins` bins, so the
+    map holds n_bins Leaflet objects instead of one PolyLine per segment.
+    """
+    import folium
+
+    segments = np.asarray(segments, dtype=float).reshape(-1, 2, 2)
+    elevation = np.asarray(elevation, dtype=float)
+    if len(segments) == 0:
+        return
+
+    bins, colors, ranges = elevation_bins(elevation, colormap, offset, n_bins)
+
+    # GeoJSON wants [lon, lat]
+    coords = np.round(segments[:, :, ::-1], PRECISION)
+    order = np.argsort(bins, kind="stable")
+    bounds = np.searchsorted(bins[order], np.arange(n_bins + 1))
+    for b in range(n_bins):
+        idx = order[bounds[b]:bounds[b + 1]]
+        if len(idx) == 0:
+            continue
+        color = colors[b]
+        low, high = ranges[b]
+        feature = {
+            "type": "Feature",
+            "properties": {},
+            "geometry": {"type": "MultiLineString", "coordinates": coords[idx].tolist()},
+        }
+        folium.GeoJson(
+            feature,
+            style_function=lambda _, color=color: {"color": color, "weight": weight, "opacity": opacity},
+            tooltip=f"Elevation: {low:.1f}–{high:.1f}m",
+        ).add_to(m)
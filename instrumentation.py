@@ -0,0 +1,248 @@
+import argparse
+import atexit
+import functools
+import io
+import json
+import os
+import runpy
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import resource  # not available on Windows
+except ImportError:
+    resource = None
+
+# ---------- CONFIG ----------
+REPORT_ENV = "RAILWAYS_REPORT"     # write a JSON run report to this path at exit
+PROFILE_ENV = "RAILWAYS_PROFILE"   # also run under cProfile, saving the stats to this path
+REPORT_DIR = "run_reports"
+PROFILE_TOP = 25                   # functions by cumulative time kept in the JSON report
+# ----------------------------
+
+# Timers, counters and peak memory for a run. Collection is always on and
+# cheap; nothing is written unless a report is enabled, either through the
+# environment variables above (pipeline.py sets them per stage) or by running
+# a script through this module:
+#   python instrumentation.py [--report PATH] [--profile] SCRIPT [ARGS...]
+#
+#   stage(name)     time a block; stages nest, so "fit/least_squares" is least_squares inside fit
+#   timed(name)     decorator form of stage()
+#   count(name, n)  add to a counter (safe from worker threads)
+# Every thread has its own stack of open stages. Worker processes record into
+# their own copy of these tables; parallel.run_sharded sends back what each
+# task recorded (recording()) and merges it into the parent (merge()), nested
+# under the stage the parent is in. Only the main process writes a report.
+
+_lock = threading.Lock()
+_timers = {}
+_counters = {}
+_local = threading.local()
+_pid = None
+_started = time.time()
+_start = time.perf_counter()
+_report_path = None
+_profiler = None
+_profile_path = None
+
+def peak_rss_mb():
+    """High-water mark of this process's resident memory in MB (None where unsupported)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kB on Linux but in bytes on macOS
+    return round(peak / (1e6 if sys.platform == "darwin" else 1e3), 1)
+
+def count(name, n=1):
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + n
+
+def _stack():
+    """Open stages of the calling thread, innermost last."""
+    if not hasattr(_local, "stack"):
+        _local.stack = []
+    return _local.stack
+
+def _begin(name):
+    _stack().append((name, time.perf_counter(), peak_rss_mb()))
+
+def _end():
+    stack = _stack()
+    name, start, rss_before = stack.pop()
+    path = "/".join([s[0] for s in stack] + [name])
+    rss = peak_rss_mb()
+    with _lock:
+        timer = _timers.setdefault(path, {"seconds": 0.0, "calls": 0})
+        timer["seconds"] += time.perf_counter() - start
+        timer["calls"] += 1
+        if rss is not None:
+            # How far the stage pushed the process high-water mark up
+            timer["peak_rss_mb"] = rss
+            timer["rss_growth_mb"] = round(timer.get("rss_growth_mb", 0.0) + rss - rss_before, 1)
+
+@contextmanager
+def stage(name):
+    _begin(name)
+    try:
+        yield
+    finally:
+        _end()
+
+def timed(name):
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+def _snapshot():
+    with _lock:
+        return {path: (t["seconds"], t["calls"]) for path, t in _timers.items()}, dict(_counters)
+
+@contextmanager
+def recording():
+    """
+    Collect the timers and counters a block adds, e.g. one task in a worker
+    process, into the dict it yields: {"stages": {path: {"seconds", "calls"}},
+    "counters": {name: n}}. Stage paths start from the block, not from any
+    stage open around it.
+    """
+    recorded = {"stages": {}, "counters": {}}
+    timers_before, counters_before = _snapshot()
+    outer, _local.stack = _stack(), []
+    try:
+        yield recorded
+    finally:
+        _local.stack = outer
+        timers, counters = _snapshot()
+        for path, (seconds, calls) in timers.items():
+            seconds_before, calls_before = timers_before.get(path, (0.0, 0))
+            if calls != calls_before:
+                recorded["stages"][path] = {"seconds": seconds - seconds_before, "calls": calls - calls_before}
+        for name, n in counters.items():
+            if n != counters_before.get(name, 0):
+                recorded["counters"][name] = n - counters_before.get(name, 0)
+
+def merge(recorded):
+    """Add what recording() collected elsewhere, nested under the stages open on this thread."""
+    prefix = "".join(name + "/" for name, _, _ in _stack())
+    with _lock:
+        for path, t in recorded["stages"].items():
+            timer = _timers.setdefault(prefix + path, {"seconds": 0.0, "calls": 0})
+            timer["seconds"] += t["seconds"]
+            timer["calls"] += t["calls"]
+        for name, n in recorded["counters"].items():
+            _counters[name] = _counters.get(name, 0) + n
+
+def report():
+    """The run so far as a JSON-serialisable dict."""
+    with _lock:
+        timers = {path: {k: round(v, 4) if isinstance(v, float) else v for k, v in t.items()}
+                  for path, t in _timers.items()}
+        counters = dict(_counters)
+    seconds = time.perf_counter() - _start
+    staged = sum(t["seconds"] for path, t in timers.items() if "/" not in path)
+    return {
+        "script": os.path.basename(sys.argv[0]) if sys.argv and sys.argv[0] else None,
+        "argv": sys.argv[1:],
+        "started": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(_started)),
+        "seconds": round(seconds, 4),
+        "outside_stages_s": round(seconds - staged, 4),  # mostly imports and interpreter start-up
+        "peak_rss_mb": peak_rss_mb(),
+        "stages": timers,
+        "counters": counters,
+    }
+
+def format_report(data, top=10):
+    """A few lines for the console: the slowest top-level stages and every counter."""
+    lines = [f"Run: {data['seconds']:.2f}s ({data['outside_stages_s']:.2f}s outside stages)"
+             + (f", peak memory {data['peak_rss_mb']:.0f} MB" if data.get("peak_rss_mb") is not None else "")]
+    slowest = sorted(data["stages"].items(), key=lambda item: -item[1]["seconds"])[:top]
+    for path, timer in slowest:
+        lines.append(f"  {path:<40}{timer['seconds']:>9.3f}s  x{timer['calls']}")
+    if data["counters"]:
+        lines.append("  " + ", ".join(f"{k} {v}" for k, v in sorted(data["counters"].items())))
+    return "\n".join(lines)
+
+def profile_top(profiler, limit=PROFILE_TOP):
+    """The `limit` functions with the most cumulative time, as dicts."""
+    import pstats
+    stats = pstats.Stats(profiler, stream=io.StringIO())
+    rows = []
+    for (filename, line, function), (_, calls, own, cumulative, _) in stats.stats.items():
+        rows.append({"function": f"{os.path.basename(filename)}:{line}({function})", "calls": calls,
+                     "own_s": round(own, 4), "cumulative_s": round(cumulative, 4)})
+    return sorted(rows, key=lambda r: -r["cumulative_s"])[:limit]
+
+def write_report(path):
+    data = report()
+    if _profiler is not None:
+        data["profile"] = profile_top(_profiler)
+        data["profile_file"] = _profile_path
+    with open(path, "w") as f:
+        json.dump(data, f, indent=1)
+    return data
+
+def _finish():
+    # A forked child inherits the handler but not the job of writing the report
+    if os.getpid() != _pid:
+        return
+    # sys.exit() from inside a stage leaves it open; close it so it is reported
+    while _stack():
+        _end()
+    os.makedirs(os.path.dirname(_report_path) or ".", exist_ok=True)
+    if _profiler is not None:
+        _profiler.disable()
+        _profiler.dump_stats(_profile_path)
+    data = write_report(_report_path)
+    print(format_report(data))
+    print(f"Run report saved to {_report_path}" + (f", profile to {_profile_path}" if _profiler else ""))
+
+def default_report_path(script=None):
+    name = os.path.splitext(os.path.basename(script or sys.argv[0] or "run"))[0]
+    return os.path.join(REPORT_DIR, f"{name}-{time.strftime('%Y%m%d-%H%M%S')}.json")
+
+def enable(report_path=None, profile_path=None):
+    """Write a report at exit (and profile the run when `profile_path` is given)."""
+    global _report_path, _profiler, _profile_path, _pid
+    if _report_path is None:
+        atexit.register(_finish)
+    _pid = os.getpid()
+    _report_path = report_path or default_report_path()
+    if profile_path and _profiler is None:
+        import cProfile
+        _profile_path = profile_path
+        _profiler = cProfile.Profile()
+        _profiler.enable()
+
+# Worker processes started with spawn or forkserver import this module afresh
+# with the parent's environment; they must not write the report too. They run
+# multiprocessing already, so a plain script does not have to import it here.
+# The profiling modules are likewise only imported once profiling is enabled.
+_multiprocessing = sys.modules.get("multiprocessing")
+_main_process = _multiprocessing is None or _multiprocessing.current_process().name == "MainProcess"
+if (os.environ.get(REPORT_ENV) or os.environ.get(PROFILE_ENV)) and _main_process:
+    enable(os.environ.get(REPORT_ENV), os.environ.get(PROFILE_ENV))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a script with a JSON report of its stages, counters and memory.")
+    parser.add_argument("--report", help=f"report path (default: {REPORT_DIR}/<script>-<time>.json)")
+    parser.add_argument("--profile", action="store_true",
+                        help="also run under cProfile, saving the stats next to the report as .prof")
+    parser.add_argument("script")
+    parser.add_argument("args", nargs=argparse.REMAINDER)
+    args = parser.parse_args()
+
+    report_path = args.report or default_report_path(args.script)
+    profile_path = os.path.splitext(report_path)[0] + ".prof" if args.profile else None
+    sys.argv = [args.script] + args.args
+    sys.path.insert(0, os.path.dirname(os.path.abspath(args.script)))
+    # The script imports this file as `instrumentation`, a different module
+    # object from this __main__, so the report has to be enabled on that one
+    import instrumentation
+    instrumentation.enable(report_path, profile_path)
+    runpy.run_path(args.script, run_name="__main__")
@@ -0,0 +1,223 @@
+import hashlib
+import json
+import math
+import os
+import sys
+import time
+import numpy as np
+from arc_store import ArcStore
+from heatmap import elevation_bins, elevation_colormap
+from instrumentation import count, stage
+from projection import MERCATOR_RADIUS, lonlat_to_mercator, mercator_to_lonlat
+from simplify import rdp
+from track_store import TrackStore
+
+# ---------- CONFIG ----------
+INPUT_FILE = "mumbai_railways_updated_with_elevations.geojson"
+ARC_PREFIX = "curve-updated"
+TILE_DIR = "tiles"
+MIN_ZOOM = 8
+MAX_ZOOM = 15           # the page over-zooms these tiles beyond this
+CURVE_MIN_ZOOM = 11     # traced curves are only drawn from this zoom on
+TILE_PIXELS = 256
+SIMPLIFY_PIXELS = 1.0   # largest deviation from the track, in screen pixels
+# ----------------------------
+
+# Static vector tiles for the published map. Every zoom level gets its own
+# copy of the network, simplified to within a pixel at that zoom, and cut
+# into z/x/y GeoJSON tiles in the standard slippy-map (EPSG:3857) grid:
+#   tiles/<z>/<x>/<y>.json   FeatureCollection of MultiLineStrings, one per
+#                            elevation colour bin, plus the curves in the tile
+#   tiles/metadata.json      zoom range, bounds and the colour of every bin
+#   tiles/manifest.json      content hash of every tile
+# A tile file is only rewritten when its hash changed, so re-running after a
+# small edit leaves the other tiles (and their HTTP caches) alone.
+
+WORLD = 2 * math.pi * MERCATOR_RADIUS
+
+def tile_size(z):
+    """Edge of a zoom-z tile in EPSG:3857 metres."""
+    return WORLD / 2 ** z
+
+def tile_index(x, y, z):
+    """Column and row of the zoom-z tiles holding the EPSG:3857 points (rows count down from the north)."""
+    size = tile_size(z)
+    n = 2 ** z
+    tx = np.clip(np.floor((np.asarray(x) + WORLD / 2) / size), 0, n - 1).astype(np.int64)
+    ty = np.clip(np.floor((WORLD / 2 - np.asarray(y)) / size), 0, n - 1).astype(np.int64)
+    return tx, ty
+
+def precision(z):
+    """Decimal places of a degree that still resolve a zoom-z pixel."""
+    pixel_deg = 360.0 / (2 ** z * TILE_PIXELS)
+    return max(0, math.ceil(-math.log10(pixel_deg))) + 1
+
+def expand_to_tiles(x0, y0, x1, y1, z):
+    """(item index, tile key) for every tile the bounding box of each item touches."""
+    tx0, ty1 = tile_index(np.minimum(x0, x1), np.minimum(y0, y1), z)
+    tx1, ty0 = tile_index(np.maximum(x0, x1), np.maximum(y0, y1), z)
+    nx, ny = tx1 - tx0 + 1, ty1 - ty0 + 1
+    counts = nx * ny
+    item = np.repeat(np.arange(len(x0)), counts)
+    k = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    tx = tx0[item] + k // ny[item]
+    ty = ty0[item] + k % ny[item]
+    return item, tx * 2 ** z + ty
+
+def track_features(store, x, y, bins, z):
+    """{tile key: [features]} with the simplified track of zoom z."""
+    # Simplified in the Mercator plane the map is drawn in; at a tolerance of one
+    # pixel curves stay as drawn, so no vertices need preserving
+    kept = np.flatnonzero(rdp(x, y, store.offsets, tile_size(z) / TILE_PIXELS * SIMPLIFY_PIXELS))
+    offsets = np.searchsorted(kept, store.offsets)
+    starts = np.ones(len(kept), dtype=bool)
+    starts[offsets[1:][np.diff(offsets) > 0] - 1] = False
+    a = kept[np.flatnonzero(starts)]
+    b = kept[np.flatnonzero(starts) + 1]
+    # Colour a simplified segment by the bin of its first original segment
+    segment_bin = bins[a]
+    known = segment_bin >= 0
+    a, b, segment_bin = a[known], b[known], segment_bin[known]
+
+    item, key = expand_to_tiles(x[a], y[a], x[b], y[b], z)
+    digits = precision(z)
+    lonlat = np.round(np.column_stack([store.lon, store.lat]), digits)
+    coords = np.stack([lonlat[a], lonlat[b]], axis=1)
+
+    features = {}
+    order = np.lexsort((segment_bin[item], key))
+    item, key = item[order], key[order]
+    group = np.flatnonzero(np.r_[True, (key[1:] != key[:-1]) | (segment_bin[item[1:]] != segment_bin[item[:-1]])])
+    for start, end in zip(group, np.append(group[1:], len(item))):
+        features.setdefault(int(key[start]), []).append({
+            "type": "Feature",
+            "properties": {"bin": int(segment_bin[item[start]])},
+            "geometry": {"type": "MultiLineString", "coordinates": coords[item[start:end]].tolist()},
+        })
+    return features
+
+def curve_features(arcs, z):
+    """{tile key: [features]} with every traced curve in the tiles its bounding box touches."""
+    if arcs is None or len(arcs) == 0:
+        return {}
+    lon, lat = mercator_to_lonlat(arcs.x, arcs.y)
+    lonlat = np.round(np.column_stack([lon, lat]), precision(z)).tolist()
+    first = arcs.offsets[:-1]
+    x0 = np.minimum.reduceat(arcs.x, first)
+    x1 = np.maximum.reduceat(arcs.x, first)
+    y0 = np.minimum.reduceat(arcs.y, first)
+    y1 = np.maximum.reduceat(arcs.y, first)
+    item, key = expand_to_tiles(x0, y0, x1, y1, z)
+
+    features = {}
+    for i, k in zip(item.tolist(), key.tolist()):
+        properties = {"curve": True, **{name: values[i] for name, values in arcs.columns.items()}}
+        features.setdefault(k, []).append({
+            "type": "Feature",
+            "properties": properties,
+            "geometry": {"type": "LineString", "coordinates": lonlat[arcs.offsets[i]:arcs.offsets[i + 1]]},
+        })
+    return features
+
+def write_if_changed(path, text, old_digest):
+    """Write `text` unless `old_digest` matches it and the file exists. Returns (digest, written)."""
+    digest = hashlib.sha1(text.encode()).hexdigest()
+    if digest == old_digest and os.path.exists(path):
+        return digest, False
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(text)
+    return digest, True
+
+def build_tiles(store, arcs=None, tile_dir=TILE_DIR, min_zoom=MIN_ZOOM, max_zoom=MAX_ZOOM):
+    """
+    Write the tile pyramid for a TrackStore (and optional ArcStore of curves).
+    Returns a report dict: per-zoom tile counts and bytes, and how many tiles
+    were written, left unchanged and removed.
+    """
+    manifest_path = os.path.join(tile_dir, "manifest.json")
+    old_manifest = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path, "r") as f:
+            old_manifest = json.load(f)
+    manifest = {}
+
+    x, y = lonlat_to_mercator(store.lon, store.lat)
+    known = ~np.isnan(store.elevation)
+    colors, ranges = [], []
+    segment_bin = np.full(store.n_points, -1, dtype=np.int64)
+    if known.any():
+        colormap, offset = elevation_colormap(store.elevation[known])
+        i = store.segment_starts()
+        elevation = (store.elevation[i] + store.elevation[i + 1]) / 2
+        ok = ~np.isnan(elevation)
+        bins, colors, ranges = elevation_bins(elevation[ok], colormap, offset)
+        segment_bin[i[ok]] = bins
+
+    report = {"zooms": {}, "written": 0, "unchanged": 0, "removed": 0}
+    for z in range(min_zoom, max_zoom + 1):
+        with stage(f"features_z{z}"):
+            tiles = track_features(store, x, y, segment_bin, z)
+            if z >= CURVE_MIN_ZOOM:
+                for key, features in curve_features(arcs, z).items():
+                    tiles.setdefault(key, []).extend(features)
+
+        n_tiles, n_bytes = 0, 0
+        for key, features in tiles.items():
+            tx, ty = divmod(key, 2 ** z)
+            name = f"{z}/{tx}/{ty}"
+            text = json.dumps({"type": "FeatureCollection", "features": features}, separators=(",", ":"))
+            manifest[name], written = write_if_changed(os.path.join(tile_dir, f"{name}.json"), text,
+                                                       old_manifest.get(name))
+            report["written" if written else "unchanged"] += 1
+            n_tiles += 1
+            n_bytes += len(text)
+        report["zooms"][z] = {"tiles": n_tiles, "bytes": n_bytes}
+        count("tile_bytes", n_bytes)
+
+    # Tiles that no longer have any content
+    for name in set(old_manifest) - set(manifest):
+        path = os.path.join(tile_dir, f"{name}.json")
+        if os.path.exists(path):
+            os.remove(path)
+        report["removed"] += 1
+
+    metadata = {
+        "min_zoom": min_zoom,
+        "max_zoom": max_zoom,
+        "curve_min_zoom": CURVE_MIN_ZOOM,
+        "bounds": [[float(store.lat.min()), float(store.lon.min())], [float(store.lat.max()), float(store.lon.max())]],
+        "colors": colors,
+        "elevation_ranges": [[round(float(low), 1), round(float(high), 1)] for low, high in ranges],
+    }
+    with open(os.path.join(tile_dir, "metadata.json"), "w") as f:
+        json.dump(metadata, f, indent=1)
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f, indent=0, sort_keys=True)
+    return report
+
+def print_report(report, elapsed=None):
+    total_tiles = sum(z["tiles"] for z in report["zooms"].values())
+    total_bytes = sum(z["bytes"] for z in report["zooms"].values())
+    print("zoom   tiles        total     per tile")
+    for z, info in report["zooms"].items():
+        avg = info["bytes"] / info["tiles"] if info["tiles"] else 0
+        print(f"{z:>4} {info['tiles']:>7} {info['bytes'] / 1e6:>10.2f} MB   {avg / 1e3:>8.1f} kB")
+    print(f"Total: {total_tiles} tiles, {total_bytes / 1e6:.2f} MB "
+          f"({report['written']} written, {report['unchanged']} unchanged, {report['removed']} removed)"
+          + (f" in {elapsed:.2f}s" if elapsed is not None else ""))
+
+def write_tiles(input_path=INPUT_FILE, arc_prefix=ARC_PREFIX, tile_dir=TILE_DIR):
+    """Build the tile pyramid of the network (and its curves, when the arc tables exist) and print the report."""
+    store = TrackStore.load(input_path)
+    arcs = ArcStore.load(arc_prefix) if os.path.exists(arc_prefix + ".arcs.csv") else None
+    start = time.perf_counter()
+    with stage("build_tiles"):
+        report = build_tiles(store, arcs, tile_dir)
+    count("tiles_written", report["written"])
+    count("tiles_unchanged", report["unchanged"])
+    print_report(report, time.perf_counter() - start)
+    return report
+
+if __name__ == "__main__":
+    write_tiles(tile_dir=sys.argv[1] if len(sys.argv) > 1 else TILE_DIR)
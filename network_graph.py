@@ -0,0 +1,140 @@
+import json
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import connected_components, dijkstra
+from scipy.spatial import cKDTree
+from network_stats import haversine
+from projection import to_local
+
+class NetworkGraph:
+    """
+    Track topology built from an Overpass response, keeping OSM node identity.
+
+    Every OSM node appears once (`node_ids` sorted, with `lat`/`lon` alongside)
+    no matter how many ways pass through it, and the graph is stored as CSR
+    arrays: the neighbours of node i are indices[indptr[i]:indptr[i+1]] with
+    edge lengths in metres in `weights`. Edges shared by overlapping ways are
+    kept once.
+    """
+
+    def __init__(self, node_ids, lat, lon, edges):
+        self.node_ids = np.asarray(node_ids, dtype=np.int64)
+        self.lat = np.asarray(lat, dtype=float)
+        self.lon = np.asarray(lon, dtype=float)
+        # Unique undirected edges (i < j) and their lengths
+        self.edges = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+        self.edge_lengths = haversine(self.lat[self.edges[:, 0]], self.lon[self.edges[:, 0]],
+                                      self.lat[self.edges[:, 1]], self.lon[self.edges[:, 1]])
+
+        n = len(self.node_ids)
+        both = np.concatenate([self.edges, self.edges[:, ::-1]])
+        weights = np.concatenate([self.edge_lengths, self.edge_lengths])
+        self.matrix = csr_matrix((weights, (both[:, 0], both[:, 1])), shape=(n, n))
+        self.indptr = self.matrix.indptr
+        self.indices = self.matrix.indices
+        self.weights = self.matrix.data
+        self._tree = None
+
+    @classmethod
+    def from_osm(cls, path_or_data):
+        if isinstance(path_or_data, dict):
+            data = path_or_data
+        else:
+            with open(path_or_data, "r") as f:
+                data = json.load(f)
+
+        node_ids, lat, lon = [], [], []
+        pairs = []
+        for element in data["elements"]:
+            if element["type"] == "node":
+                node_ids.append(element["id"])
+                lat.append(element["lat"])
+                lon.append(element["lon"])
+            elif element["type"] == "way":
+                way_nodes = element["nodes"]
+                pairs.extend(zip(way_nodes, way_nodes[1:]))
+
+        node_ids = np.array(node_ids, dtype=np.int64)
+        node_ids, first = np.unique(node_ids, return_index=True)
+        lat = np.array(lat, dtype=float)[first]
+        lon = np.array(lon, dtype=float)[first]
+
+        pairs = np.array(pairs, dtype=np.int64).reshape(-1, 2)
+        idx = np.searchsorted(node_ids, pairs)
+        idx = np.minimum(idx, len(node_ids) - 1)
+        # Drop segments that reference nodes missing from the response, and self-loops
+        present = (node_ids[idx] == pairs).all(axis=1) & (idx[:, 0] != idx[:, 1])
+        edges = np.unique(np.sort(idx[present], axis=1), axis=0)
+        return cls(node_ids, lat, lon, edges)
+
+    @classmethod
+    def from_store(cls, store, quantum=1e-7):
+        """
+        Graph of a TrackStore, whose ways carry no OSM node IDs: vertices at the
+        same coordinates after rounding to `quantum` degrees are one node, so ways
+        meeting end to end or crossing at a shared vertex are connected. Node IDs
+        are the node indices. Returns (graph, node index of every vertex).
+        """
+        q = np.round(np.column_stack([store.lon, store.lat]) / quantum).astype(np.int64)
+        _, first, node = np.unique(q, axis=0, return_index=True, return_inverse=True)
+        node = node.ravel()
+        i = store.segment_starts()
+        pairs = np.column_stack([node[i], node[i + 1]])
+        edges = np.unique(np.sort(pairs[pairs[:, 0] != pairs[:, 1]], axis=1), axis=0)
+        return cls(np.arange(len(first)), store.lat[first], store.lon[first], edges), node
+
+    def __len__(self):
+        return len(self.node_ids)
+
+    def index_of(self, node_ids):
+        """Graph indices of OSM node IDs; raises KeyError for unknown IDs."""
+        node_ids = np.atleast_1d(np.asarray(node_ids, dtype=np.int64))
+        idx = np.minimum(np.searchsorted(self.node_ids, node_ids), len(self.node_ids) - 1)
+        unknown = self.node_ids[idx] != node_ids
+        if unknown.any():
+            raise KeyError(f"nodes not in graph: {node_ids[unknown].tolist()}")
+        return idx
+
+    def _local(self, lon, lat):
+        """Metres in the graph's local frame, centred on its nodes."""
+        return np.column_stack(to_local(lon, lat, self.lon.mean(), self.lat.mean()))
+
+    def nearest_node(self, lat, lon, return_distance=False):
+        """
+        Index of the graph node closest to each lat/lon, e.g. to place stations,
+        through a k-d tree over the nodes built on the first call. With
+        `return_distance`, also the distance in metres.
+        """
+        lat = np.atleast_1d(np.asarray(lat, dtype=float))
+        lon = np.atleast_1d(np.asarray(lon, dtype=float))
+        if self._tree is None:
+            self._tree = cKDTree(self._local(self.lon, self.lat))
+        distance, idx = self._tree.query(self._local(lon, lat))
+        return (idx, distance) if return_distance else idx
+
+    def total_length(self):
+        """Track length in metres with shared and overlapping segments counted once."""
+        return self.edge_lengths.sum()
+
+    def components(self):
+        """(count, label per node) of connected pieces of track."""
+        return connected_components(self.matrix, directed=False)
+
+    def distances(self, sources, targets=None, limit=np.inf):
+        """
+        Along-track distance in metres from each source node index to every
+        node (or to `targets` only); inf where there is no connecting track
+        or it is longer than `limit`.
+        """
+        dist = dijkstra(self.matrix, directed=False, indices=np.atleast_1d(sources), limit=limit)
+        return dist if targets is None else dist[:, np.atleast_1d(targets)]
+
+    def shortest_path(self, source, target):
+        """(distance in metres, node indices along the way) between two node indices."""
+        dist, predecessors = dijkstra(self.matrix, directed=False, indices=source, return_predecessors=True)
+        if not np.isfinite(dist[target]):
+            return np.inf, []
+        path = [target]
+        while path[-1] != source:
+            path.append(predecessors[path[-1]])
+        return dist[target], path[::-1]
@@ -0,0 +1,88 @@
+import csv
+import numpy as np
+
+# ---------- CONFIG ----------
+EARTH_RADIUS = 6371000   # metres, same sphere stats.py has always used
+MIN_RUN_M = 5.0          # shorter segments get no grade; SRTM noise dominates them
+PERCENTILES = (50, 90, 95, 99)
+# ----------------------------
+
+def haversine(lat1, lon1, lat2, lon2):
+    """Great-circle distance in metres, element-wise over arrays."""
+    phi1, phi2 = np.radians(lat1), np.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = np.radians(lon2) - np.radians(lon1)
+
+    a = np.sin(dphi / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(dlambda / 2) ** 2
+    return EARTH_RADIUS * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+def segment_table(store, min_run=MIN_RUN_M):
+    """
+    Per-segment statistics for the whole network in one pass.
+
+    Returns a dict of arrays: way (way index), start (index of the first vertex),
+    length (m), rise (m) and grade (rise over run, NaN where either elevation is
+    unknown or the segment is shorter than `min_run`).
+    """
+    i = store.segment_starts()
+    length = haversine(store.lat[i], store.lon[i], store.lat[i + 1], store.lon[i + 1])
+    rise = store.elevation[i + 1] - store.elevation[i]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        grade = np.where(length >= min_run, rise / length, np.nan)
+    return {
+        "way": store.way_index()[i],
+        "start": i,
+        "length": length,
+        "rise": rise,
+        "grade": grade,
+    }
+
+def way_totals(store, segments):
+    """Total length (m) of every way."""
+    return np.bincount(segments["way"], weights=segments["length"], minlength=len(store))
+
+def name_totals(store, segments):
+    """Total length (m) per line name, as (names, totals)."""
+    names, name_idx = np.unique(np.array(store.names, dtype=str), return_inverse=True)
+    totals = np.bincount(name_idx[segments["way"]], weights=segments["length"], minlength=len(names))
+    return names, totals
+
+def way_grade_summary(store, segments):
+    """Length-weighted mean absolute grade and maximum absolute grade of every way."""
+    abs_grade = np.abs(segments["grade"])
+    known = ~np.isnan(abs_grade)
+    way = segments["way"][known]
+    weights = segments["length"][known]
+    graded_length = np.bincount(way, weights=weights, minlength=len(store))
+    weighted = np.bincount(way, weights=abs_grade[known] * weights, minlength=len(store))
+
+    max_grade = np.full(len(store), np.nan)
+    np.fmax.at(max_grade, way, abs_grade[known])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean_grade = np.where(graded_length > 0, weighted / graded_length, np.nan)
+    return mean_grade, max_grade
+
+def grade_percentiles(segments, percentiles=PERCENTILES):
+    """Percentiles of absolute grade over all graded segments, as {p: grade}."""
+    abs_grade = np.abs(segments["grade"])
+    abs_grade = abs_grade[~np.isnan(abs_grade)]
+    if len(abs_grade) == 0:
+        return {p: np.nan for p in percentiles}
+    return dict(zip(percentiles, np.percentile(abs_grade, percentiles)))
+
+def grade_hotspots(segments, count=20):
+    """Indices of the `count` steepest segments, steepest first."""
+    abs_grade = np.nan_to_num(np.abs(segments["grade"]), nan=-1.0)
+    count = min(count, int((abs_grade >= 0).sum()))
+    if count == 0:
+        return np.zeros(0, dtype=np.int64)
+    top = np.argpartition(-abs_grade, count - 1)[:count]
+    return top[np.argsort(-abs_grade[top])]
+
+def write_table(path, columns):
+    """Write a dict of equal-length columns to CSV."""
+    names = list(columns)
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(names)
+        writer.writerows(zip(*(np.asarray(columns[name]).tolist() for name in names)))
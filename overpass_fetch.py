@@ -0,0 +1,145 @@
+import hashlib
+import json
+import math
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+from instrumentation import count, stage
+
+# ---------- CONFIG ----------
+OVERPASS_URL = "http://overpass-api.de/api/interpreter"
+CACHE_DIR = "overpass_cache"
+TILE_DEG = 0.5              # tile edge in degrees
+MAX_WORKERS = 2             # the public Overpass instance gives two slots per client
+MAX_AGE_HOURS = 24 * 7      # cached tiles older than this are downloaded again
+MAX_RETRIES = 5
+BACKOFF = 5.0               # seconds, doubled on every retry
+TIMEOUT = 180
+# ----------------------------
+
+class OverpassError(Exception):
+    pass
+
+class OverpassRequestRejected(OverpassError):
+    """A 4xx other than 429, such as a malformed query: retrying will not help."""
+
+def split_bbox(bbox, tile_deg=TILE_DEG):
+    """Split (min_lat, min_lon, max_lat, max_lon) into a grid of tiles snapped to `tile_deg`."""
+    min_lat, min_lon, max_lat, max_lon = bbox
+    tiles = []
+    for i in range(math.floor(min_lat / tile_deg), math.ceil(max_lat / tile_deg)):
+        for j in range(math.floor(min_lon / tile_deg), math.ceil(max_lon / tile_deg)):
+            tiles.append((
+                max(min_lat, i * tile_deg), max(min_lon, j * tile_deg),
+                min(max_lat, (i + 1) * tile_deg), min(max_lon, (j + 1) * tile_deg),
+            ))
+    return tiles
+
+def merge_elements(responses):
+    """Merge Overpass JSON responses, keeping each (type, id) once in first-seen order."""
+    seen = set()
+    elements = []
+    for data in responses:
+        for element in data["elements"]:
+            key = (element["type"], element["id"])
+            if key not in seen:
+                seen.add(key)
+                elements.append(element)
+    # Ways first, then nodes, the same layout a single `out body; >; out skel qt;` gives
+    elements.sort(key=lambda e: e["type"] == "node")
+    merged = {k: v for k, v in responses[0].items() if k != "elements"} if responses else {}
+    merged["elements"] = elements
+    return merged
+
+class OverpassFetcher:
+    """
+    Fetches a bounding box as tiles with bounded concurrency. Every tile
+    response is cached on disk and only re-downloaded once it is older than
+    `max_age_hours`. Tiles are snapped to a fixed grid, so widening the bbox
+    only downloads the new tiles and the ones clipped by the old edge. Cached
+    tiles are keyed by a hash of the query template too, so editing the query
+    downloads afresh instead of serving the old query's answer.
+    """
+
+    def __init__(self, query_template, overpass_url=OVERPASS_URL, cache_dir=CACHE_DIR, tile_deg=TILE_DEG,
+                 max_workers=MAX_WORKERS, max_age_hours=MAX_AGE_HOURS, max_retries=MAX_RETRIES, backoff=BACKOFF):
+        self.query_template = query_template
+        self.query_key = hashlib.sha256(query_template.encode()).hexdigest()[:12]
+        self.overpass_url = overpass_url
+        self.cache_dir = cache_dir
+        self.tile_deg = tile_deg
+        self.max_workers = max_workers
+        self.max_age = max_age_hours * 3600
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.downloaded = 0
+        self.from_cache = 0
+        self.stats_lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _cache_path(self, tile):
+        return os.path.join(self.cache_dir, "tile_{}_{:.6f}_{:.6f}_{:.6f}_{:.6f}.json".format(self.query_key, *tile))
+
+    def _query(self, tile):
+        min_lat, min_lon, max_lat, max_lon = tile
+        return self.query_template.format(bbox=f"{min_lat},{min_lon},{max_lat},{max_lon}")
+
+    def _fetch_tile(self, tile):
+        path = self._cache_path(tile)
+        if os.path.exists(path) and time.time() - os.path.getmtime(path) < self.max_age:
+            with open(path, "r") as f:
+                data = json.load(f)
+            with self.stats_lock:
+                self.from_cache += 1
+            count("overpass_cache_hits")
+            return data
+
+        for attempt in range(self.max_retries + 1):
+            try:
+                count("overpass_requests")
+                r = self.session.get(self.overpass_url, params={"data": self._query(tile)}, timeout=TIMEOUT)
+                count("overpass_bytes", len(r.content))
+                if r.status_code == 429 or r.status_code >= 500:
+                    raise OverpassError(f"HTTP {r.status_code}")
+                if r.status_code >= 400:
+                    raise OverpassRequestRejected(f"tile {tile} rejected: HTTP {r.status_code} {r.reason}")
+                data = r.json()
+                if "elements" not in data:
+                    raise OverpassError(data.get("remark", "response has no elements"))
+                break
+            except OverpassRequestRejected:
+                raise
+            except (requests.RequestException, ValueError, OverpassError) as e:
+                if attempt == self.max_retries:
+                    raise OverpassError(f"tile {tile} failed after {attempt + 1} attempts: {e}") from e
+                delay = self.backoff * 2 ** attempt * (1 + random.random() * 0.1)
+                print(f"[Tile {tile}] Error: {e}, retrying in {delay:.1f}s")
+                time.sleep(delay)
+
+        # Write then rename so an interrupted run never leaves a truncated tile behind
+        with open(path + ".tmp", "w") as f:
+            json.dump(data, f)
+        os.replace(path + ".tmp", path)
+        with self.stats_lock:
+            self.downloaded += 1
+        print(f"[Tile {tile}] {len(data['elements'])} elements")
+        return data
+
+    def fetch(self, bbox):
+        """All elements in `bbox`, merged across tiles with ways and nodes deduplicated."""
+        tiles = split_bbox(bbox, self.tile_deg)
+        with stage("overpass"), ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            responses = list(pool.map(self._fetch_tile, tiles))
+        print(f"Overpass tiles: {self.downloaded} downloaded, {self.from_cache} from cache")
+        return merge_elements(responses)
+
+    def close(self):
+        self.session.close()
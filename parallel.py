@@ -0,0 +1,118 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+from instrumentation import count, merge, recording, stage
+from track_store import TrackStore
+
+# ---------- CONFIG ----------
+WORKERS = 1                 # processes; 1 runs the shards in this process, None uses every core
+SHARD_VERTICES = 200_000    # target vertices per shard
+# ----------------------------
+
+# Sharded processing of ragged data (a TrackStore's ways, an ArcStore's arcs).
+# Items are cut into contiguous shards of about SHARD_VERTICES vertices; the
+# shard boundaries depend only on the data, never on the number of workers,
+# and results come back in shard order, so a run gives the same output on 1
+# or 16 cores. The arrays go to the workers once, through shared memory,
+# and each task only carries its item range.
+#
+#   run_sharded(fn, vertex_arrays, item_arrays, offsets, workers, **kwargs)
+#
+# calls fn(shard, **kwargs) for every shard and returns the results as a list.
+# `shard` is a dict of read-only views: every vertex array cut to the shard,
+# every item array cut to its items, "offsets" rebased to the shard's first
+# vertex, plus "first_item" and "first_vertex" for turning shard-local indices
+# back into global ones. fn has to be a module-level function so it can be
+# pickled by reference. The stages and counters fn records in a worker process
+# are sent back with its result and merged into this process's run report.
+
+_attached = {}
+
+def shard_bounds(offsets, shard_vertices=SHARD_VERTICES):
+    """Item indices where shards start and end: shard k is items bounds[k]:bounds[k + 1]."""
+    offsets = np.asarray(offsets)
+    n_items = len(offsets) - 1
+    n_shards = max(1, int(np.ceil(offsets[-1] / shard_vertices))) if n_items else 1
+    targets = np.arange(1, n_shards) * offsets[-1] / n_shards
+    cuts = np.searchsorted(offsets, targets)
+    return np.unique(np.concatenate([[0], cuts, [n_items]]))
+
+def _share(arrays):
+    """Copy arrays into new shared memory blocks. Returns (blocks, specs for _attach)."""
+    blocks, specs = [], {}
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        block = shared_memory.SharedMemory(create=True, size=max(1, array.nbytes))
+        np.ndarray(array.shape, array.dtype, buffer=block.buf)[:] = array
+        blocks.append(block)
+        specs[name] = (block.name, array.shape, array.dtype.str)
+    return blocks, specs
+
+def _attach(specs):
+    """Pool initializer: map the shared blocks into this worker."""
+    for name, (block_name, shape, dtype) in specs.items():
+        # Pool workers share the parent's resource tracker, so attaching here
+        # does not hand ownership over; the parent unlinks the blocks
+        block = shared_memory.SharedMemory(name=block_name)
+        array = np.ndarray(shape, np.dtype(dtype), buffer=block.buf)
+        array.flags.writeable = False
+        _attached[name] = (block, array)
+
+def _cut(arrays, offsets, start, end):
+    """The shard dict for items start:end."""
+    first_vertex, last_vertex = int(offsets[start]), int(offsets[end])
+    shard = {name: array[first_vertex:last_vertex] for name, array in arrays["vertex"].items()}
+    shard.update({name: array[start:end] for name, array in arrays["item"].items()})
+    shard["offsets"] = offsets[start:end + 1] - first_vertex
+    shard["first_item"] = start
+    shard["first_vertex"] = first_vertex
+    return shard
+
+def _run_shard(fn, kind_of, start, end, kwargs):
+    arrays = {"vertex": {}, "item": {}}
+    for name, (_, array) in _attached.items():
+        if name != "offsets":
+            arrays[kind_of[name]][name] = array
+    with recording() as recorded:
+        result = fn(_cut(arrays, _attached["offsets"][1], start, end), **kwargs)
+    return result, recorded
+
+def run_sharded(fn, vertex_arrays, item_arrays, offsets, workers=WORKERS, shard_vertices=SHARD_VERTICES, **kwargs):
+    """fn(shard, **kwargs) for every shard, in shard order (see the module comment)."""
+    offsets = np.asarray(offsets, dtype=np.int64)
+    bounds = shard_bounds(offsets, shard_vertices)
+    workers = workers or os.cpu_count() or 1
+    workers = min(workers, len(bounds) - 1)
+    count("shards", len(bounds) - 1)
+
+    if workers <= 1:
+        arrays = {"vertex": dict(vertex_arrays), "item": dict(item_arrays)}
+        return [fn(_cut(arrays, offsets, s, e), **kwargs) for s, e in zip(bounds[:-1], bounds[1:])]
+
+    kind_of = {**{name: "vertex" for name in vertex_arrays}, **{name: "item" for name in item_arrays}}
+    with stage("share"):
+        blocks, specs = _share({**vertex_arrays, **item_arrays, "offsets": offsets})
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_attach, initargs=(specs,)) as pool:
+            futures = [pool.submit(_run_shard, fn, kind_of, int(s), int(e), kwargs)
+                       for s, e in zip(bounds[:-1], bounds[1:])]
+            results = [future.result() for future in futures]
+        for _, recorded in results:
+            merge(recorded)
+        return [result for result, _ in results]
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+def store_arrays(store):
+    """The vertex and item arrays of a TrackStore, for run_sharded."""
+    vertex = {"lon": store.lon, "lat": store.lat, "elevation": store.elevation}
+    item = {"way_ids": store.way_ids, "names": np.array(store.names, dtype=str)}
+    return vertex, item
+
+def shard_store(shard):
+    """The TrackStore of the ways in a shard built from store_arrays."""
+    return TrackStore(shard["lon"], shard["lat"], shard["elevation"], shard["offsets"], shard["way_ids"],
+                      shard["names"].tolist())
@@ -0,0 +1,295 @@
+import argparse
+import ast
+import functools
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# ---------- CONFIG ----------
+STATE_FILE = ".pipeline-state.json"
+MAX_PARALLEL = 4
+REPORT_DIR = "run_reports"
+# ----------------------------
+
+# Each stage runs one script. `inputs` are the data files it reads; the local
+# modules the script imports, directly or through each other, are found from
+# its source and hashed with them. A stage re-runs only when one of their
+# hashes changed or an output is missing. A stage that reads another stage's
+# output runs after it.
+STAGES = [
+    {
+        "name": "fetch",
+        "script": "getting-coordinates.py",
+        "inputs": [],
+        "outputs": ["raw_osm_data.json", "mumbai_railways.geojson"],
+    },
+    {
+        "name": "compact",
+        "script": "compaction.py",
+        "inputs": ["mumbai_railways_updated.geojson"],
+        "outputs": ["mumbai_railways_compacted.geojson"],
+    },
+    {
+        "name": "elevate",
+        "script": "geojson-processing.py",
+        "inputs": ["mumbai_railways_compacted.geojson"],
+        "outputs": ["mumbai_railways_updated_with_elevations.geojson"],
+    },
+    {
+        "name": "fit",
+        "script": "curve-update.py",
+        "inputs": ["curve.arcs.csv", "curve.vertices.csv", "mumbai_railways_updated_with_elevations.geojson"],
+        "outputs": ["curve-updated.arcs.csv", "curve-updated.vertices.csv", "curve-updated.csv"],
+    },
+    {
+        "name": "detect",
+        "script": "curve_detection.py",
+        "inputs": ["mumbai_railways_updated_with_elevations.geojson"],
+        "outputs": ["curve-detected.csv"],
+    },
+    {
+        "name": "render",
+        "script": "elevation_heatmap_and_curvature.py",
+        "inputs": ["mumbai_railways_updated_with_elevations.geojson", "curve-updated.arcs.csv",
+                   "curve-updated.vertices.csv"],
+        "outputs": ["mumbai_railways_with_curves.html"],
+    },
+    {
+        "name": "tiles",
+        "script": "map_tiles.py",
+        "inputs": ["mumbai_railways_updated_with_elevations.geojson", "curve-updated.arcs.csv",
+                   "curve-updated.vertices.csv"],
+        "outputs": ["tiles/metadata.json", "tiles/manifest.json"],
+    },
+    {
+        "name": "profile",
+        "script": "gradient_profile.py",
+        "inputs": ["mumbai_railways_updated_with_elevations.geojson"],
+        "outputs": ["railway_gradient_profile.csv", "railway_steep_sections.csv"],
+    },
+    {
+        "name": "stats",
+        "script": "stats.py",
+        "inputs": ["mumbai_railways_updated_with_elevations.geojson"],
+        "outputs": ["railway_way_stats.csv", "railway_grade_hotspots.csv"],
+    },
+]
+
+def file_hash(path):
+    """SHA-256 of a file's contents, or None if it does not exist."""
+    if not os.path.exists(path):
+        return None
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+@functools.lru_cache(maxsize=None)
+def local_imports(script):
+    """The modules in this directory that `script` imports, directly or through one another."""
+    found, queue = set(), [script]
+    while queue:
+        with open(queue.pop(), "r") as f:
+            tree = ast.parse(f.read())
+        # Every import statement counts, including the lazy ones inside functions
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                names = [alias.name for alias in node.names]
+            elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+                names = [node.module]
+            else:
+                continue
+            for name in names:
+                path = name.split(".")[0] + ".py"
+                if path != script and path not in found and os.path.exists(path):
+                    found.add(path)
+                    queue.append(path)
+    return sorted(found)
+
+def stage_inputs(stage):
+    return [stage["script"]] + stage["inputs"] + local_imports(stage["script"])
+
+def stage_record(stage):
+    return {
+        "inputs": {i: file_hash(i) for i in stage_inputs(stage)},
+        "outputs": {o: file_hash(o) for o in stage["outputs"]},
+    }
+
+def load_state(path=STATE_FILE):
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r") as f:
+        return json.load(f)
+
+def save_state(state, path=STATE_FILE):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+def dependencies(stages):
+    """Map each stage name to the names of the stages producing its inputs."""
+    producer = {out: s["name"] for s in stages for out in s["outputs"]}
+    return {
+        s["name"]: {producer[i] for i in stage_inputs(s) if i in producer and producer[i] != s["name"]}
+        for s in stages
+    }
+
+def is_stale(stage, state):
+    """Why the stage has to run, or None when its recorded input hashes still match."""
+    missing = [out for out in stage["outputs"] if not os.path.exists(out)]
+    if missing:
+        return f"missing {', '.join(missing)}"
+    recorded = state.get(stage["name"], {}).get("inputs", {})
+    changed = [i for i in stage_inputs(stage) if recorded.get(i) != file_hash(i)]
+    if changed:
+        return f"changed {', '.join(changed)}"
+    return None
+
+def run_stage(stage, report_dir=None, profile=False):
+    """
+    Run a stage's script, returning (returncode, combined output, seconds).
+    With `report_dir` the script writes its instrumentation report (and with
+    `profile` its cProfile stats) there as <stage>.json / <stage>.prof.
+    """
+    env = dict(os.environ)
+    if report_dir is not None:
+        env["RAILWAYS_REPORT"] = os.path.join(report_dir, f"{stage['name']}.json")
+        if profile:
+            env["RAILWAYS_PROFILE"] = os.path.join(report_dir, f"{stage['name']}.prof")
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, stage["script"]], capture_output=True, text=True, env=env)
+    return result.returncode, result.stdout + result.stderr, time.perf_counter() - start
+
+def write_run_report(report_dir, results):
+    """Collect the per-stage reports of a run into <report_dir>/pipeline.json."""
+    run = {"started": time.strftime("%Y-%m-%dT%H:%M:%S"), "stages": {}}
+    for name, (returncode, seconds) in results.items():
+        entry = {"returncode": returncode, "seconds": round(seconds, 3)}
+        path = os.path.join(report_dir, f"{name}.json")
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                entry["report"] = json.load(f)
+        run["stages"][name] = entry
+    path = os.path.join(report_dir, "pipeline.json")
+    with open(path, "w") as f:
+        json.dump(run, f, indent=1)
+    print(f"Run report saved to {path}")
+
+def run_pipeline(stages=STAGES, selected=None, force=False, dry_run=False, max_parallel=MAX_PARALLEL,
+                 report_dir=None, profile=False):
+    """
+    Run stale stages, independent ones in parallel. A stage is only checked
+    once everything upstream of it has finished, so it sees fresh hashes.
+    `selected` limits the run to those stage names (their upstream stages are
+    still brought up to date). `force` runs the selected stages (every stage
+    when none are selected) even if nothing changed; their upstream stages only
+    run when stale, and the stages after them then follow. With `report_dir`, every stage that runs writes
+    an instrumentation report there, collected into pipeline.json at the end.
+    Returns True when every stage succeeded.
+    """
+    deps = dependencies(stages)
+    by_name = {s["name"]: s for s in stages}
+
+    wanted = set(selected or by_name)
+    forced = set(wanted) if force else set()
+    unknown = wanted - set(by_name)
+    if unknown:
+        raise ValueError(f"Unknown stages: {', '.join(sorted(unknown))}")
+    pending = set()
+    while wanted:
+        name = wanted.pop()
+        pending.add(name)
+        wanted |= deps[name] - pending
+
+    state = load_state()
+    done, failed, rerun = set(), set(), set()
+    results = {}
+    if report_dir is not None:
+        os.makedirs(report_dir, exist_ok=True)
+    ok = True
+    with ThreadPoolExecutor(max_workers=max_parallel) as pool:
+        running = {}
+        while pending or running:
+            for name in sorted(pending):
+                if not deps[name] <= done | failed:
+                    continue
+                pending.discard(name)
+                stage = by_name[name]
+                if deps[name] & failed:
+                    print(f"[{name}] skipped, upstream stage failed")
+                    failed.add(name)
+                    continue
+                reason = "forced" if name in forced else is_stale(stage, state)
+                if reason is None and deps[name] & rerun:
+                    reason = f"upstream {', '.join(sorted(deps[name] & rerun))} re-ran"
+                if reason is None:
+                    print(f"[{name}] up to date")
+                    done.add(name)
+                elif dry_run:
+                    print(f"[{name}] would run ({reason})")
+                    done.add(name)
+                    rerun.add(name)
+                else:
+                    print(f"[{name}] running {stage['script']} ({reason})")
+                    running[pool.submit(run_stage, stage, report_dir, profile)] = name
+
+            if not running:
+                continue
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                stage = by_name[name]
+                returncode, output, seconds = future.result()
+                results[name] = (returncode, seconds)
+                print(output.rstrip())
+                if returncode == 0:
+                    print(f"[{name}] finished in {seconds:.1f}s")
+                    state[name] = stage_record(stage)
+                    save_state(state)
+                    done.add(name)
+                else:
+                    print(f"[{name}] failed with exit code {returncode}")
+                    failed.add(name)
+                    ok = False
+    if report_dir is not None and results:
+        write_run_report(report_dir, results)
+    return ok
+
+def record_stages(stages=STAGES, selected=None):
+    """Record the current hashes as up to date without running, e.g. for committed outputs."""
+    state = load_state()
+    for stage in stages:
+        if selected and stage["name"] not in selected:
+            continue
+        state[stage["name"]] = stage_record(stage)
+        print(f"[{stage['name']}] recorded as up to date")
+    save_state(state)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the railway pipeline, re-running only stale stages.")
+    parser.add_argument("stages", nargs="*", help="stages to bring up to date (default: all)")
+    parser.add_argument("--force", action="store_true", help="run the named stages even if nothing changed (upstream stages only when stale)")
+    parser.add_argument("--dry-run", action="store_true", help="only report what would run")
+    parser.add_argument("--record", action="store_true",
+                        help="mark the stages as up to date with the files currently on disk, without running them")
+    parser.add_argument("-j", "--jobs", type=int, default=MAX_PARALLEL, help="stages run in parallel")
+    parser.add_argument("--report", nargs="?", const=REPORT_DIR, default=None, metavar="DIR",
+                        help=f"write a JSON report of every stage's timers, counters and memory (in {REPORT_DIR})")
+    parser.add_argument("--profile", action="store_true",
+                        help="also capture cProfile stats per stage (implies --report)")
+    args = parser.parse_args()
+
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    if args.record:
+        record_stages(selected=args.stages or None)
+        sys.exit(0)
+    report_dir = args.report or (REPORT_DIR if args.profile else None)
+    success = run_pipeline(selected=args.stages or None, force=args.force, dry_run=args.dry_run,
+                           max_parallel=args.jobs, report_dir=report_dir, profile=args.profile)
+    sys.exit(0 if success else 1)
@@ -0,0 +1,73 @@
+import numpy as np
+
+# ---------- CONFIG ----------
+MERCATOR_RADIUS = 6378137.0   # sphere of EPSG:3857
+EARTH_RADIUS = 6371000.0      # mean radius, the sphere network_stats.haversine measures on
+# ----------------------------
+
+# All transforms are element-wise over arrays. Web Mercator stretches lengths by
+# 1/cos(lat), about 6% at Mumbai, so anything measured in metres (arc lengths,
+# radii, curvature windows) is computed in a local frame instead: an
+# equirectangular projection around an origin close to the points.
+
+def lonlat_to_mercator(lon, lat):
+    """EPSG:4326 degrees to EPSG:3857 metres, the CRS the QGIS tool traces in."""
+    x = np.radians(np.asarray(lon, dtype=float)) * MERCATOR_RADIUS
+    y = np.log(np.tan(np.pi / 4 + np.radians(np.asarray(lat, dtype=float)) / 2)) * MERCATOR_RADIUS
+    return x, y
+
+def mercator_to_lonlat(x, y):
+    """EPSG:3857 metres to EPSG:4326 degrees."""
+    lon = np.degrees(np.asarray(x, dtype=float) / MERCATOR_RADIUS)
+    lat = np.degrees(2 * np.arctan(np.exp(np.asarray(y, dtype=float) / MERCATOR_RADIUS)) - np.pi / 2)
+    return lon, lat
+
+def to_local(lon, lat, lon0, lat0):
+    """Degrees to metres east/north of the origin (lon0, lat0), which may be per-point arrays."""
+    lat0 = np.asarray(lat0, dtype=float)
+    x = EARTH_RADIUS * np.cos(np.radians(lat0)) * np.radians(np.asarray(lon, dtype=float) - lon0)
+    y = EARTH_RADIUS * np.radians(np.asarray(lat, dtype=float) - lat0)
+    return x, y
+
+def from_local(x, y, lon0, lat0):
+    """Inverse of to_local."""
+    lat0 = np.asarray(lat0, dtype=float)
+    lon = lon0 + np.degrees(np.asarray(x, dtype=float) / (EARTH_RADIUS * np.cos(np.radians(lat0))))
+    lat = lat0 + np.degrees(np.asarray(y, dtype=float) / EARTH_RADIUS)
+    return lon, lat
+
+def centroids(lon, lat, offsets):
+    """Mean lon/lat of every run points[offsets[i]:offsets[i+1]]."""
+    offsets = np.asarray(offsets, dtype=np.int64)
+    counts = np.diff(offsets)
+    lon0 = np.add.reduceat(np.asarray(lon, dtype=float), offsets[:-1]) / counts
+    lat0 = np.add.reduceat(np.asarray(lat, dtype=float), offsets[:-1]) / counts
+    return lon0, lat0
+
+def local_frames(lon, lat, offsets=None):
+    """
+    Project every run (arc or way) into its own local frame centred on its
+    centroid, or all points into one frame when `offsets` is None.
+    Returns (x, y, lon0, lat0) with one origin per run.
+    """
+    lon = np.asarray(lon, dtype=float)
+    lat = np.asarray(lat, dtype=float)
+    if offsets is None:
+        offsets = np.array([0, len(lon)])
+    if len(lon) == 0:
+        return np.zeros(0), np.zeros(0), np.zeros(len(offsets) - 1), np.zeros(len(offsets) - 1)
+    offsets = np.asarray(offsets, dtype=np.int64)
+    counts = np.diff(offsets)
+    # Empty runs (e.g. ways without vertices) get a dummy origin
+    nonempty = counts > 0
+    lon0 = np.zeros(len(counts))
+    lat0 = np.zeros(len(counts))
+    lon0[nonempty], lat0[nonempty] = centroids(lon, lat, np.append(offsets[:-1][nonempty], len(lon)))
+    run = np.repeat(np.arange(len(counts)), counts)
+    x, y = to_local(lon, lat, lon0[run], lat0[run])
+    return x, y, lon0, lat0
+
+def mercator_to_local(x, y, offsets=None):
+    """EPSG:3857 vertices straight into per-run local frames; see local_frames."""
+    lon, lat = mercator_to_lonlat(x, y)
+    return local_frames(lon, lat, offsets)
@@ -0,0 +1,147 @@
+import argparse
+import importlib
+import os
+
+# One entry point for the pipeline stages:
+#   python railways.py [--report [PATH]] [--profile] COMMAND [OPTIONS]
+# Every command imports only the modules its stage needs, so a quick `stats`
+# does not load folium or SciPy. The stages are plain functions in
+# the scripts and can be imported for batch use the same way:
+#   importlib.import_module("curve-update").update_curve_csv("curve", "curve-updated")
+
+INPUT_FILE = "mumbai_railways_updated_with_elevations.geojson"
+
+def _stage(module, function):
+    """The stage function `function` of the script `module` (which may have a hyphen in its name)."""
+    return getattr(importlib.import_module(module), function)
+
+def cmd_fetch(args):
+    fetch_network = _stage("getting-coordinates", "fetch_network")
+    fetch_network(tuple(args.bbox), args.raw, args.output, args.map, args.srtm_dir, args.max_age_hours,
+                  not args.per_segment)
+
+def cmd_compact(args):
+    compact_geojson = _stage("compaction", "compact_geojson")
+    compact_geojson(args.input, args.output, args.tolerance, args.min_share)
+
+def cmd_elevate(args):
+    elevate_geojson = _stage("geojson-processing", "elevate_geojson")
+    elevate_geojson(args.input, args.output, args.srtm_dir, args.api)
+
+def cmd_fit(args):
+    update_curve_csv = _stage("curve-update", "update_curve_csv")
+    update_curve_csv(args.input_prefix, args.output_prefix, args.legacy_csv, args.track)
+
+def cmd_detect(args):
+    detect_to_csv = _stage("curve_detection", "detect_to_csv")
+    detect_to_csv(args.input, args.output, args.workers)
+
+def cmd_render(args):
+    render_map = _stage("elevation_heatmap_and_curvature", "render_map")
+    render_map(args.input, args.arcs, args.map, not args.per_segment)
+
+def cmd_tiles(args):
+    write_tiles = _stage("map_tiles", "write_tiles")
+    write_tiles(args.input, args.arcs, args.tile_dir)
+
+def cmd_profile(args):
+    profile_network = _stage("gradient_profile", "profile_network")
+    profile_network(args.input, args.profile_csv, args.steep, args.workers)
+
+def cmd_stats(args):
+    report_stats = _stage("stats", "report_stats")
+    report_stats(args.input, args.raw, args.way_stats, args.hotspots, args.hotspot_count, args.connectivity)
+
+def _workers(value):
+    """--workers: a number of processes, or 0 for every core."""
+    return int(value) or None
+
+def build_parser():
+    # Defaults are repeated here rather than read from the scripts, which
+    # would mean importing every stage just to print --help
+    parser = argparse.ArgumentParser(description="Mumbai railways elevation and curvature pipeline.")
+    parser.add_argument("--report", nargs="?", const="", metavar="PATH",
+                        help="write a JSON run report (default path: run_reports/<command>-<time>.json)")
+    parser.add_argument("--profile", action="store_true", help="also run under cProfile, saving the stats as .prof")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    p = commands.add_parser("fetch", help="download the OSM railways with node elevations")
+    p.add_argument("--bbox", nargs=4, type=float, metavar=("S", "W", "N", "E"),
+                   default=(18.687879, 72.463074, 20.166833, 73.847351))
+    p.add_argument("--raw", default="raw_osm_data.json")
+    p.add_argument("--output", default="mumbai_railways.geojson")
+    p.add_argument("--map", default="mumbai_railways_from_OSM.html")
+    p.add_argument("--srtm-dir", help="sample local .hgt tiles instead of the elevation API")
+    p.add_argument("--max-age-hours", type=float, default=24 * 7, help="re-download cached Overpass tiles older than this")
+    p.add_argument("--per-segment", action="store_true", help="draw one PolyLine per segment instead of colour bins")
+    p.set_defaults(run=cmd_fetch)
+
+    p = commands.add_parser("compact", help="remove repeated vertices and duplicate or overlapping ways")
+    p.add_argument("--input", default="mumbai_railways_updated.geojson")
+    p.add_argument("--output", default="mumbai_railways_compacted.geojson")
+    p.add_argument("--tolerance", type=float, default=1.5, help="metres within which a way lies on another")
+    p.add_argument("--min-share", type=float, default=0.95, help="share of a way's length that must overlap")
+    p.set_defaults(run=cmd_compact)
+
+    p = commands.add_parser("elevate", help="fill in missing elevations of the hand-traced lines")
+    p.add_argument("--input", default="mumbai_railways_compacted.geojson",
+                   help="falls back to mumbai_railways_updated.geojson when the default has not been compacted yet")
+    p.add_argument("--output", default=INPUT_FILE)
+    p.add_argument("--srtm-dir")
+    p.add_argument("--api", default="https://api.opentopodata.org/v1/srtm90m")
+    p.set_defaults(run=cmd_elevate)
+
+    p = commands.add_parser("fit", help="fit circles to the traced arcs and tie them to the track")
+    p.add_argument("--input-prefix", default="curve")
+    p.add_argument("--output-prefix", default="curve-updated")
+    p.add_argument("--legacy-csv", default="curve-updated.csv", help="single-file copy for the site download link")
+    p.add_argument("--track", default=INPUT_FILE)
+    p.set_defaults(run=cmd_fit)
+
+    p = commands.add_parser("detect", help="detect curves along the whole network")
+    p.add_argument("--input", default=INPUT_FILE)
+    p.add_argument("--output", default="curve-detected.csv")
+    p.add_argument("--workers", type=_workers, default=1, help="processes (0 for every core)")
+    p.set_defaults(run=cmd_detect)
+
+    p = commands.add_parser("render", help="draw the elevation heatmap with the fitted curves")
+    p.add_argument("--input", default=INPUT_FILE)
+    p.add_argument("--arcs", default="curve-updated", help="arc table prefix")
+    p.add_argument("--map", default="mumbai_railways_with_curves.html")
+    p.add_argument("--per-segment", action="store_true")
+    p.set_defaults(run=cmd_render)
+
+    p = commands.add_parser("tiles", help="build the static map tiles")
+    p.add_argument("--input", default=INPUT_FILE)
+    p.add_argument("--arcs", default="curve-updated", help="arc table prefix")
+    p.add_argument("--tile-dir", default="tiles")
+    p.set_defaults(run=cmd_tiles)
+
+    p = commands.add_parser("profile", help="write the gradient profile and steep sections")
+    p.add_argument("--input", default=INPUT_FILE)
+    p.add_argument("--profile-csv", default="railway_gradient_profile.csv")
+    p.add_argument("--steep", default="railway_steep_sections.csv")
+    p.add_argument("--workers", type=_workers, default=1, help="processes (0 for every core)")
+    p.set_defaults(run=cmd_profile)
+
+    p = commands.add_parser("stats", help="print length and gradient statistics")
+    p.add_argument("--input", default=INPUT_FILE)
+    p.add_argument("--raw", default="raw_osm_data.json")
+    p.add_argument("--way-stats", default="railway_way_stats.csv")
+    p.add_argument("--hotspots", default="railway_grade_hotspots.csv")
+    p.add_argument("--hotspot-count", type=int, default=20)
+    p.add_argument("--connectivity", action="store_true",
+                   help="also report the distinct track length and connected pieces from --raw (slower, loads SciPy)")
+    p.set_defaults(run=cmd_stats)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.report is not None or args.profile:
+        from instrumentation import default_report_path, enable
+        report_path = args.report or default_report_path(args.command)
+        enable(report_path, os.path.splitext(report_path)[0] + ".prof" if args.profile else None)
+    args.run(args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+import numpy as np
+from curvature import MAX_RADIUS_M, vertex_curvature
+from projection import local_frames
+from spatial_index import point_segment_distance
+from track_store import TrackStore
+
+# ---------- CONFIG ----------
+# Tolerances (m) per stage: the largest deviation from the original line that stage accepts
+RENDER_TOLERANCE_M = 2.0
+CURVE_TOLERANCE_M = 0.5
+ELEVATION_MAX_GAP_M = 90.0   # elevation lookups at most this far apart along a way, one per SRTM cell
+# ----------------------------
+
+def _chainage(x, y, offsets):
+    """Distance along each way of every vertex, restarting at 0 on every way."""
+    step = np.zeros(len(x))
+    step[1:] = np.hypot(np.diff(x), np.diff(y))
+    counts = np.diff(offsets)
+    step[offsets[:-1][counts > 0]] = 0.0
+    cumulative = np.cumsum(step)
+    way = np.repeat(np.arange(len(counts)), counts)
+    return cumulative - cumulative[offsets[:-1][way]] if len(x) else cumulative
+
+def curvature_vertices(x, y, offsets, max_radius=MAX_RADIUS_M):
+    """
+    Vertices curve detection would put on a curve (sliding-chord radius below
+    `max_radius`) plus the tangent vertex either side, where curves begin and end.
+    """
+    curved = np.abs(vertex_curvature(np.column_stack([x, y]), offsets)) > 1 / max_radius
+    keep = curved.copy()
+    keep[1:] |= curved[:-1]
+    keep[:-1] |= curved[1:]
+    return keep
+
+def rdp(x, y, offsets, tolerance, preserve=None, max_gap=None):
+    """
+    Ramer-Douglas-Peucker over every way at once, in planar coordinates.
+
+    Returns a boolean mask of kept vertices: the ends of every way, every
+    `preserve` vertex, and enough others that no dropped vertex is more than
+    `tolerance` from the simplified line. With `max_gap`, kept vertices are
+    also never further apart than that along the way.
+
+    All ranges still being split are handled together each round, so the
+    Python loop runs once per recursion level rather than once per range.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    offsets = np.asarray(offsets, dtype=np.int64)
+    counts = np.diff(offsets)
+    keep = np.zeros(len(x), dtype=bool) if preserve is None else np.asarray(preserve, dtype=bool).copy()
+    keep[offsets[:-1][counts > 0]] = True
+    keep[offsets[1:][counts > 0] - 1] = True
+    chainage = _chainage(x, y, offsets) if max_gap is not None else None
+
+    # Ranges between consecutive kept vertices of the same way that still have interior vertices
+    kept = np.flatnonzero(keep)
+    way = np.repeat(np.arange(len(counts)), counts)
+    same_way = way[kept[:-1]] == way[kept[1:]]
+    s, e = kept[:-1][same_way], kept[1:][same_way]
+
+    while True:
+        inner = e - s - 1
+        s, e, inner = s[inner > 0], e[inner > 0], inner[inner > 0]
+        if len(s) == 0:
+            break
+
+        r = np.repeat(np.arange(len(s)), inner)
+        idx = np.arange(inner.sum()) - np.repeat(np.cumsum(inner) - inner, inner) + s[r] + 1
+        d, _ = point_segment_distance(x[idx], y[idx], x[s[r]], y[s[r]], x[e[r]], y[e[r]])
+
+        # Farthest interior vertex of every range (first one on ties)
+        first = np.cumsum(inner) - inner
+        dmax = np.maximum.reduceat(d, first)
+        at_max = np.flatnonzero(d == dmax[r])
+        _, pick = np.unique(r[at_max], return_index=True)
+        split = idx[at_max[pick]]
+
+        too_far = dmax > tolerance
+        if chainage is not None:
+            # Long ranges within tolerance are cut at their middle instead
+            too_long = ~too_far & (chainage[e] - chainage[s] > max_gap)
+            half = (chainage[s] + chainage[e]) / 2
+            before_half = np.add.reduceat((chainage[idx] < half[r]).astype(np.int64), first)
+            split = np.where(too_long, s + 1 + np.minimum(before_half, inner - 1), split)
+            too_far |= too_long
+
+        s, e, split = s[too_far], e[too_far], split[too_far]
+        keep[split] = True
+        s, e = np.concatenate([s, split]), np.concatenate([split, e])
+    return keep
+
+def deviation(x, y, offsets, keep):
+    """Distance of every vertex from the simplified line (0 for kept vertices)."""
+    n = len(x)
+    idx = np.arange(n)
+    prev = np.maximum.accumulate(np.where(keep, idx, 0))
+    nxt = np.minimum.accumulate(np.where(keep, idx, n - 1)[::-1])[::-1]
+    d, _ = point_segment_distance(x, y, x[prev], y[prev], x[nxt], y[nxt])
+    return np.where(keep, 0.0, d)
+
+def interpolate_dropped(store, values, keep):
+    """
+    `values` (one per vertex of the TrackStore) at dropped vertices replaced by
+    linear interpolation along the way between the kept vertices either side.
+    Way ends are always kept, so both neighbours are on the same way.
+    """
+    x, y, _, _ = local_frames(store.lon, store.lat, store.offsets)
+    chainage = _chainage(x, y, store.offsets)
+    n = len(values)
+    idx = np.arange(n)
+    prev = np.maximum.accumulate(np.where(keep, idx, 0))
+    nxt = np.minimum.accumulate(np.where(keep, idx, n - 1)[::-1])[::-1]
+    span = chainage[nxt] - chainage[prev]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = np.where(span > 0, (chainage - chainage[prev]) / span, 0.0)
+    return np.where(keep, values, values[prev] + t * (values[nxt] - values[prev]))
+
+def simplification_mask(store, tolerance, preserve_curves=True, max_gap=None):
+    """
+    rdp() on a TrackStore, measured in metres in a local frame per way.
+    Returns (keep mask, report dict).
+    """
+    x, y, _, _ = local_frames(store.lon, store.lat, store.offsets)
+    preserve = curvature_vertices(x, y, store.offsets) if preserve_curves else None
+    keep = rdp(x, y, store.offsets, tolerance, preserve, max_gap)
+    d = deviation(x, y, store.offsets, keep)
+    report = {
+        "vertices": len(keep),
+        "kept": int(keep.sum()),
+        "preserved": int(preserve.sum()) if preserve is not None else 0,
+        "max_deviation_m": float(d.max()) if len(d) else 0.0,
+        "tolerance_m": tolerance,
+    }
+    return keep, report
+
+def elevation_sample_mask(store, max_gap=ELEVATION_MAX_GAP_M):
+    """
+    Vertices to look elevations up for: every way end and enough others that
+    lookups are never more than `max_gap` apart along a way. The line's shape
+    says nothing about its height, so only distance along the way counts; with
+    the ground changing by at most `slope` per metre, a vertex interpolated
+    between two lookups is off by at most slope * max_gap / 2.
+    """
+    x, y, _, _ = local_frames(store.lon, store.lat, store.offsets)
+    return rdp(x, y, store.offsets, np.inf, max_gap=max_gap)
+
+def subset(store, keep):
+    """A TrackStore holding only the kept vertices."""
+    kept = np.flatnonzero(keep)
+    return TrackStore(
+        store.lon[kept], store.lat[kept], store.elevation[kept], np.searchsorted(kept, store.offsets),
+        store.way_ids, store.names, None if store.node_ids is None else store.node_ids[kept],
+    )
+
+def simplify_store(store, tolerance, preserve_curves=True, max_gap=None):
+    """Simplified copy of a TrackStore and the report from simplification_mask."""
+    keep, report = simplification_mask(store, tolerance, preserve_curves, max_gap)
+    return subset(store, keep), report
+
+def format_report(report):
+    dropped = report["vertices"] - report["kept"]
+    share = dropped / report["vertices"] if report["vertices"] else 0.0
+    return (f"Simplified {report['vertices']} -> {report['kept']} vertices ({share:.1%} fewer, "
+            f"{report['preserved']} kept on curves), max deviation {report['max_deviation_m']:.2f} m "
+            f"(tolerance {report['tolerance_m']} m)")
@@ -0,0 +1,128 @@
+import numpy as np
+
+# ---------- CONFIG ----------
+CELL_SIZE = 250.0     # grid cell edge, in the units of the coordinates (metres)
+QUERY_CHUNK = 65536   # query points processed together, bounds temporary memory
+# ----------------------------
+
+def point_segment_distance(px, py, ax, ay, bx, by):
+    """Distance from points to segments (element-wise) and the fraction t along each segment."""
+    dx, dy = bx - ax, by - ay
+    length2 = dx * dx + dy * dy
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = np.where(length2 > 0, ((px - ax) * dx + (py - ay) * dy) / length2, 0.0)
+    t = np.clip(t, 0.0, 1.0)
+    return np.hypot(px - (ax + t * dx), py - (ay + t * dy)), t
+
+class SegmentGrid:
+    """
+    Uniform grid over line segments in a planar metric frame.
+
+    Each segment is registered in every cell its bounding box touches. Cells are
+    stored as sorted integer keys with CSR-style start offsets into one array of
+    segment indices, so building and querying are plain NumPy array operations.
+    """
+
+    def __init__(self, ax, ay, bx, by, cell_size=CELL_SIZE):
+        self.ax, self.ay = np.asarray(ax, dtype=float), np.asarray(ay, dtype=float)
+        self.bx, self.by = np.asarray(bx, dtype=float), np.asarray(by, dtype=float)
+        self.cell_size = cell_size
+        self.x0 = min(self.ax.min(), self.bx.min()) if len(self.ax) else 0.0
+        self.y0 = min(self.ay.min(), self.by.min()) if len(self.ay) else 0.0
+
+        ix0, iy0 = self._cell(np.minimum(self.ax, self.bx), np.minimum(self.ay, self.by))
+        ix1, iy1 = self._cell(np.maximum(self.ax, self.bx), np.maximum(self.ay, self.by))
+        nx, ny = ix1 - ix0 + 1, iy1 - iy0 + 1
+        counts = nx * ny
+
+        # Expand every segment into the cells of its bounding box
+        seg = np.repeat(np.arange(len(self.ax)), counts)
+        k = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        cx = ix0[seg] + k // ny[seg]
+        cy = iy0[seg] + k % ny[seg]
+        keys = self._key(cx, cy)
+
+        order = np.argsort(keys, kind="stable")
+        keys, self.cell_segments = keys[order], seg[order]
+        self.cell_keys, self.cell_starts = np.unique(keys, return_index=True)
+        self.cell_starts = np.append(self.cell_starts, len(keys))
+
+    def _cell(self, x, y):
+        return (np.floor((x - self.x0) / self.cell_size).astype(np.int64),
+                np.floor((y - self.y0) / self.cell_size).astype(np.int64))
+
+    @staticmethod
+    def _key(cx, cy):
+        # Cells may be negative for queries outside the indexed extent
+        return (cx + (1 << 30)) * (1 << 31) + (cy + (1 << 30))
+
+    def _candidates(self, px, py, radius):
+        """(query index, segment index) pairs for segments in cells within `radius`."""
+        reach = int(np.ceil(radius / self.cell_size))
+        qx, qy = self._cell(px, py)
+        off = np.arange(-reach, reach + 1)
+        ox, oy = np.meshgrid(off, off, indexing="ij")
+        keys = self._key(qx[:, None] + ox.ravel(), qy[:, None] + oy.ravel())
+
+        pos = np.searchsorted(self.cell_keys, keys.ravel())
+        pos = np.minimum(pos, len(self.cell_keys) - 1)
+        hit = self.cell_keys[pos] == keys.ravel()
+        query = np.repeat(np.arange(len(px)), ox.size)[hit]
+        pos = pos[hit]
+
+        starts, ends = self.cell_starts[pos], self.cell_starts[pos + 1]
+        counts = ends - starts
+        query = np.repeat(query, counts)
+        k = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        segment = self.cell_segments[np.repeat(starts, counts) + k]
+
+        # A segment spanning several cells shows up once per cell. Sorting and
+        # dropping repeats is much faster than np.unique, which hashes on NumPy 2.3+
+        pairs = np.sort(query * len(self.ax) + segment)
+        pairs = pairs[np.r_[True, pairs[1:] != pairs[:-1]]] if len(pairs) else pairs
+        return pairs // len(self.ax), pairs % len(self.ax)
+
+    def within(self, px, py, distance):
+        """All (query index, segment index, distance) with the segment within `distance` of the point."""
+        px, py = np.atleast_1d(px).astype(float), np.atleast_1d(py).astype(float)
+        out_q, out_s, out_d = [], [], []
+        for start in range(0, len(px), QUERY_CHUNK):
+            chunk = slice(start, start + QUERY_CHUNK)
+            if len(self.cell_keys) == 0:
+                break
+            q, s = self._candidates(px[chunk], py[chunk], distance)
+            d, _ = point_segment_distance(px[chunk][q], py[chunk][q], self.ax[s], self.ay[s], self.bx[s], self.by[s])
+            keep = d <= distance
+            out_q.append(q[keep] + start)
+            out_s.append(s[keep])
+            out_d.append(d[keep])
+        if not out_q:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0)
+        return np.concatenate(out_q), np.concatenate(out_s), np.concatenate(out_d)
+
+    def nearest(self, px, py, max_distance):
+        """
+        Nearest segment to every point, searching up to `max_distance`.
+        Returns (segment index, distance, t along the segment); segment is -1
+        and distance inf where nothing is that close.
+        """
+        px, py = np.atleast_1d(px).astype(float), np.atleast_1d(py).astype(float)
+        best = np.full(len(px), -1, dtype=np.int64)
+        best_d = np.full(len(px), np.inf)
+        best_t = np.zeros(len(px))
+        for start in range(0, len(px), QUERY_CHUNK):
+            chunk = slice(start, start + QUERY_CHUNK)
+            if len(self.cell_keys) == 0:
+                break
+            q, s = self._candidates(px[chunk], py[chunk], max_distance)
+            d, t = point_segment_distance(px[chunk][q], py[chunk][q], self.ax[s], self.ay[s], self.bx[s], self.by[s])
+            keep = d <= max_distance
+            q, s, d, t = q[keep], s[keep], d[keep], t[keep]
+            # Closest candidate per query: sort by (query, distance) and take the first
+            order = np.lexsort((d, q))
+            q, s, d, t = q[order], s[order], d[order], t[order]
+            first = np.flatnonzero(np.r_[True, q[1:] != q[:-1]]) if len(q) else np.zeros(0, dtype=np.int64)
+            best[q[first] + start] = s[first]
+            best_d[q[first] + start] = d[first]
+            best_t[q[first] + start] = t[first]
+        return best, best_d, best_t
@@ -0,0 +1,122 @@
+import os
+from collections import OrderedDict
+import numpy as np
+from instrumentation import count, stage
+
+# ---------- CONFIG ----------
+SRTM_DIR = "srtm"       # folder holding N19E072.hgt style tiles
+MAX_OPEN_TILES = 16     # memory-mapped tiles kept open at once
+VOID = -32768           # SRTM no-data value
+# ----------------------------
+
+def tile_name(lat_floor, lon_floor):
+    """SRTM file name of the 1x1 degree tile whose south-west corner is given."""
+    ns = "N" if lat_floor >= 0 else "S"
+    ew = "E" if lon_floor >= 0 else "W"
+    return f"{ns}{abs(lat_floor):02d}{ew}{abs(lon_floor):03d}.hgt"
+
+def dataset_name(tile_dir):
+    """
+    Elevation cache dataset for the tiles in `tile_dir`, by their resolution,
+    e.g. "srtm-local-3s"; a folder mixing resolutions gets "srtm-local-1s+3s".
+    """
+    names = os.listdir(tile_dir) if os.path.isdir(tile_dir) else []
+    seconds = set()
+    for name in names:
+        if name.endswith(".hgt"):
+            posts = int(round(np.sqrt(os.path.getsize(os.path.join(tile_dir, name)) // 2)))
+            seconds.add(round(3600 / (posts - 1)))
+    return "srtm-local" + ("-" + "+".join(f"{s}s" for s in sorted(seconds)) if seconds else "")
+
+class SRTMTileSampler:
+    """
+    Offline elevation backend over local SRTM .hgt tiles.
+
+    Tiles are memory-mapped the first time a point falls on them and the least
+    recently used one is closed once more than `max_open` are open. Heights are
+    bilinearly interpolated between the four surrounding posts, the same
+    interpolation the opentopodata srtm90m dataset uses. Its heights are cached
+    as `dataset`, apart from the API's, so the two are never mixed.
+    """
+
+    def __init__(self, tile_dir=SRTM_DIR, max_open=MAX_OPEN_TILES):
+        self.tile_dir = tile_dir
+        self.dataset = dataset_name(tile_dir)
+        self.max_open = max_open
+        self.tiles = OrderedDict()
+        self.loads = 0
+        self.evictions = 0
+
+    def _tile(self, lat_floor, lon_floor):
+        key = (lat_floor, lon_floor)
+        if key in self.tiles:
+            self.tiles.move_to_end(key)
+            return self.tiles[key]
+
+        path = os.path.join(self.tile_dir, tile_name(lat_floor, lon_floor))
+        if os.path.exists(path):
+            # 1201 posts per side for 3 arc-second tiles, 3601 for 1 arc-second
+            size = int(round(np.sqrt(os.path.getsize(path) // 2)))
+            tile = np.memmap(path, dtype=">i2", mode="r", shape=(size, size))
+        else:
+            tile = None  # no tile on disk, e.g. open sea
+        self.loads += 1
+
+        self.tiles[key] = tile
+        if len(self.tiles) > self.max_open:
+            self.tiles.popitem(last=False)
+            self.evictions += 1
+        return tile
+
+    def sample(self, lat, lon):
+        """Elevation for arrays of lat/lon in one call; NaN where there is no data."""
+        lat = np.asarray(lat, dtype=float)
+        lon = np.asarray(lon, dtype=float)
+        out = np.full(lat.shape, np.nan)
+
+        lat_floor = np.floor(lat).astype(np.int64)
+        lon_floor = np.floor(lon).astype(np.int64)
+        keys, inverse = np.unique(np.stack([lat_floor.ravel(), lon_floor.ravel()], axis=1),
+                                  axis=0, return_inverse=True)
+        order = np.argsort(inverse, kind="stable")
+        bounds = np.searchsorted(inverse[order], np.arange(len(keys) + 1))
+
+        flat_lat, flat_lon, flat_out = lat.ravel(), lon.ravel(), out.reshape(-1)
+        for k, (la, lo) in enumerate(keys):
+            tile = self._tile(int(la), int(lo))
+            if tile is None:
+                continue
+            idx = order[bounds[k]:bounds[k + 1]]
+            n = tile.shape[0] - 1
+            # Row 0 is the northern edge of the tile
+            row = (la + 1 - flat_lat[idx]) * n
+            col = (flat_lon[idx] - lo) * n
+            r0 = np.clip(np.floor(row).astype(np.int64), 0, n - 1)
+            c0 = np.clip(np.floor(col).astype(np.int64), 0, n - 1)
+            fr, fc = row - r0, col - c0
+
+            z00 = tile[r0, c0].astype(float)
+            z01 = tile[r0, c0 + 1].astype(float)
+            z10 = tile[r0 + 1, c0].astype(float)
+            z11 = tile[r0 + 1, c0 + 1].astype(float)
+            z = (z00 * (1 - fr) * (1 - fc) + z01 * (1 - fr) * fc
+                 + z10 * fr * (1 - fc) + z11 * fr * fc)
+            void = (z00 == VOID) | (z01 == VOID) | (z10 == VOID) | (z11 == VOID)
+            flat_out[idx] = np.where(void, np.nan, z)
+        return out
+
+    def fetch(self, locations, on_batch=None):
+        """Drop-in for ElevationClient.fetch: a list aligned with the (lat, lon) pairs, None for no data."""
+        if not locations:
+            return []
+        lat, lon = np.array(locations, dtype=float).T
+        count("srtm_points", len(locations))
+        with stage("srtm_sample"):
+            heights = self.sample(lat, lon)
+        elevations = [None if np.isnan(h) else h for h in heights.tolist()]
+        if on_batch is not None:
+            on_batch(locations, elevations)
+        return elevations
+
+    def close(self):
+        self.tiles.clear()
@@ -1,45 +1,89 @@
-import json
-from math import radians, sin, cos, sqrt, atan2
-
-# --- Haversine function ---
-def haversine(lat1, lon1, lat2, lon2):
-    R = 6371000  # Earth radius in meters
-    phi1, phi2 = radians(lat1), radians(lat2)
-    dphi = radians(lat2 - lat1)
-    dlambda = radians(lon2 - lon1)
-
-    a = sin(dphi / 2) ** 2 + cos(phi1) * cos(phi2) * sin(dlambda / 2) ** 2
-    return R * 2 * atan2(sqrt(a), sqrt(1 - a))
-
-# --- Load GeoJSON ---
-with open("mumbai_railways_updated_with_elevations.geojson") as f:
-    geojson = json.load(f)
-
-group1_coords = []  # For "line added"
-group2_coords = []  
-
-for feature in geojson["features"]:
-    coords = feature["geometry"]["coordinates"]
-    name = feature["properties"].get("name", "")
-    
-    if name.strip().lower() == "line added":
-        group1_coords.append(coords)
-    else:
-        group2_coords.append(coords)
-
-def total_distance(coord_groups):
-    total = 0
-    for coords in coord_groups:
-        for i in range(len(coords) - 1):
-            lon1, lat1 = coords[i][0], coords[i][1]
-            lon2, lat2 = coords[i+1][0], coords[i+1][1]
-            total += haversine(lat1, lon1, lat2, lon2)
-    return total
-
-# Calculate distances
-dist_group1 = total_distance(group1_coords)
-dist_group2 = total_distance(group2_coords)
-
-print(f"Total distance of all railway lines obtained from OSM: {dist_group2:.3f} m")
-print(f"Total distance of all railway lines hand-drawn: {dist_group1:.3f} m")
+import numpy as np
+from instrumentation import count, stage
+from track_store import TrackStore
+from network_stats import (
+    grade_hotspots, grade_percentiles, name_totals, segment_table, way_grade_summary, way_totals, write_table,
+)
 
+# ---------- CONFIG ----------
+INPUT_FILE = "mumbai_railways_updated_with_elevations.geojson"
+RAW_OSM_FILE = "raw_osm_data.json"
+WAY_STATS_FILE = "railway_way_stats.csv"
+HOTSPOTS_FILE = "railway_grade_hotspots.csv"
+HOTSPOT_COUNT = 20
+CONNECTIVITY = False      # also report distinct OSM track length and connected pieces (loads SciPy)
+# ----------------------------
+
+def report_stats(input_path=INPUT_FILE, raw_osm_path=RAW_OSM_FILE, way_stats_path=WAY_STATS_FILE,
+                 hotspots_path=HOTSPOTS_FILE, hotspot_count=HOTSPOT_COUNT, connectivity=CONNECTIVITY):
+    """
+    Print the length and gradient summaries and save the per-way and hotspot tables.
+    With `connectivity` the raw OSM data is also built into a graph for the
+    distinct track length; SciPy is only imported then.
+    """
+    # --- Load GeoJSON ---
+    with stage("load"):
+        store = TrackStore.load(input_path)
+        count("points", store.n_points)
+
+    with stage("segments"):
+        segments = segment_table(store)
+
+        # "line added" ways were hand-drawn, everything else came from OSM
+        hand_drawn = np.array([name.strip().lower() == "line added" for name in store.names], dtype=bool)
+        lengths = way_totals(store, segments)
+
+        # Calculate distances
+        dist_group1 = lengths[hand_drawn].sum()
+        dist_group2 = lengths[~hand_drawn].sum()
+
+        print(f"Total distance of all railway lines obtained from OSM: {dist_group2:.3f} m")
+        print(f"Total distance of all railway lines hand-drawn: {dist_group1:.3f} m")
+
+    # Shared junction nodes and overlapping ways counted once
+    if connectivity:
+        from network_graph import NetworkGraph
+        with stage("graph"):
+            graph = NetworkGraph.from_osm(raw_osm_path)
+            n_components, _ = graph.components()
+            print(f"Distinct OSM track length (shared segments counted once): {graph.total_length():.3f} m "
+                  f"in {n_components} connected pieces")
+
+    # --- Per line totals ---
+    with stage("totals"):
+        print("\nLength per line name:")
+        names, totals = name_totals(store, segments)
+        for name, total in sorted(zip(names, totals), key=lambda item: -item[1]):
+            print(f"  {name}: {total:.3f} m")
+
+        # --- Gradient ---
+        print("\nAbsolute gradient percentiles:")
+        for p, grade in grade_percentiles(segments).items():
+            print(f"  p{p}: {grade * 100:.2f}%")
+
+    with stage("save"):
+        mean_grade, max_grade = way_grade_summary(store, segments)
+        write_table(way_stats_path, {
+            "way_id": store.way_ids,
+            "name": store.names,
+            "length_m": np.round(lengths, 3),
+            "mean_abs_grade_pct": np.round(mean_grade * 100, 3),
+            "max_abs_grade_pct": np.round(max_grade * 100, 3),
+        })
+        print(f"\nPer-way statistics saved to {way_stats_path}")
+
+        top = grade_hotspots(segments, hotspot_count)
+        start = segments["start"][top]
+        write_table(hotspots_path, {
+            "way_id": store.way_ids[segments["way"][top]],
+            "name": [store.names[w] for w in segments["way"][top]],
+            "lat": store.lat[start],
+            "lon": store.lon[start],
+            "length_m": np.round(segments["length"][top], 3),
+            "rise_m": segments["rise"][top],
+            "grade_pct": np.round(segments["grade"][top] * 100, 3),
+        })
+        print(f"Steepest {len(top)} segments saved to {hotspots_path}")
+
+if __name__ == "__main__":
+    report_stats()
@@ -0,0 +1,129 @@
+import numpy as np
+from projection import from_local, lonlat_to_mercator
+from track_store import TrackStore
+
+# ---------- CONFIG ----------
+ORIGIN = (72.88, 19.08)          # lon, lat the synthetic network is laid out around (Mumbai)
+SPACING_M = 20.0                 # vertex spacing along the track
+WAY_VERTICES = 500               # average vertices per way
+CURVES_PER_WAY = 3
+RADIUS_RANGE_M = (300.0, 3000.0)
+DEFLECTION_RANGE_DEG = (15.0, 90.0)
+TANGENT_RANGE_M = (300.0, 2000.0)
+GRADE_RANGE = (-0.01, 0.01)      # one constant grade per piece
+ARC_POINTS = 7                   # vertices per synthetic traced arc, like the QGIS tool
+# ----------------------------
+
+# Networks built from tangents and circular curves of known radius, so the
+# benchmarks can check the fitters and detectors against the truth as well as
+# time them. Everything is generated with array operations; 10M vertices take
+# a few seconds.
+
+def _piece_positions(length, kappa, theta0):
+    """End displacement (dx, dy) of pieces of given length and curvature starting at heading theta0."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        dx = np.where(kappa != 0, (np.sin(theta0 + kappa * length) - np.sin(theta0)) / kappa,
+                      length * np.cos(theta0))
+        dy = np.where(kappa != 0, (np.cos(theta0) - np.cos(theta0 + kappa * length)) / kappa,
+                      length * np.sin(theta0))
+    return dx, dy
+
+def generate_network(n_vertices, seed=0, spacing=SPACING_M, way_vertices=WAY_VERTICES,
+                     curves_per_way=CURVES_PER_WAY, origin=ORIGIN):
+    """
+    A TrackStore of about `n_vertices` vertices: ways of alternating tangents and
+    circular curves, each way starting at a random point and heading near `origin`.
+    Elevation follows a constant grade per piece.
+
+    Returns (store, truth) where truth holds, per curve: way, radius, first and
+    last vertex index (global) and signed curvature.
+    """
+    rng = np.random.default_rng(seed)
+    n_ways = max(1, int(round(n_vertices / way_vertices)))
+    pieces_per_way = 2 * curves_per_way + 1
+    n_pieces = n_ways * pieces_per_way
+
+    is_curve = np.tile(np.arange(pieces_per_way) % 2 == 1, n_ways)
+    radius = rng.uniform(*RADIUS_RANGE_M, n_pieces)
+    deflection = np.radians(rng.uniform(*DEFLECTION_RANGE_DEG, n_pieces))
+    side = rng.choice([-1.0, 1.0], n_pieces)
+    length = np.where(is_curve, radius * deflection, rng.uniform(*TANGENT_RANGE_M, n_pieces))
+    kappa = np.where(is_curve, side / radius, 0.0)
+
+    # Scale piece lengths so every way has about way_vertices vertices
+    way_of_piece = np.repeat(np.arange(n_ways), pieces_per_way)
+    way_length = np.bincount(way_of_piece, weights=length)
+    scale = way_vertices * spacing / way_length
+    length = length * scale[way_of_piece]
+    radius = np.where(is_curve, radius * scale[way_of_piece], np.inf)
+    kappa = kappa / scale[way_of_piece]
+
+    # Heading and start position of every piece, accumulated within its way
+    turn = kappa * length
+    first_piece = np.arange(n_ways) * pieces_per_way
+    cumulative_turn = np.cumsum(turn) - turn
+    heading0 = rng.uniform(0, 2 * np.pi, n_ways)
+    theta0 = heading0[way_of_piece] + cumulative_turn - cumulative_turn[first_piece][way_of_piece]
+    dx, dy = _piece_positions(length, kappa, theta0)
+    start_x = rng.uniform(-20000, 20000, n_ways)
+    start_y = rng.uniform(-20000, 20000, n_ways)
+    cx, cy = np.cumsum(dx) - dx, np.cumsum(dy) - dy
+    x0 = start_x[way_of_piece] + cx - cx[first_piece][way_of_piece]
+    y0 = start_y[way_of_piece] + cy - cy[first_piece][way_of_piece]
+
+    grade = rng.uniform(*GRADE_RANGE, n_pieces)
+    rise = grade * length
+    cumulative_rise = np.cumsum(rise) - rise
+    z0 = 20.0 + cumulative_rise - cumulative_rise[first_piece][way_of_piece]
+
+    # Sample every piece every `spacing` metres; the last piece of a way also gets its end point
+    last_piece = np.zeros(n_pieces, dtype=bool)
+    last_piece[first_piece + pieces_per_way - 1] = True
+    counts = np.maximum(1, np.round(length / spacing).astype(np.int64)) + last_piece
+    piece = np.repeat(np.arange(n_pieces), counts)
+    k = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    s = k * (length / np.maximum(1, counts - last_piece))[piece]
+    px, py = _piece_positions(s, kappa[piece], theta0[piece])
+    x = x0[piece] + px
+    y = y0[piece] + py
+    z = z0[piece] + grade[piece] * s
+
+    lon, lat = from_local(x, y, origin[0], origin[1])
+    way_counts = np.bincount(way_of_piece, weights=counts).astype(np.int64)
+    offsets = np.concatenate([[0], np.cumsum(way_counts)])
+    store = TrackStore(lon, lat, z, offsets, np.arange(1, n_ways + 1), [f"Synthetic {i % 5}" for i in range(n_ways)])
+
+    piece_start = np.cumsum(counts) - counts
+    curves = np.flatnonzero(is_curve)
+    truth = {
+        "way": way_of_piece[curves],
+        "radius": radius[curves],
+        "kappa": kappa[curves],
+        "start": piece_start[curves],
+        "end": piece_start[curves] + counts[curves] - 1,
+    }
+    return store, truth
+
+def generate_arcs(n_arcs, points=ARC_POINTS, noise=0.5, seed=0, origin=ORIGIN):
+    """
+    Arcs like the ones traced in QGIS: `points` vertices on a circle of known
+    radius with `noise` metres of jitter, in EPSG:3857 around `origin`.
+    Returns (x, y, offsets, radius).
+    """
+    rng = np.random.default_rng(seed)
+    radius = rng.uniform(*RADIUS_RANGE_M, n_arcs)
+    deflection = np.radians(rng.uniform(*DEFLECTION_RANGE_DEG, n_arcs))
+    start = rng.uniform(0, 2 * np.pi, n_arcs)
+    centre_x = rng.uniform(-20000, 20000, n_arcs)
+    centre_y = rng.uniform(-20000, 20000, n_arcs)
+
+    arc = np.repeat(np.arange(n_arcs), points)
+    t = np.tile(np.linspace(0, 1, points), n_arcs)
+    angle = start[arc] + t * deflection[arc]
+    x = centre_x[arc] + radius[arc] * np.cos(angle) + rng.normal(0, noise, len(arc))
+    y = centre_y[arc] + radius[arc] * np.sin(angle) + rng.normal(0, noise, len(arc))
+
+    lon, lat = from_local(x, y, origin[0], origin[1])
+    mx, my = lonlat_to_mercator(lon, lat)
+    offsets = np.arange(n_arcs + 1) * points
+    return mx, my, offsets, radius
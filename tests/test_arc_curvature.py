@@ -0,0 +1,67 @@
+import json
+import os
+import subprocess
+import sys
+import numpy as np
+import pytest
+from arc_curvature import compute_all, measure_arcs, pack_arcs, read_geojson_arcs
+from arc_store import ArcStore
+from projection import from_local, lonlat_to_mercator
+
+LON0, LAT0 = 72.88, 19.08
+
+def arc_lonlat(radius, angle_deg, points=7):
+    """Points on a circle of `radius` ground metres spanning `angle_deg`, as lon/lat."""
+    a = np.radians(np.linspace(0, angle_deg, points))
+    return from_local(radius * np.sin(a), radius * (1 - np.cos(a)), LON0, LAT0)
+
+def arc_mercator(radius, angle_deg, points=7):
+    x, y = lonlat_to_mercator(*arc_lonlat(radius, angle_deg, points))
+    return list(zip(x.tolist(), y.tolist()))
+
+def test_pack_arcs():
+    points, offsets = pack_arcs([[(0, 0), (1, 1)], [], [(2, 2), (3, 3), (4, 4)]])
+    assert offsets.tolist() == [0, 2, 2, 5]
+    assert points.shape == (5, 2)
+
+def test_measures_ground_metres_not_mercator_metres():
+    # At Mumbai's latitude a Mercator metre is about 6% short of a ground metre
+    keep, fit = measure_arcs([arc_mercator(800, 40), arc_mercator(2500, 15)])
+    assert keep == [0, 1]
+    assert fit["radius"] == pytest.approx([800, 2500], rel=1e-3)
+    assert fit["curvature"] == pytest.approx([1 / 800, 1 / 2500], rel=1e-3)
+    assert fit["angle"] == pytest.approx([40, 15], rel=1e-2)
+    assert fit["arc_length"] == pytest.approx([800 * np.radians(40), 2500 * np.radians(15)], rel=1e-2)
+
+def test_short_arcs_are_skipped():
+    keep, fit = measure_arcs([arc_mercator(800, 40)[:2], arc_mercator(800, 40), arc_mercator(500, 30)[:1]])
+    assert keep == [1]
+    assert len(fit["radius"]) == 1
+
+def test_compute_all_from_geojson(tmp_path):
+    features = []
+    for radius, angle in [(600, 30), (1500, 20), (900, 10)]:
+        lon, lat = arc_lonlat(radius, angle)
+        features.append({"type": "Feature", "properties": {},
+                         "geometry": {"type": "LineString", "coordinates": np.column_stack([lon, lat]).tolist()}})
+    features.append({"type": "Feature", "properties": {},
+                     "geometry": {"type": "LineString", "coordinates": [[LON0, LAT0], [LON0 + 0.01, LAT0]]}})
+    path = tmp_path / "drawn.geojson"
+    path.write_text(json.dumps({"type": "FeatureCollection", "features": features}))
+
+    assert len(read_geojson_arcs(str(path))) == 4
+    compute_all(str(path), str(tmp_path / "drawn"))
+    arcs = ArcStore.load(str(tmp_path / "drawn"))
+    assert arcs.arc_ids.tolist() == [1, 2, 3]
+    assert [float(r) for r in arcs.columns["Radius (m)"]] == pytest.approx([600, 1500, 900], rel=1e-3)
+
+def test_command_line_never_overwrites_the_input_tables(tmp_path):
+    points, offsets = pack_arcs([arc_mercator(800, 25)])
+    ArcStore([1], points[:, 0], points[:, 1], offsets).save(str(tmp_path / "curve"))
+    before = (tmp_path / "curve.arcs.csv").read_text()
+    with pytest.raises(ValueError):
+        compute_all(str(tmp_path / "curve"), str(tmp_path / "curve"))
+    script = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "arc_curvature.py")
+    subprocess.run([sys.executable, script, "curve"], cwd=tmp_path, check=True, capture_output=True)
+    assert (tmp_path / "curve.arcs.csv").read_text() == before
+    assert float(ArcStore.load(str(tmp_path / "curve-updated")).columns["Radius (m)"][0]) == pytest.approx(800, rel=1e-3)
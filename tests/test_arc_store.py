@@ -0,0 +1,48 @@
+import numpy as np
+from arc_store import ArcStore, append_arcs, arcs_path, vertices_path
+
+def write(prefix, arcs, vertices):
+    with open(arcs_path(prefix), "w") as f:
+        f.write("Arc ID,Line\n" + "".join(f"{i},{name}\n" for i, name in arcs))
+    with open(vertices_path(prefix), "w") as f:
+        f.write("Arc ID,X,Y\n" + "".join(f"{i},{x},{y}\n" for i, x, y in vertices))
+
+def test_round_trip(tmp_path):
+    prefix = str(tmp_path / "curve")
+    ids = append_arcs(prefix, [{"Line": "A"}, {"Line": "B"}], [[(0, 0), (1, 1), (2, 0)], [(5, 5), (6, 6)]])
+    assert ids == [1, 2]
+    arcs = ArcStore.load(prefix)
+    assert arcs.arc_ids.tolist() == [1, 2]
+    assert arcs.offsets.tolist() == [0, 3, 5]
+    assert arcs.x.tolist() == [0, 1, 2, 5, 6]
+    assert arcs.columns == {"Line": ["A", "B"]}
+
+def test_vertices_follow_arc_table_order(tmp_path):
+    prefix = str(tmp_path / "curve")
+    write(prefix, [(7, "A"), (3, "B")], [(3, 10, 0), (7, 1, 0), (3, 11, 0), (7, 2, 0)])
+    arcs = ArcStore.load(prefix)
+    assert arcs.arc_ids.tolist() == [7, 3]
+    assert arcs.x.tolist() == [1, 2, 10, 11]
+
+def test_orphan_vertices_and_empty_arcs_are_dropped(tmp_path, capsys):
+    prefix = str(tmp_path / "curve")
+    # Arc 2 lost its vertices (an interrupted append); 9 and 4 are not in the arc table
+    write(prefix, [(1, "A"), (2, "B"), (3, "C")],
+          [(1, 0, 0), (9, 50, 50), (1, 1, 0), (3, 5, 5), (4, 60, 60), (3, 6, 5)])
+    arcs = ArcStore.load(prefix)
+    assert arcs.arc_ids.tolist() == [1, 3]
+    assert arcs.offsets.tolist() == [0, 2, 4]
+    assert arcs.x.tolist() == [0, 1, 5, 6]
+    assert arcs.columns == {"Line": ["A", "C"]}
+    out = capsys.readouterr().out
+    assert "2 vertices" in out and "[4, 9]" in out and "[2]" in out
+
+def test_every_arc_can_be_fitted_after_dropping(tmp_path):
+    from arc_curvature import fit_mercator_arcs
+    prefix = str(tmp_path / "curve")
+    angle = np.linspace(0, 0.5, 5)
+    arc = [(1000 * np.cos(a), 1000 * np.sin(a)) for a in angle]
+    write(prefix, [(1, "A"), (2, "B")], [(1, x, y) for x, y in arc])
+    arcs = ArcStore.load(prefix)
+    fit = fit_mercator_arcs(arcs.x, arcs.y, arcs.offsets)
+    assert len(fit["radius"]) == 1
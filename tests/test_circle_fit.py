@@ -0,0 +1,39 @@
+import numpy as np
+from circle_fit import arc_lengths, fit_circle_radius, fit_circles
+
+def arc(xc, yc, radius, start, sweep, n):
+    """n points on a circle from angle `start` through `sweep` radians."""
+    theta = start + np.linspace(0.0, sweep, n)
+    return np.column_stack([xc + radius * np.cos(theta), yc + radius * np.sin(theta)])
+
+def test_known_circles_in_one_batch():
+    # Web Mercator sized coordinates around Mumbai, from a gentle 2 km curve to a half circle
+    arcs = [arc(8.11e6, 2.16e6, 2000.0, 0.3, 0.05, 12), arc(8.12e6, 2.17e6, 300.0, 1.0, np.pi / 4, 30),
+            arc(8.13e6, 2.15e6, 150.0, -2.0, np.pi, 7)]
+    offsets = np.concatenate([[0], np.cumsum([len(a) for a in arcs])])
+    fit = fit_circles(np.concatenate(arcs), offsets)
+    assert np.allclose(fit["radius"], [2000.0, 300.0, 150.0], rtol=1e-6)
+    assert np.allclose(fit["curvature"], 1 / fit["radius"])
+    assert np.all(fit["residual"] < 1e-3) and not fit["refined"].any()
+    # The polyline is a little shorter than the arc it is drawn through
+    true_angle = np.degrees([0.05, np.pi / 4, np.pi])
+    assert np.all(fit["angle"] <= true_angle) and np.allclose(fit["angle"], true_angle, rtol=0.02)
+    assert np.allclose(fit["arc_length"], arc_lengths(np.concatenate(arcs), offsets))
+
+def test_batch_matches_the_per_arc_fit_on_noisy_arcs():
+    rng = np.random.default_rng(1)
+    arcs = [arc(0.0, 0.0, r, 0.0, 400.0 / r, 40) + rng.normal(0.0, 0.5, (40, 2)) for r in (250.0, 800.0, 1500.0)]
+    offsets = np.concatenate([[0], np.cumsum([len(a) for a in arcs])])
+    fit = fit_circles(np.concatenate(arcs), offsets)
+    assert np.allclose(fit["radius"], [fit_circle_radius(a) for a in arcs], rtol=1e-4)
+
+def test_straight_arc_has_no_angle():
+    x = np.linspace(0.0, 100.0, 11)
+    fit = fit_circles(np.column_stack([x, 0.5 * x]), [0, 11])
+    assert fit["radius"][0] > 1e5 and fit["angle"][0] < 0.1
+    assert abs(fit["arc_length"][0] - np.hypot(100.0, 50.0)) < 1e-9
+
+def test_no_arcs_gives_empty_results():
+    fit = fit_circles(np.zeros((0, 2)), [0])
+    assert set(fit) == {"arc_length", "radius", "curvature", "angle", "residual", "refined"}
+    assert all(len(values) == 0 for values in fit.values())
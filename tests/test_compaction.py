@@ -0,0 +1,57 @@
+import importlib
+import json
+import numpy as np
+from compaction import compact
+from projection import from_local
+from track_store import TrackStore
+
+LON0, LAT0 = 72.85, 19.05
+
+def planted_store():
+    """
+    A 2 km way with one repeated vertex, its exact reverse, a 500 m way lying
+    on it, a hand-traced 600 m way on it and a parallel track 4.5 m away.
+    """
+    x = np.arange(0.0, 2001.0, 50.0)
+    pieces = [
+        (np.insert(x, 10, x[10]), np.zeros(len(x) + 1), 1001, "Main"),
+        (x[::-1], np.zeros(len(x)), 1002, "Main"),
+        (x[4:15], np.full(11, 0.5), 1003, "Main"),
+        (x[20:33] + 7.0, np.full(13, -0.3), 5, "line added"),
+        (x, np.full(len(x), 4.5), 1004, "Down"),
+    ]
+    xs = np.concatenate([p[0] for p in pieces])
+    ys = np.concatenate([p[1] for p in pieces])
+    lon, lat = from_local(xs, ys, LON0, LAT0)
+    offsets = np.concatenate([[0], np.cumsum([len(p[0]) for p in pieces])])
+    return TrackStore(lon, lat, np.zeros(len(xs)), offsets, [p[2] for p in pieces], [p[3] for p in pieces])
+
+def test_planted_duplicates_are_removed():
+    store = planted_store()
+    compacted, report = compact(store)
+    assert report["repeated_vertices"] == 1
+    assert report["duplicate_ways"] == 1 and report["duplicate_vertices"] == 41
+    assert report["overlapping_ways"] == 1 and report["overlapping_vertices"] == 11
+    assert compacted.way_ids.tolist() == [1001, 5, 1004]
+    assert compacted.n_points == store.n_points - 1 - 41 - 11
+    assert abs(report["kept_length_m"] - 4600.0) < 5.0
+
+def test_hand_traced_ways_are_kept_unless_asked():
+    _, report = compact(planted_store())
+    assert report["hand_traced_ways"] == 1
+    compacted, report = compact(planted_store(), hand_traced_ids=None)
+    assert compacted.way_ids.tolist() == [1001, 1004]
+    assert report["overlapping_ways"] == 2 and report["hand_traced_ways"] == 0
+
+def test_elevate_falls_back_to_the_uncompacted_network(tmp_path, monkeypatch):
+    elevate = importlib.import_module("geojson-processing")
+    store = planted_store()
+    monkeypatch.chdir(tmp_path)
+    geojson = store.to_geojson()
+    for feature in geojson["features"]:
+        feature["geometry"]["coordinates"] = [c[:2] + [10.0] for c in feature["geometry"]["coordinates"]]
+    with open(elevate.UNCOMPACTED_FILE, "w") as f:
+        json.dump(geojson, f)
+    elevate.elevate_geojson()
+    with open(elevate.OUTPUT_FILE) as f:
+        assert json.load(f)["features"] == geojson["features"]
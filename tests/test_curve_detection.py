@@ -0,0 +1,26 @@
+import numpy as np
+from curve_detection import find_curves
+from projection import from_local
+from track_store import TrackStore
+
+def curved_way(radius, turn, spacing=10.0, tangent=500.0):
+    """x, y of a straight run, a curve of `radius` through `turn` radians and another straight run."""
+    t = np.arange(0.0, tangent, spacing)
+    theta = np.arange(0.0, turn, spacing / radius)
+    end_x, end_y = radius * np.sin(turn), radius * (1 - np.cos(turn))
+    x = np.concatenate([t - tangent, radius * np.sin(theta), end_x + np.cos(turn) * t])
+    y = np.concatenate([np.zeros(len(t)), radius * (1 - np.cos(theta)), end_y + np.sin(turn) * t])
+    return x, y, len(t), len(t) + len(theta) - 1
+
+def test_synthetic_arc_is_found_with_its_radius():
+    x, y, first, last = curved_way(400.0, np.pi / 3)
+    straight = np.arange(0.0, 1000.0, 10.0)
+    xs, ys = np.concatenate([x, straight]), np.concatenate([y, np.full(len(straight), -200.0)])
+    lon, lat = from_local(xs, ys, 72.85, 19.05)
+    store = TrackStore(lon, lat, np.zeros(len(xs)), [0, len(x), len(xs)], [1, 2], ["Curve", "Straight"])
+    starts, ends, fit = find_curves(store)
+    # One curve, on the first way, starting and ending within the 60 m curvature window of the tangent points
+    assert len(starts) == 1
+    assert first - 6 <= starts[0] <= first and last <= ends[0] <= last + 6
+    assert abs(fit["radius"][0] / 400.0 - 1) < 0.03
+    assert abs(fit["angle"][0] - 60.0) < 15.0
@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+from curve_snapping import TrackSnapper
+from projection import from_local
+from track_store import TrackStore
+
+ORIGIN = (72.88, 19.08)
+
+def store_from_local(ways):
+    """A TrackStore of ways given as lists of (x, y) metres around ORIGIN."""
+    xy = np.concatenate([np.asarray(w, dtype=float) for w in ways])
+    lon, lat = from_local(xy[:, 0], xy[:, 1], *ORIGIN)
+    offsets = np.concatenate([[0], np.cumsum([len(w) for w in ways])])
+    return TrackStore(lon, lat, np.zeros(len(xy)), offsets, np.arange(1, len(ways) + 1),
+                      [f"Way {i}" for i in range(len(ways))])
+
+def line(x0, x1, y=0.0, step=50.0):
+    return [(x, y) for x in np.arange(x0, x1 + step / 2, step)]
+
+def snap(store, points):
+    lon, lat = from_local(points[:, 0], points[:, 1], *ORIGIN)
+    return TrackSnapper(store).snap_arcs(lon, lat, [0, len(points)])
+
+def test_chainage_continues_across_ways():
+    # One track cut into three ways end to end; the arc runs over all of them
+    store = store_from_local([line(0, 400), line(400, 1000), line(1000, 1300)])
+    points = np.column_stack([np.linspace(100, 1200, 7), np.full(7, 1.0)])
+    way, start, end = snap(store, points)
+    assert way[0] == 1
+    # Measured from the start of the middle way
+    assert start[0] == pytest.approx(-300, abs=1)
+    assert end[0] == pytest.approx(800, abs=1)
+
+def test_parallel_track_does_not_stretch_the_span():
+    # Main line in two ways; a parallel track 4.5 m away, joined only by a crossover 3 km on
+    main = [line(0, 1000), line(1000, 4000)]
+    parallel = [line(0, 4000, y=4.5), [(4000, 0.0), (4000, 4.5)]]
+    store = store_from_local(main + parallel)
+    # Traced between the tracks, slightly nearer the parallel one at two vertices
+    y = np.array([1.0, 3.0, 1.0, 1.0, 3.0, 1.0, 1.0])
+    points = np.column_stack([np.linspace(700, 1300, 7), y])
+    way, start, end = snap(store, points)
+    assert way[0] in (0, 1)
+    assert end[0] - start[0] == pytest.approx(600, abs=1)
+
+def test_unsnapped_arc():
+    store = store_from_local([line(0, 400)])
+    way, start, end = snap(store, np.array([[0.0, 5000.0], [100.0, 5000.0], [200.0, 5000.0]]))
+    assert way[0] == -1 and np.isnan(start[0]) and np.isnan(end[0])
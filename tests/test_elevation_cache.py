@@ -0,0 +1,31 @@
+import sqlite3
+from elevation_cache import QUANTUM, ElevationCache
+
+def test_round_trip_is_keyed_on_quantized_coordinates(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = ElevationCache(path, dataset="srtm90m")
+    cache.insert([(19.0512345, 72.8512345), (19.06, 72.86)], [12.5, 30.0])
+    cache.close()
+
+    cache = ElevationCache(path, dataset="srtm90m")
+    # Less than half a quantum away is the same point, a whole quantum away is not
+    elevations, missing = cache.lookup([(19.06 + 0.4 * QUANTUM, 72.86), (19.0512345, 72.8512345),
+                                        (19.0512345 + QUANTUM, 72.8512345)])
+    assert elevations == [30.0, 12.5, None] and missing == [2]
+    assert (cache.hits, cache.misses) == (2, 1)
+    # Another dataset shares nothing
+    assert ElevationCache(path, dataset="srtm-local").lookup([(19.06, 72.86)]) == ([None], [0])
+
+def test_failed_lookups_are_not_cached(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = ElevationCache(path)
+    cache.insert([(19.0, 72.0), (19.1, 72.1)], [None, 5.0])
+    assert cache.lookup([(19.0, 72.0), (19.1, 72.1)]) == ([None, 5.0], [0])
+    cache.close()
+
+    # A null left by an older version is a miss too
+    conn = sqlite3.connect(path)
+    conn.execute("INSERT INTO elevations VALUES ('srtm90m', 192000000, 722000000, NULL)")
+    conn.commit()
+    conn.close()
+    assert ElevationCache(path).lookup([(19.2, 72.2)]) == ([None], [0])
@@ -0,0 +1,68 @@
+import time
+import pytest
+from elevation_client import ElevationClient, ElevationFetchError, TokenBucket
+
+def elevations_for(query):
+    """An opentopodata answer echoing the requested locations, elevation = lat + lon."""
+    results = []
+    for location in query["locations"][0].split("|"):
+        lat, lon = map(float, location.split(","))
+        results.append({"location": {"lat": lat, "lng": lon}, "elevation": lat + lon})
+    return {"results": results, "status": "OK"}
+
+def client(url, **kwargs):
+    options = {"rate": 1000, "burst": 1000, "backoff": 0.01, "max_retries": 3, "timeout": 5}
+    options.update(kwargs)
+    return ElevationClient(url, **options)
+
+def test_token_bucket_limits_rate():
+    bucket = TokenBucket(rate=50, capacity=1)
+    start = time.monotonic()
+    for _ in range(11):
+        bucket.acquire()
+    # One token up front, then ten at 50 per second
+    assert time.monotonic() - start >= 10 / 50 * 0.9
+
+def test_requests_are_paced_by_the_bucket(stub_server):
+    stub_server.responses = [(200, elevations_for)]
+    c = client(stub_server.url, batch_size=1, max_workers=4, rate=20, burst=1)
+    start = time.monotonic()
+    elevations = c.fetch([(19.0, 72.0 + i / 100) for i in range(6)])
+    assert time.monotonic() - start >= 5 / 20 * 0.9
+    assert elevations == pytest.approx([91.0 + i / 100 for i in range(6)])
+    assert c.requests_sent == 6
+
+def test_batches_keep_location_order(stub_server):
+    stub_server.responses = [(200, elevations_for)]
+    locations = [(19.0 + i / 1000, 72.0) for i in range(25)]
+    elevations = client(stub_server.url, batch_size=10).fetch(locations)
+    assert elevations == pytest.approx([lat + lon for lat, lon in locations])
+    assert len(stub_server.requests) == 3
+
+def test_retries_on_429_and_5xx(stub_server):
+    stub_server.responses = [(429, {}), (503, {}), (200, elevations_for)]
+    c = client(stub_server.url)
+    assert c.fetch([(19.0, 72.0)]) == pytest.approx([91.0])
+    assert c.retries == 2
+
+def test_gives_up_after_max_retries(stub_server):
+    stub_server.responses = [(500, {})]
+    c = client(stub_server.url, max_retries=2)
+    with pytest.raises(ElevationFetchError) as error:
+        c.fetch([(19.0, 72.0)])
+    assert len(stub_server.requests) == 3
+    assert error.value.elevations == [None]
+
+@pytest.mark.parametrize("status", [400, 404])
+def test_other_4xx_is_not_retried(stub_server, status):
+    stub_server.responses = [(status, {"error": "bad request"})]
+    c = client(stub_server.url)
+    with pytest.raises(ElevationFetchError):
+        c.fetch([(19.0, 72.0)])
+    assert len(stub_server.requests) == 1
+    assert c.retries == 0
+
+def test_mismatched_locations_are_retried(stub_server):
+    wrong = {"results": [{"location": {"lat": 0.0, "lng": 0.0}, "elevation": 1.0}]}
+    stub_server.responses = [(200, wrong), (200, elevations_for)]
+    assert client(stub_server.url).fetch([(19.0, 72.0)]) == pytest.approx([91.0])
@@ -0,0 +1,45 @@
+import numpy as np
+from elevation_fill import SLOPE, fill_gaps
+from projection import from_local, to_local
+from synthetic_network import generate_network
+from track_store import TrackStore
+
+def terrain(x, y):
+    """Rolling ground whose slope never exceeds 0.9 SLOPE in any direction."""
+    a = 0.9 * SLOPE / np.sqrt(2)
+    return 20.0 + a * 300.0 * np.sin(x / 300.0) + a * 500.0 * np.cos(y / 500.0 + 1.0)
+
+def with_terrain(store):
+    x, y = to_local(store.lon, store.lat, store.lon.mean(), store.lat.mean())
+    return TrackStore(store.lon, store.lat, terrain(x, y), store.offsets, store.way_ids, store.names)
+
+def check_bound(store, missing):
+    truth = store.elevation.copy()
+    store.elevation[missing] = np.nan
+    estimate, uncertainty, report = fill_gaps(store)
+    bounded = np.isfinite(uncertainty)
+    assert np.all(np.abs(estimate[bounded] - truth[bounded]) <= uncertainty[bounded] + 1e-6)
+    return report
+
+def test_bound_holds_along_the_line():
+    store, _ = generate_network(10_000, seed=5)
+    store = with_terrain(store)
+    rng = np.random.default_rng(5)
+    # Scattered points and longer runs, some reaching a way end
+    missing = rng.random(store.n_points) < 0.3
+    for start in rng.integers(0, store.n_points - 40, 30):
+        missing[start:start + rng.integers(5, 40)] = True
+    report = check_bound(store, missing)
+    assert report["filled_along_line"] > 0 and report["lookups"] > 0
+
+def test_bound_holds_from_nearby_track():
+    # A way with no heights between two known ends, beside a parallel track 5 m away
+    x = np.arange(0.0, 1001.0, 20.0)
+    xs = np.concatenate([x, x + 3.0])
+    ys = np.concatenate([np.zeros(len(x)), np.full(len(x), 5.0)])
+    lon, lat = from_local(xs, ys, 72.85, 19.05)
+    store = with_terrain(TrackStore(lon, lat, np.zeros(len(xs)), [0, len(x), len(xs)], [1, 2], ["a", "b"]))
+    missing = np.zeros(len(xs), dtype=bool)
+    missing[1:len(x) - 1] = True
+    report = check_bound(store, missing)
+    assert report["filled_nearby"] == len(x) - 2 and report["lookups"] == 0
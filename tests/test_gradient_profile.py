@@ -0,0 +1,57 @@
+import numpy as np
+from gradient_profile import grades, resample_way, smooth, steep_sections, write_profiles
+from projection import from_local
+from track_store import TrackStore
+
+LON0, LAT0 = 72.85, 19.05
+
+def straight_way(length, spacing, height):
+    """lon, lat, elevation of a way running east, with `height(x)` at every vertex."""
+    x = np.append(np.arange(0.0, length, spacing), length)
+    lon, lat = from_local(x, np.zeros(len(x)), LON0, LAT0)
+    return lon, lat, height(x)
+
+def spike(x):
+    """Flat ground with a 60 m stretch at 3% up and back down over the next 60 m."""
+    return np.interp(x, [0, 400, 460, 520, 1000], [10.0, 10.0, 11.8, 10.0, 10.0])
+
+def test_constant_slope_is_one_steep_section():
+    chainage, _, _, elevation = resample_way(*straight_way(1000.0, 35.0, lambda x: 5.0 + 0.02 * x))
+    assert np.allclose(np.diff(chainage), 10.0, atol=0.01) and abs(chainage[-1] - 1000.0) < 0.5
+    grade = grades(chainage, elevation)
+    assert np.allclose(grade, 0.02, atol=1e-4)
+    assert steep_sections(chainage, grade) == [(0, len(chainage) - 1)]
+
+def test_smoothing_keeps_a_slope_and_flattens_a_spike():
+    chainage, _, _, elevation = resample_way(*straight_way(1000.0, 20.0, lambda x: 0.02 * x))
+    smoothed = smooth(elevation, 10.0, 200.0)
+    assert np.allclose(grades(chainage, smoothed)[10:-10], 0.02, atol=1e-4)
+    chainage, _, _, elevation = resample_way(*straight_way(1000.0, 20.0, spike))
+    assert np.nanmax(np.abs(grades(chainage, smooth(elevation, 10.0, 200.0)))) < 0.01
+
+def test_short_steep_spike_is_not_a_section():
+    chainage, _, _, elevation = resample_way(*straight_way(1000.0, 20.0, spike))
+    grade = grades(chainage, elevation)
+    assert np.nanmax(np.abs(grade)) > 0.025
+    assert steep_sections(chainage, grade) == []
+    # The climb and the descent are separate runs, both 60 m
+    sections = steep_sections(chainage, grade, min_length=50.0)
+    assert np.allclose([(chainage[s], chainage[e]) for s, e in sections], [(400.0, 460.0), (460.0, 520.0)])
+
+def test_way_shorter_than_one_step_keeps_both_ends():
+    chainage, lon, _, elevation = resample_way(*straight_way(4.0, 4.0, lambda x: 10.0 + 0.05 * x))
+    assert len(chainage) == 2 and abs(chainage[-1] - 4.0) < 1e-6
+    assert np.allclose(grades(chainage, elevation), 0.05)
+
+def test_totals_count_only_long_steep_sections(tmp_path):
+    ways = [straight_way(1000.0, 20.0, lambda x: 0.02 * x), straight_way(1000.0, 20.0, spike),
+            straight_way(4.0, 4.0, lambda x: 10.0 + 0.05 * x)]
+    offsets = np.concatenate([[0], np.cumsum([len(w[0]) for w in ways])])
+    store = TrackStore(*(np.concatenate([w[k] for w in ways]) for k in range(3)), offsets, [1, 2, 3],
+                       ["Slope", "Spike", "Stub"])
+    lines = write_profiles(store, tmp_path / "profile.csv", tmp_path / "steep.csv", smooth_m=None)
+    assert lines["Slope"][1] == lines["Slope"][0] and abs(lines["Slope"][0] - 1000.0) < 0.5
+    assert lines["Spike"][1] == 0.0 and abs(lines["Spike"][2] - 0.03) < 1e-3
+    # Under the 100 m minimum, so the stub's 5% is reported as its maximum but never as steep track
+    assert lines["Stub"][1] == 0.0 and abs(lines["Stub"][2] - 0.05) < 1e-6
+    assert len((tmp_path / "steep.csv").read_text().splitlines()) == 2
@@ -0,0 +1,81 @@
+import json
+import os
+import subprocess
+import sys
+import threading
+import numpy as np
+import instrumentation
+from instrumentation import count, merge, recording, stage
+from parallel import run_sharded
+
+def _work(shard):
+    with stage("work"):
+        count("test_items", len(shard["offsets"]) - 1)
+    return int(shard["v"].sum())
+
+def test_stages_nest_per_thread():
+    barrier = threading.Barrier(2)
+
+    def run(name):
+        with stage(f"test_{name}"):
+            barrier.wait()
+            with stage("inner"):
+                barrier.wait()
+            barrier.wait()
+
+    threads = [threading.Thread(target=run, args=(name,)) for name in ("a", "b")]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    stages = instrumentation.report()["stages"]
+    assert stages["test_a/inner"]["calls"] == 1
+    assert stages["test_b/inner"]["calls"] == 1
+    assert not [path for path in stages if "test_a/test_b" in path or "test_b/test_a" in path]
+
+def test_recording_and_merge():
+    with recording() as recorded:
+        with stage("test_recorded"):
+            count("test_recorded_count", 3)
+    assert recorded["stages"]["test_recorded"]["calls"] == 1
+    assert recorded["counters"] == {"test_recorded_count": 3}
+    with stage("test_outer"):
+        merge(recorded)
+    data = instrumentation.report()
+    assert data["stages"]["test_outer/test_recorded"]["calls"] == 1
+    assert data["counters"]["test_recorded_count"] == 6
+
+def test_worker_counters_reach_the_parent():
+    before = instrumentation.report()["counters"].get("test_items", 0)
+    with stage("test_sharded"):
+        out = run_sharded(_work, {"v": np.ones(1000)}, {}, np.arange(0, 1001, 10), workers=2, shard_vertices=100)
+    assert sum(out) == 1000
+    data = instrumentation.report()
+    assert data["counters"]["test_items"] - before == 100
+    assert data["stages"]["test_sharded/work"]["calls"] == 10
+
+SPAWN_SCRIPT = """
+import multiprocessing, sys
+import numpy as np
+sys.path[:0] = [{root!r}, {tests!r}]
+from instrumentation import stage
+from parallel import run_sharded
+from test_instrumentation import _work
+
+if __name__ == "__main__":
+    multiprocessing.set_start_method("spawn")
+    with stage("outer"):
+        run_sharded(_work, {{"v": np.ones(1000)}}, {{}}, np.arange(0, 1001, 10), workers=2, shard_vertices=100)
+"""
+
+def test_only_the_main_process_writes_the_report(tmp_path):
+    tests = os.path.dirname(os.path.abspath(__file__))
+    script = tmp_path / "run.py"
+    script.write_text(SPAWN_SCRIPT.format(root=os.path.dirname(tests), tests=tests))
+    report = tmp_path / "report.json"
+    env = dict(os.environ, RAILWAYS_REPORT=str(report))
+    out = subprocess.run([sys.executable, str(script)], env=env, capture_output=True, text=True, check=True).stdout
+    assert out.count("Run report saved") == 1
+    data = json.loads(report.read_text())
+    assert data["counters"]["test_items"] == 100
+    assert data["stages"]["outer/work"]["calls"] == 10
@@ -0,0 +1,30 @@
+import numpy as np
+from network_graph import NetworkGraph
+from network_stats import haversine
+
+def grid_osm(n=30):
+    """An n x n grid of nodes about 100 m apart, joined by east-west and north-south ways."""
+    ids = np.arange(n * n).reshape(n, n) + 1
+    lat = 19.0 + np.repeat(np.arange(n), n) * 0.0009
+    lon = 72.8 + np.tile(np.arange(n), n) * 0.00095
+    nodes = [{"type": "node", "id": int(i), "lat": float(a), "lon": float(o)}
+             for i, a, o in zip(ids.ravel(), lat, lon)]
+    ways = [{"type": "way", "id": k + 1, "nodes": row.tolist()} for k, row in enumerate(np.vstack([ids, ids.T]))]
+    return {"elements": ways + nodes}
+
+def test_nearest_node_matches_brute_force():
+    graph = NetworkGraph.from_osm(grid_osm())
+    rng = np.random.default_rng(0)
+    lat = rng.uniform(graph.lat.min(), graph.lat.max(), 500)
+    lon = rng.uniform(graph.lon.min(), graph.lon.max(), 500)
+    idx, distance = graph.nearest_node(lat, lon, return_distance=True)
+    brute = haversine(lat[:, None], lon[:, None], graph.lat[None, :], graph.lon[None, :])
+    assert np.array_equal(idx, brute.argmin(axis=1))
+    assert np.allclose(distance, brute.min(axis=1), rtol=1e-3)
+
+def test_shared_nodes_are_one_graph():
+    graph = NetworkGraph.from_osm(grid_osm(5))
+    assert len(graph) == 25
+    assert graph.components()[0] == 1
+    # 2 * 5 ways of 4 edges each, none shared
+    assert len(graph.edges) == 40
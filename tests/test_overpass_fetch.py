@@ -0,0 +1,77 @@
+import os
+import pytest
+from overpass_fetch import OverpassError, OverpassFetcher, merge_elements, split_bbox
+
+QUERY = "[out:json];way({bbox});out;"
+
+def tile_response(query):
+    """An Overpass answer with one way and node per tile, plus a node every tile shares."""
+    bbox = query["data"][0].split("(")[1].split(")")[0]
+    key = abs(hash(bbox)) % 10 ** 6
+    return {"version": 0.6, "elements": [
+        {"type": "node", "id": 1, "lat": 19.0, "lon": 72.9},
+        {"type": "way", "id": 1000 + key, "nodes": [1, key]},
+        {"type": "node", "id": key, "lat": 19.1, "lon": 72.8},
+    ]}
+
+def fetcher(url, cache_dir, **kwargs):
+    options = {"backoff": 0.01, "max_retries": 3, "tile_deg": 0.5}
+    options.update(kwargs)
+    return OverpassFetcher(QUERY, url, str(cache_dir), **options)
+
+def test_split_bbox_snaps_to_grid():
+    tiles = split_bbox((18.9, 72.7, 19.6, 73.2), 0.5)
+    assert tiles == [(18.9, 72.7, 19.0, 73.0), (18.9, 73.0, 19.0, 73.2),
+                     (19.0, 72.7, 19.5, 73.0), (19.0, 73.0, 19.5, 73.2),
+                     (19.5, 72.7, 19.6, 73.0), (19.5, 73.0, 19.6, 73.2)]
+
+def test_merge_keeps_each_element_once_ways_first():
+    merged = merge_elements([tile_response({"data": ["x(1)"]}), tile_response({"data": ["x(2)"]})])
+    types = [e["type"] for e in merged["elements"]]
+    assert types == ["way", "way", "node", "node", "node"]
+    assert merged["version"] == 0.6
+
+def test_tiles_are_cached(stub_server, tmp_path):
+    stub_server.responses = [(200, tile_response)]
+    bbox = (19.0, 72.5, 19.9, 72.9)
+    data = fetcher(stub_server.url, tmp_path).fetch(bbox)
+    assert len(stub_server.requests) == 2
+    assert len([e for e in data["elements"] if e["type"] == "way"]) == 2
+    again = fetcher(stub_server.url, tmp_path)
+    assert again.fetch(bbox) == data
+    assert len(stub_server.requests) == 2 and again.from_cache == 2
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
+
+def test_retries_on_429_and_504(stub_server, tmp_path):
+    stub_server.responses = [(429, {}), (504, {}), (200, tile_response)]
+    data = fetcher(stub_server.url, tmp_path).fetch((19.0, 72.5, 19.4, 72.9))
+    assert len(stub_server.requests) == 3
+    assert len(data["elements"]) == 3
+
+def test_response_without_elements_is_retried(stub_server, tmp_path):
+    stub_server.responses = [(200, {"remark": "runtime error: timeout"}), (200, tile_response)]
+    fetcher(stub_server.url, tmp_path).fetch((19.0, 72.5, 19.4, 72.9))
+    assert len(stub_server.requests) == 2
+
+def test_gives_up_after_max_retries(stub_server, tmp_path):
+    stub_server.responses = [(503, {})]
+    with pytest.raises(OverpassError):
+        fetcher(stub_server.url, tmp_path, max_retries=2).fetch((19.0, 72.5, 19.4, 72.9))
+    assert len(stub_server.requests) == 3
+    assert os.listdir(tmp_path) == []
+
+def test_bad_query_is_not_retried(stub_server, tmp_path):
+    stub_server.responses = [(400, {})]
+    with pytest.raises(OverpassError):
+        fetcher(stub_server.url, tmp_path).fetch((19.0, 72.5, 19.4, 72.9))
+    assert len(stub_server.requests) == 1
+
+def test_cache_is_keyed_by_query(stub_server, tmp_path):
+    stub_server.responses = [(200, tile_response)]
+    bbox = (19.0, 72.5, 19.4, 72.9)
+    fetcher(stub_server.url, tmp_path).fetch(bbox)
+    other = OverpassFetcher(QUERY.replace("way(", 'way["railway"="rail"]('), stub_server.url, str(tmp_path),
+                            backoff=0.01, tile_deg=0.5)
+    other.fetch(bbox)
+    assert len(stub_server.requests) == 2 and other.from_cache == 0
+    assert len(os.listdir(tmp_path)) == 2
@@ -0,0 +1,38 @@
+import numpy as np
+import instrumentation
+from curve_detection import detect_curves
+from gradient_profile import write_profiles
+from parallel import shard_bounds
+from synthetic_network import generate_network
+
+# Small shards, so the seams between them fall inside the network
+SHARD_VERTICES = 3000
+
+def test_shard_bounds_cover_every_item_once():
+    offsets = np.concatenate([[0], np.cumsum(np.random.default_rng(0).integers(1, 50, 400))])
+    bounds = shard_bounds(offsets, 500)
+    assert bounds[0] == 0 and bounds[-1] == 400
+    assert np.all(np.diff(bounds) > 0)
+    assert len(bounds) - 1 == int(np.ceil(offsets[-1] / 500))
+
+def test_sharded_detection_matches_serial():
+    store, _ = generate_network(20_000, seed=3)
+    assert len(shard_bounds(store.offsets, SHARD_VERTICES)) > 3
+    points, starts, ends, fit = detect_curves(store, workers=1)
+    before = instrumentation.report()["counters"]["arcs_fitted"]
+    _, s_starts, s_ends, s_fit = detect_curves(store, workers=2, shard_vertices=SHARD_VERTICES)
+    assert np.array_equal(starts, s_starts) and np.array_equal(ends, s_ends)
+    assert fit.keys() == s_fit.keys()
+    for key in fit:
+        assert np.array_equal(fit[key], s_fit[key], equal_nan=True)
+    # The fits counted in the workers reach this process's report
+    assert instrumentation.report()["counters"]["arcs_fitted"] - before == len(starts)
+
+def test_sharded_profile_files_match_serial(tmp_path):
+    store, _ = generate_network(20_000, seed=4)
+    serial = write_profiles(store, tmp_path / "p1.csv", tmp_path / "s1.csv", workers=1)
+    sharded = write_profiles(store, tmp_path / "p2.csv", tmp_path / "s2.csv", workers=2,
+                             shard_vertices=SHARD_VERTICES)
+    assert (tmp_path / "p1.csv").read_bytes() == (tmp_path / "p2.csv").read_bytes()
+    assert (tmp_path / "s1.csv").read_bytes() == (tmp_path / "s2.csv").read_bytes()
+    assert serial == sharded
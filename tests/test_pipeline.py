@@ -0,0 +1,72 @@
+import pipeline
+
+STAGES = [
+    {"name": "double", "script": "double.py", "inputs": ["in.txt"], "outputs": ["mid.txt"]},
+    {"name": "label", "script": "label.py", "inputs": ["mid.txt"], "outputs": ["out.txt"]},
+]
+
+DOUBLE = """
+with open("in.txt") as f:
+    value = int(f.read())
+with open("mid.txt", "w") as f:
+    f.write(str(2 * value % 10))
+with open("runs.log", "a") as f:
+    f.write("double\\n")
+"""
+
+LABEL = """
+from helper import PREFIX
+with open("mid.txt") as f:
+    value = f.read()
+with open("out.txt", "w") as f:
+    f.write(PREFIX + value)
+with open("runs.log", "a") as f:
+    f.write("label\\n")
+"""
+
+def setup_stages(path, monkeypatch):
+    monkeypatch.chdir(path)
+    pipeline.local_imports.cache_clear()
+    (path / "double.py").write_text(DOUBLE)
+    (path / "label.py").write_text(LABEL)
+    (path / "helper.py").write_text('PREFIX = "value "\n')
+    (path / "in.txt").write_text("3")
+
+def run(path, **kwargs):
+    """Names of the stages that ran, in order."""
+    log = path / "runs.log"
+    log.write_text("")
+    assert pipeline.run_pipeline(STAGES, max_parallel=1, **kwargs)
+    return log.read_text().split()
+
+def test_only_changed_stages_run(tmp_path, monkeypatch):
+    setup_stages(tmp_path, monkeypatch)
+    assert run(tmp_path) == ["double", "label"]
+    assert (tmp_path / "out.txt").read_text() == "value 6"
+    assert run(tmp_path) == []
+
+    # Rewriting a file with the same contents is not a change
+    (tmp_path / "in.txt").write_text("3")
+    assert run(tmp_path) == []
+    # A stage re-runs after the one before it only if that one's output changed
+    (tmp_path / "in.txt").write_text("8")
+    assert run(tmp_path) == ["double"]
+    (tmp_path / "in.txt").write_text("4")
+    assert run(tmp_path) == ["double", "label"]
+    assert (tmp_path / "out.txt").read_text() == "value 8"
+
+def test_missing_outputs_and_imported_modules(tmp_path, monkeypatch):
+    setup_stages(tmp_path, monkeypatch)
+    run(tmp_path)
+    (tmp_path / "out.txt").unlink()
+    assert run(tmp_path) == ["label"]
+    (tmp_path / "helper.py").write_text('PREFIX = "v="\n')
+    assert run(tmp_path) == ["label"]
+    assert (tmp_path / "out.txt").read_text() == "v=6"
+
+def test_force_runs_only_the_selected_stages(tmp_path, monkeypatch):
+    setup_stages(tmp_path, monkeypatch)
+    run(tmp_path)
+    assert run(tmp_path, selected=["label"], force=True) == ["label"]
+    assert run(tmp_path, force=True) == ["double", "label"]
+    assert run(tmp_path, selected=["label"], dry_run=True) == []
@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+from network_stats import haversine
+from projection import (from_local, local_frames, lonlat_to_mercator, mercator_to_local, mercator_to_lonlat,
+                        to_local)
+
+rng = np.random.default_rng(0)
+
+def random_runs(n_runs=200, points=30, spread_m=3000.0):
+    """Runs of points scattered within `spread_m` of a centre somewhere around Mumbai."""
+    lon0 = np.repeat(rng.uniform(72.5, 73.5, n_runs), points)
+    lat0 = np.repeat(rng.uniform(18.8, 20.0, n_runs), points)
+    lon, lat = from_local(rng.uniform(-spread_m, spread_m, lon0.size), rng.uniform(-spread_m, spread_m, lat0.size),
+                          lon0, lat0)
+    return lon, lat, np.arange(0, n_runs * points + 1, points)
+
+def test_mercator_round_trip():
+    lon, lat, _ = random_runs()
+    back_lon, back_lat = mercator_to_lonlat(*lonlat_to_mercator(lon, lat))
+    assert np.allclose(back_lon, lon, atol=1e-9) and np.allclose(back_lat, lat, atol=1e-9)
+
+def test_local_round_trip():
+    lon, lat, _ = random_runs()
+    x, y = to_local(lon, lat, 72.9, 19.1)
+    back_lon, back_lat = from_local(x, y, 72.9, 19.1)
+    assert np.allclose(back_lon, lon, atol=1e-9) and np.allclose(back_lat, lat, atol=1e-9)
+
+def test_local_frame_distances_match_haversine():
+    lon, lat, offsets = random_runs()
+    x, y, _, _ = local_frames(lon, lat, offsets)
+    # Distances between consecutive points of each run, a few hundred metres to a few km
+    same = np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+    i = np.flatnonzero(same[1:] == same[:-1])
+    planar = np.hypot(x[i + 1] - x[i], y[i + 1] - y[i])
+    true = haversine(lat[i], lon[i], lat[i + 1], lon[i + 1])
+    error = np.abs(planar / true - 1)
+    assert error.mean() < 1e-4
+    assert error.max() < 2e-3
+
+def test_mercator_overstates_lengths_at_mumbai():
+    lon, lat, offsets = random_runs()
+    mx, my = lonlat_to_mercator(lon, lat)
+    i = np.arange(len(lon) - 1)
+    ratio = np.hypot(np.diff(mx), np.diff(my)) / haversine(lat[i], lon[i], lat[i + 1], lon[i + 1])
+    assert ratio.mean() == pytest.approx(1 / np.cos(np.radians(19.4)), rel=5e-3)
+
+def test_mercator_to_local_matches_local_frames():
+    lon, lat, offsets = random_runs(20)
+    x, y, lon0, lat0 = local_frames(lon, lat, offsets)
+    mx, my, mlon0, mlat0 = mercator_to_local(*lonlat_to_mercator(lon, lat), offsets)
+    assert np.allclose(mx, x, atol=1e-6) and np.allclose(my, y, atol=1e-6)
+    assert np.allclose(mlon0, lon0) and np.allclose(mlat0, lat0)
+
+def test_empty_runs_get_a_frame():
+    x, y, lon0, lat0 = local_frames([72.9, 72.91], [19.0, 19.01], [0, 0, 2, 2])
+    assert len(lon0) == 3 and lon0[1] == pytest.approx(72.905)
+    assert len(x) == 2
@@ -0,0 +1,31 @@
+import json
+import os
+import subprocess
+import sys
+import numpy as np
+from projection import from_local
+from track_store import TrackStore
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs `railways.py stats` in a fresh interpreter and prints the heavy modules it loaded
+STATS = """
+import sys
+sys.path.insert(0, {root!r})
+import railways
+railways.main(["stats", "--input", "network.geojson", "--way-stats", "ways.csv", "--hotspots", "hot.csv"])
+print("loaded:", sorted(m for m in ("scipy", "folium", "branca") if m in sys.modules))
+"""
+
+def test_stats_loads_neither_scipy_nor_folium(tmp_path):
+    x = np.arange(0.0, 1001.0, 20.0)
+    lon, lat = from_local(x, np.zeros(len(x)), 72.85, 19.05)
+    store = TrackStore(lon, lat, 10.0 + 0.01 * x, [0, len(x)], [1], ["Main"])
+    with open(tmp_path / "network.geojson", "w") as f:
+        json.dump(store.to_geojson(), f)
+
+    run = subprocess.run([sys.executable, "-c", STATS.format(root=ROOT)], cwd=tmp_path, check=True,
+                         capture_output=True, text=True)
+    assert run.stdout.splitlines()[-1] == "loaded: []"
+    assert "Main: 1000" in run.stdout
+    assert (tmp_path / "ways.csv").exists() and (tmp_path / "hot.csv").exists()
@@ -0,0 +1,60 @@
+import numpy as np
+from curvature import MAX_RADIUS_M
+from projection import from_local
+from simplify import curvature_vertices, deviation, elevation_sample_mask, interpolate_dropped, rdp
+from track_store import TrackStore
+
+def wobbly_ways():
+    """Two ways of 1 m steps: a straight line with 0.3 m noise, and a zig-zag with 10 m teeth."""
+    x = np.arange(0.0, 500.0)
+    noise = np.random.default_rng(0).uniform(-0.3, 0.3, len(x))
+    zigzag = 10.0 * np.abs((x / 50.0) % 2 - 1)
+    return np.concatenate([x, x]), np.concatenate([noise, zigzag]), np.array([0, 500, 1000])
+
+def test_rdp_keeps_way_ends_and_stays_within_tolerance():
+    x, y, offsets = wobbly_ways()
+    keep = rdp(x, y, offsets, 1.0)
+    assert keep[[0, 499, 500, 999]].all()
+    assert keep[:500].sum() == 2
+    assert deviation(x, y, offsets, keep).max() <= 1.0
+    # Every corner of the zig-zag is a turn of more than the tolerance
+    assert keep[500 + np.arange(0, 500, 50)].all()
+
+def test_rdp_keeps_preserved_vertices():
+    x, y, offsets = wobbly_ways()
+    preserve = np.zeros(len(x), dtype=bool)
+    preserve[[100, 101, 250]] = True
+    keep = rdp(x, y, offsets, 1.0, preserve)
+    assert keep[[100, 101, 250]].all() and keep[:500].sum() == 5
+
+def test_rdp_max_gap_caps_the_spacing():
+    x, y, offsets = wobbly_ways()
+    keep = rdp(x, y, offsets, 1.0, max_gap=40.0)
+    for first, last in zip(offsets[:-1], offsets[1:]):
+        kept = np.flatnonzero(keep[first:last])
+        assert np.diff(x[first:last][kept]).max() <= 40.0
+
+def test_curve_vertices_are_preserved():
+    # A straight run, a 300 m radius curve and another straight run
+    t = np.arange(0.0, 600.0, 5.0)
+    theta = np.arange(0.0, np.pi / 2, 5.0 / 300.0)
+    x = np.concatenate([t - 600.0, 300.0 * np.sin(theta), 300.0 + np.zeros(len(t))])
+    y = np.concatenate([np.zeros(len(t)), 300.0 * (1 - np.cos(theta)), 300.0 + t])
+    offsets = np.array([0, len(x)])
+    curved = curvature_vertices(x, y, offsets, MAX_RADIUS_M)
+    on_curve = slice(len(t) + 15, len(t) + len(theta) - 15)
+    assert curved[on_curve].all() and not curved[:len(t) - 15].any()
+    keep = rdp(x, y, offsets, 2.0, curved)
+    assert keep[on_curve].all() and keep[:len(t) - 15].sum() == 1
+
+def test_elevation_samples_bound_the_interpolation_error():
+    # A 2 km way of 10 m steps over ground rising and falling at up to 4%
+    x = np.arange(0.0, 2001.0, 10.0)
+    lon, lat = from_local(x, np.zeros(len(x)), 72.85, 19.05)
+    height = 20.0 + 0.04 * 100.0 * np.sin(x / 100.0)
+    store = TrackStore(lon, lat, height, [0, len(x)], [1], ["a"])
+    keep = elevation_sample_mask(store, 90.0)
+    assert keep[0] and keep[-1]
+    assert np.diff(x[keep]).max() <= 90.0 and keep.sum() < len(x) / 5
+    estimate = interpolate_dropped(store, np.where(keep, height, np.nan), keep)
+    assert np.abs(estimate - height).max() <= 0.04 * 90.0 / 2
@@ -0,0 +1,53 @@
+import numpy as np
+from srtm_tiles import VOID, SRTMTileSampler, dataset_name, tile_name
+
+SIZE = 11   # posts per side: 360 arc-second spacing keeps the tiles tiny
+
+def write_tile(tile_dir, lat_floor, lon_floor, heights):
+    heights.astype(">i2").tofile(tile_dir / tile_name(lat_floor, lon_floor))
+
+def ramp(base=0):
+    """Row r, column c holds base + 100 r + c: rows run north to south, columns west to east."""
+    return base + 100 * np.arange(SIZE)[:, None] + np.arange(SIZE)[None, :]
+
+def test_tile_names():
+    assert tile_name(19, 72) == "N19E072.hgt"
+    assert tile_name(-1, -73) == "S01W073.hgt"
+
+def test_orientation_and_bilinear_interpolation(tmp_path):
+    write_tile(tmp_path, 19, 72, ramp())
+    sampler = SRTMTileSampler(str(tmp_path))
+    step = 1 / (SIZE - 1)
+    # The north-west corner is row 0, column 0; the south-east corner the last post
+    eps = 1e-9
+    lat = np.array([20.0 - eps, 19.0 + eps, 20.0 - eps, 19.0 + eps, 20.0 - 2.5 * step])
+    lon = np.array([72.0 + eps, 73.0 - eps, 73.0 - eps, 72.0 + eps, 72.0 + 4.25 * step])
+    assert np.allclose(sampler.sample(lat, lon), [0, 1010, 10, 1000, 254.25], atol=1e-3)
+
+def test_void_posts_and_missing_tiles_give_none(tmp_path):
+    heights = ramp()
+    heights[5, 5] = VOID
+    write_tile(tmp_path, 19, 72, heights)
+    sampler = SRTMTileSampler(str(tmp_path))
+    step = 1 / (SIZE - 1)
+    elevations = sampler.fetch([(20.0 - 4.5 * step, 72.0 + 4.5 * step), (20.0 - 2 * step, 72.0 + step),
+                                (18.5, 72.5)])
+    assert elevations[0] is None and elevations[2] is None
+    assert abs(elevations[1] - 201.0) < 1e-6
+
+def test_least_recently_used_tile_is_closed(tmp_path):
+    for k, lon in enumerate((72, 73, 74)):
+        write_tile(tmp_path, 19, lon, ramp(1000 * k))
+    sampler = SRTMTileSampler(str(tmp_path), max_open=2)
+    for lon in (72.5, 73.5, 72.5, 74.5):
+        sampler.sample([19.5], [lon])
+    assert list(sampler.tiles) == [(19, 72), (19, 74)]
+    assert sampler.loads == 3 and sampler.evictions == 1
+    assert sampler.sample([19.5], [74.0])[0] == 2500
+
+def test_dataset_names_the_resolution(tmp_path):
+    assert dataset_name(str(tmp_path)) == "srtm-local"
+    write_tile(tmp_path, 19, 72, np.zeros((1201, 1201)))
+    assert SRTMTileSampler(str(tmp_path)).dataset == "srtm-local-3s"
+    write_tile(tmp_path, 19, 73, np.zeros((3601, 3601)))
+    assert dataset_name(str(tmp_path)) == "srtm-local-1s+3s"
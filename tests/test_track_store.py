@@ -0,0 +1,46 @@
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from synthetic_network import generate_network
+from track_store import SIDECAR_SUFFIX, TrackStore
+
+def write_network(path, n_vertices=5000):
+    store, _ = generate_network(n_vertices)
+    with open(path, "w") as f:
+        json.dump(store.to_geojson(), f)
+    return store
+
+def load_points(path):
+    return TrackStore.load(path).n_points
+
+def test_sidecar_round_trip(tmp_path):
+    path = str(tmp_path / "net.geojson")
+    store = write_network(path)
+    first = TrackStore.load(path)
+    assert os.path.exists(path + SIDECAR_SUFFIX)
+    second = TrackStore.load(path)
+    for name in ("lon", "lat", "elevation", "offsets", "way_ids"):
+        assert np.array_equal(getattr(first, name), getattr(second, name), equal_nan=True)
+    assert np.allclose(second.lon, store.lon)
+    assert second.names == store.names
+
+def test_concurrent_loads_rewrite_a_stale_sidecar(tmp_path):
+    path = str(tmp_path / "net.geojson")
+    store = write_network(path)
+    for _ in range(3):
+        with ProcessPoolExecutor(6) as pool:
+            points = list(pool.map(load_points, [path] * 6))
+        assert points == [store.n_points] * 6
+        assert sorted(os.listdir(tmp_path)) == ["net.geojson", "net.geojson" + SIDECAR_SUFFIX]
+        # A stale signature makes every process rebuild and rewrite the sidecar again
+        os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 10 ** 9))
+
+def test_unwritable_sidecar_is_not_fatal(tmp_path, monkeypatch):
+    path = str(tmp_path / "net.geojson")
+    store = write_network(path)
+
+    def fail(*args, **kwargs):
+        raise PermissionError("read-only")
+    monkeypatch.setattr(TrackStore, "save", fail)
+    assert TrackStore.load(path).n_points == store.n_points
@@ -0,0 +1,194 @@
+import json
+import os
+import tempfile
+import numpy as np
+from instrumentation import count, stage
+
+SIDECAR_SUFFIX = ".npz"
+
+class TrackStore:
+    """
+    Array-backed railway network.
+
+    All vertices of all ways live in contiguous `lon`, `lat` and `elevation`
+    float arrays (elevation is NaN where unknown); way i owns the slice
+    offsets[i]:offsets[i+1]. Way attributes are parallel lists/arrays indexed by
+    way: `way_ids`, `names`. `node_ids` holds the OSM node ID of every vertex
+    when the store was loaded from raw OSM data, otherwise it is None.
+    """
+
+    def __init__(self, lon, lat, elevation, offsets, way_ids, names, node_ids=None):
+        self.lon = np.asarray(lon, dtype=float)
+        self.lat = np.asarray(lat, dtype=float)
+        self.elevation = np.asarray(elevation, dtype=float)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.way_ids = np.asarray(way_ids, dtype=np.int64)
+        self.names = list(names)
+        self.node_ids = None if node_ids is None else np.asarray(node_ids, dtype=np.int64)
+
+    @classmethod
+    def from_geojson(cls, path_or_data):
+        """Load LineString features; coordinates are [lon, lat] or [lon, lat, elevation]."""
+        if isinstance(path_or_data, dict):
+            geojson_data = path_or_data
+        else:
+            with open(path_or_data, "r") as f, stage("json_load"):
+                geojson_data = json.load(f)
+
+        lon, lat, elevation, lengths, way_ids, names = [], [], [], [], [], []
+        for feature in geojson_data["features"]:
+            coords = feature["geometry"]["coordinates"]
+            for coord in coords:
+                lon.append(coord[0])
+                lat.append(coord[1])
+                elevation.append(coord[2] if len(coord) > 2 and coord[2] is not None else np.nan)
+            lengths.append(len(coords))
+            way_ids.append(feature["properties"].get("id") or 0)
+            names.append(feature["properties"].get("name", ""))
+
+        offsets = np.concatenate([[0], np.cumsum(lengths, dtype=np.int64)])
+        return cls(lon, lat, elevation, offsets, way_ids, names)
+
+    @classmethod
+    def from_osm(cls, path_or_data, node_elevations=None):
+        """
+        Load ways and skel nodes from an Overpass JSON response. Nodes missing
+        from the response are skipped, as in the GeoJSON export.
+        `node_elevations` optionally maps node ID to elevation.
+        """
+        if isinstance(path_or_data, dict):
+            data = path_or_data
+        else:
+            with open(path_or_data, "r") as f, stage("json_load"):
+                data = json.load(f)
+
+        nodes = {}
+        ways = []
+        for element in data["elements"]:
+            if element["type"] == "node":
+                nodes[element["id"]] = (element["lon"], element["lat"])
+            elif element["type"] == "way":
+                ways.append(element)
+
+        node_elevations = node_elevations or {}
+        node_ids, lengths, way_ids, names = [], [], [], []
+        for way in ways:
+            present = [node_id for node_id in way["nodes"] if node_id in nodes]
+            if len(present) < len(way["nodes"]):
+                count("skipped_nodes", len(way["nodes"]) - len(present))
+            node_ids.extend(present)
+            lengths.append(len(present))
+            way_ids.append(way["id"])
+            names.append(way.get("tags", {}).get("name", "Unnamed Railway"))
+
+        lonlat = np.array([nodes[node_id] for node_id in node_ids], dtype=float).reshape(-1, 2)
+        elevation = np.array([
+            np.nan if node_elevations.get(node_id) is None else node_elevations[node_id]
+            for node_id in node_ids
+        ], dtype=float)
+        offsets = np.concatenate([[0], np.cumsum(lengths, dtype=np.int64)])
+        return cls(lonlat[:, 0], lonlat[:, 1], elevation, offsets, way_ids, names, node_ids)
+
+    def to_geojson(self):
+        """FeatureCollection of LineStrings in the layout from_geojson reads ([lon, lat] where elevation is unknown)."""
+        elevation = np.where(np.isnan(self.elevation), None, self.elevation)
+        coords = [c if c[2] is not None else c[:2] for c in np.column_stack([self.lon, self.lat, elevation]).tolist()]
+        features = [{
+            "type": "Feature",
+            "properties": {"name": name, "id": int(way_id)},
+            "geometry": {"type": "LineString", "coordinates": coords[self.offsets[i]:self.offsets[i + 1]]},
+        } for i, (way_id, name) in enumerate(zip(self.way_ids, self.names))]
+        return {"type": "FeatureCollection", "features": features}
+
+    @classmethod
+    def load(cls, path, use_sidecar=True):
+        """
+        Load a GeoJSON file through its binary sidecar (`path` + ".npz").
+
+        The sidecar records the size and modification time of the GeoJSON it was
+        built from; when they no longer match, or the sidecar is missing or
+        unreadable, the GeoJSON is parsed again and the sidecar rewritten.
+        """
+        stat = os.stat(path)
+        signature = np.array([stat.st_size, stat.st_mtime_ns], dtype=np.int64)
+        sidecar = path + SIDECAR_SUFFIX
+
+        if use_sidecar and os.path.exists(sidecar):
+            try:
+                with np.load(sidecar, allow_pickle=False) as z:
+                    if np.array_equal(z["source_signature"], signature):
+                        count("sidecar_hits")
+                        return cls(
+                            z["lon"], z["lat"], z["elevation"], z["offsets"], z["way_ids"],
+                            z["names"].tolist(), z["node_ids"] if z["has_node_ids"] else None,
+                        )
+            except (OSError, ValueError, KeyError) as e:
+                print(f"Ignoring unreadable sidecar {sidecar}: {e}")
+
+        store = cls.from_geojson(path)
+        if use_sidecar:
+            # The sidecar only saves time; a run that cannot write it still has the store
+            try:
+                store.save(sidecar, signature)
+            except OSError as e:
+                print(f"Could not write sidecar {sidecar}: {e}")
+        return store
+
+    def save(self, path, source_signature=None):
+        """
+        Write the store as an uncompressed .npz (no pickled objects). The file is
+        written under a unique temporary name and renamed into place, so several
+        processes can save the same path at once and readers never see half a file.
+        """
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)),
+                                        prefix=os.path.basename(path) + ".", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(
+                    f,
+                    lon=self.lon, lat=self.lat, elevation=self.elevation, offsets=self.offsets,
+                    way_ids=self.way_ids, names=np.array(self.names, dtype=str),
+                    node_ids=self.node_ids if self.node_ids is not None else np.zeros(0, dtype=np.int64),
+                    has_node_ids=self.node_ids is not None,
+                    source_signature=source_signature if source_signature is not None else np.zeros(2, dtype=np.int64),
+                )
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    @property
+    def n_points(self):
+        return len(self.lon)
+
+    def way_slice(self, i):
+        return slice(self.offsets[i], self.offsets[i + 1])
+
+    def way(self, i):
+        """Views (no copies) of the lon, lat and elevation arrays of way i."""
+        s = self.way_slice(i)
+        return self.lon[s], self.lat[s], self.elevation[s]
+
+    def way_index(self):
+        """Way number of every vertex."""
+        return np.repeat(np.arange(len(self)), np.diff(self.offsets))
+
+    def segment_starts(self):
+        """Index of the first vertex of every segment that does not cross a way boundary."""
+        starts = np.ones(self.n_points, dtype=bool)
+        starts[self.offsets[1:] - 1] = False
+        return np.flatnonzero(starts)
+
+    def segments(self):
+        """
+        All consecutive vertex pairs as an (S, 2, 2) array of [(lat, lon), (lat, lon)],
+        with the mean elevation of each segment (NaN if either end is unknown).
+        """
+        i = self.segment_starts()
+        latlon = np.column_stack([self.lat, self.lon])
+        segments = np.stack([latlon[i], latlon[i + 1]], axis=1)
+        return segments, (self.elevation[i] + self.elevation[i + 1]) / 2